@@ -1,9 +1,9 @@
 from openai import OpenAI
 import os
-import requests
 import json
 
 from dotenv import load_dotenv
+import amap_weather
 
 load_dotenv()
 
@@ -25,18 +25,12 @@ def send_messages(messages):
     return response.choices[0].message
 
 
-# 高德地图 API 密钥
-# 从高德地图获取天气
-AMAP_API_KEY = os.getenv("AMAP_API_KEY")
-
-
 def get_weather(args):
     if isinstance(args, str):
         args = json.loads(args)
     location = args.get("location")
-    url = f"https://restapi.amap.com/v3/weather/weatherInfo?city={location}&key={AMAP_API_KEY}"
-    response = requests.get(url)
-    return response.json()
+    # 共享连接池并带超时，同一城市的天气在有效期内直接复用
+    return amap_weather.get_weather(location)
 
 
 tools = [
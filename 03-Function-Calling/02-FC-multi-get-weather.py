@@ -1,10 +1,11 @@
 from openai import OpenAI
 import os
-import requests
 import json
-import pandas as pd
 
 from dotenv import load_dotenv
+import amap_weather
+from city_lookup import lookup_city
+from tool_dispatcher import ToolDispatcher, tool_message
 
 load_dotenv()
 
@@ -26,30 +27,17 @@ def send_messages(messages):
     return response.choices[0].message
 
 
-# 高德地图 API 密钥
-# 从高德地图获取天气
-AMAP_API_KEY = os.getenv("AMAP_API_KEY")
-
-
 def search_city_code(args):
     if isinstance(args, str):
         args = json.loads(args)
     city_name = args.get("city_name")
-    
+
     try:
-        # 读取Excel文件，指定使用openpyxl引擎
-        df = pd.read_excel('./03-Function-Calling/data/AMap_adcode_citycode.xlsx', engine='openpyxl')
-        
-        # 打印前几行数据，用于调试
-        print("Debug - First few rows of dataframe:")
-        print(df.head())
-        print("\nDebug - Column names:", df.columns.tolist())
-        
-        # 使用模糊匹配
-        result = df[df.iloc[:, 0].str.contains(city_name, na=False)]
-        if not result.empty:
-            return {"adcode": str(result.iloc[0]['adcode'])}
-        
+        # 城市编码表在进程内只加载一次，之后按名称索引查找
+        result = lookup_city(city_name)
+        if result is not None:
+            return {"adcode": result["adcode"]}
+
         return {"error": f"City not found: {city_name}"}
     except Exception as e:
         return {"error": f"Error processing request: {str(e)}"}
@@ -59,9 +47,8 @@ def get_weather(args):
     if isinstance(args, str):
         args = json.loads(args)
     location = args.get("location")
-    url = f"https://restapi.amap.com/v3/weather/weatherInfo?city={location}&key={AMAP_API_KEY}"
-    response = requests.get(url)
-    return response.json()
+    # 共享连接池并带超时，同一城市的天气在有效期内直接复用
+    return amap_weather.get_weather(location)
 
 
 tools = [
@@ -102,6 +89,11 @@ tools = [
 ]
 
 
+dispatcher = ToolDispatcher(default_timeout=10)
+dispatcher.register("search_city_code", search_city_code)
+dispatcher.register("get_weather", get_weather)
+
+
 messages = [
     {
         "role": "system",
@@ -121,25 +113,11 @@ while True:
     # 处理工具调用
     messages.append({"role": "assistant", "content": message.content, "tool_calls": message.tool_calls})
     
-    # 执行所有工具调用
-    for tool_call in message.tool_calls:
-        function_name = tool_call.function.name
-        function_to_call = {
-            "get_weather": get_weather,
-            "search_city_code": search_city_code
-        }[function_name]
-        
-        function_args = tool_call.function.arguments
-        function_response = function_to_call(function_args)
-        
-        messages.append(
-            {
-                "role": "tool",
-                "tool_call_id": tool_call.id,
-                "content": str(function_response)
-            }
-        )
-        print(f"\n🛠️ Tool Call>\t {tool_call}")
-        print(f"📝 Function Name>\t {function_name}")
-        print(f"📋 Function Args>\t {function_args}")
-        print(f"📊 Function Response>\t {function_response}")
+    # 同一轮的工具调用并发执行（例如同时查询多个城市），结果按原顺序追加
+    for result in dispatcher.dispatch(message.tool_calls):
+        messages.append(tool_message(result))
+        print(f"\n🛠️ Tool Call>\t {result['tool_call_id']}")
+        print(f"📝 Function Name>\t {result['name']}")
+        print(f"📋 Function Args>\t {result['arguments']}")
+        print(f"📊 Function Response>\t {result['result']}")
+        print(f"⏱️ Duration>\t {result['duration']:.2f}s")
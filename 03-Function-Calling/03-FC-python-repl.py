@@ -1,12 +1,11 @@
 from openai import OpenAI
 import os
-import requests
 import json
-import pandas as pd
 from dotenv import load_dotenv
-import io
-import sys
-from contextlib import redirect_stdout, redirect_stderr
+import amap_weather
+from city_lookup import lookup_city
+from tool_dispatcher import ToolDispatcher, tool_message
+from python_sandbox import run_code
 
 load_dotenv()
 
@@ -28,31 +27,16 @@ def send_messages(messages):
     return response.choices[0].message
 
 
-# 高德地图 API 密钥
-# 从高德地图获取天气
-AMAP_API_KEY = os.getenv("AMAP_API_KEY")
-
-
 def search_city_code(args):
     if isinstance(args, str):
         args = json.loads(args)
     city_name = args.get("city_name")
 
     try:
-        # 读取Excel文件，指定使用openpyxl引擎
-        df = pd.read_excel(
-            "./03-Function-Calling/data/AMap_adcode_citycode.xlsx", engine="openpyxl"
-        )
-
-        # 打印前几行数据，用于调试
-        print("Debug - First few rows of dataframe:")
-        print(df.head())
-        print("\nDebug - Column names:", df.columns.tolist())
-
-        # 使用模糊匹配
-        result = df[df.iloc[:, 0].str.contains(city_name, na=False)]
-        if not result.empty:
-            return {"adcode": str(result.iloc[0]["adcode"])}
+        # 城市编码表在进程内只加载一次，之后按名称索引查找
+        result = lookup_city(city_name)
+        if result is not None:
+            return {"adcode": result["adcode"]}
 
         return {"error": f"City not found: {city_name}"}
     except Exception as e:
@@ -63,47 +47,18 @@ def get_weather(args):
     if isinstance(args, str):
         args = json.loads(args)
     location = args.get("location")
-
-    url = f"https://restapi.amap.com/v3/weather/weatherInfo?city={location}&key={AMAP_API_KEY}"
-    response = requests.get(url)
-    return response.json()
+    # 共享连接池并带超时，同一城市的天气在有效期内直接复用
+    return amap_weather.get_weather(location)
 
 
 def execute_python_code(args):
-    """执行 Python 代码并返回结果"""
+    """在预先启动的工作进程中执行 Python 代码并返回结果（仅限制资源，不是安全隔离）"""
     if isinstance(args, str):
         args = json.loads(args)
     code = args.get("code")
 
-    # 创建输出捕获
-    stdout = io.StringIO()
-    stderr = io.StringIO()
-
-    try:
-        # 重定向标准输出和错误输出
-        with redirect_stdout(stdout), redirect_stderr(stderr):
-            # 创建新的命名空间
-            local_vars = {}
-            # 执行代码
-            exec(code, globals(), local_vars)
-
-        # 获取输出
-        output = stdout.getvalue()
-        error = stderr.getvalue()
-
-        # 返回结果
-        result = {
-            "output": output,
-            "error": error,
-            "variables": {
-                k: str(v) for k, v in local_vars.items() if not k.startswith("_")
-            },
-        }
-
-    except Exception as e:
-        result = {"error": str(e), "output": "", "variables": {}}
-
-    return result
+    # 独立进程执行，限制 CPU 时间和内存，返回 output、error、variables
+    return run_code(code)
 
 
 tools = [
@@ -161,54 +116,54 @@ tools = [
 ]
 
 
-messages = [
-    {
-        "role": "system",
-        "content": """你是一个天气预报员和 Python 代码执行器。你可以：
-1. 使用 search_city_code 和 get_weather 函数获取天气信息
-2. 使用 execute_python_code 函数执行 Python 代码，比如温度转换等
-当你需要执行计算或转换时，请生成相应的 Python 代码并执行。""",
-    },
-    {"role": "user", "content": "杭州与北京今天多少度？华氏温度是多少？"},
-]
-
-while True:
-    message = send_messages(messages)
 
-    # 如果没有工具调用，直接打印回复并退出
-    if not message.tool_calls:
-        print(f"\n🤖 Assistant>\t {message.content}")
-        break
+def main():
+    # 各工具在线程池中并发执行；代码在 python_sandbox 的工作进程中运行，线程只等待结果
+    dispatcher = ToolDispatcher(default_timeout=10)
+    dispatcher.register("search_city_code", search_city_code)
+    dispatcher.register("get_weather", get_weather)
+    dispatcher.register("execute_python_code", execute_python_code, timeout=30)
 
-    # 处理工具调用
-    messages.append(
+    messages = [
         {
-            "role": "assistant",
-            "content": message.content,
-            "tool_calls": message.tool_calls,
-        }
-    )
+            "role": "system",
+            "content": """你是一个天气预报员和 Python 代码执行器。你可以：
+1. 使用 search_city_code 和 get_weather 函数获取天气信息
+2. 使用 execute_python_code 函数执行 Python 代码，比如温度转换等
+当你需要执行计算或转换时，请生成相应的 Python 代码并执行。""",
+        },
+        {"role": "user", "content": "杭州与北京今天多少度？华氏温度是多少？"},
+    ]
 
-    # 执行所有工具调用
-    for tool_call in message.tool_calls:
-        function_name = tool_call.function.name
-        function_to_call = {
-            "get_weather": get_weather,
-            "search_city_code": search_city_code,
-            "execute_python_code": execute_python_code,
-        }[function_name]
+    while True:
+        message = send_messages(messages)
 
-        function_args = tool_call.function.arguments
-        function_response = function_to_call(function_args)
+        # 如果没有工具调用，直接打印回复并退出
+        if not message.tool_calls:
+            print(f"\n🤖 Assistant>\t {message.content}")
+            break
 
+        # 处理工具调用
         messages.append(
             {
-                "role": "tool",
-                "tool_call_id": tool_call.id,
-                "content": str(function_response),
+                "role": "assistant",
+                "content": message.content,
+                "tool_calls": message.tool_calls,
             }
         )
-        print(f"\n🛠️ Tool Call>\t {tool_call}")
-        print(f"📝 Function Name>\t {function_name}")
-        print(f"📋 Function Args>\t {function_args}")
-        print(f"📊 Function Response>\t {function_response}")
+
+        # 同一轮的工具调用并发执行，结果按原顺序追加
+        for result in dispatcher.dispatch(message.tool_calls):
+            messages.append(tool_message(result))
+            print(f"\n🛠️ Tool Call>\t {result['tool_call_id']}")
+            print(f"📝 Function Name>\t {result['name']}")
+            print(f"📋 Function Args>\t {result['arguments']}")
+            print(f"📊 Function Response>\t {result['result']}")
+            print(f"⏱️ Duration>\t {result['duration']:.2f}s")
+
+    dispatcher.close()
+
+
+# 代码执行进程以 forkserver / spawn 方式启动时会重新导入本文件，对话循环只在直接运行时执行
+if __name__ == "__main__":
+    main()
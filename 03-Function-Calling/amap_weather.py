@@ -0,0 +1,158 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+"""
+本模块负责查询高德地图实时天气，供各个 function calling 示例共用：
+
+   导入时检查 AMAP_API_KEY，未配置时直接报错
+   get_weather(adcode) → 缓存未过期 → 直接返回
+                       → 同一城市已有请求在进行 → 等待该请求的结果
+                       → 否则通过共享的 requests.Session（连接池 + 超时）请求高德接口 → 成功的结果缓存 ttl 秒
+"""
+
+
+AMAP_API_KEY = (os.getenv("AMAP_API_KEY") or "").strip()
+AMAP_WEATHER_URL = "https://restapi.amap.com/v3/weather/weatherInfo"
+
+# 天气约几十分钟更新一次，同一城市的结果缓存 10 分钟
+WEATHER_CACHE_TTL = 600
+# (连接超时, 读取超时)，单位秒
+WEATHER_TIMEOUT = (3.05, 5)
+
+
+class TTLCache:
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        """带过期时间的线程安全缓存，同一个键的并发加载合并为一次
+
+        Args:
+            ttl: 结果的有效期（秒）
+            max_entries: 最多缓存的结果数量，超出后淘汰最久未访问的结果
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.inflight: Dict[str, threading.Event] = {}
+        self.lock = threading.Lock()
+
+    def _get_fresh(self, key: str) -> Tuple[bool, Any]:
+        """查找未过期的结果（调用方持有锁）"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            return False, None
+        self.entries.move_to_end(key)
+        return True, value
+
+    def get(
+        self,
+        key: str,
+        loader: Callable[[], Any],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """获取缓存结果，未命中时调用 loader 加载
+
+        同一个键同时只有一个线程调用 loader，其他线程等待其完成后读取缓存；
+        加载失败或结果不可缓存时，等待的线程各自重新加载。
+        缓存的结果以深拷贝返回，调用方修改返回值不会影响缓存。
+
+        Args:
+            key: 缓存键
+            loader: 无参数的加载函数
+            cacheable: 判断结果是否可以缓存，默认全部缓存
+
+        Returns:
+            Any: 缓存或新加载的结果
+        """
+        while True:
+            with self.lock:
+                hit, value = self._get_fresh(key)
+                if hit:
+                    return copy.deepcopy(value)
+                event = self.inflight.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self.inflight[key] = event
+                    break
+            event.wait()
+
+        try:
+            value = loader()
+            if cacheable is not None and not cacheable(value):
+                return value
+            with self.lock:
+                self.entries[key] = (time.monotonic() + self.ttl, value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            return copy.deepcopy(value)
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            event.set()
+
+
+def _create_session() -> requests.Session:
+    """创建带连接池的会话，复用与高德接口的 TCP/TLS 连接
+
+    Raises:
+        RuntimeError: 未配置 AMAP_API_KEY 时抛出，避免以空密钥请求高德接口
+    """
+    if not AMAP_API_KEY:
+        raise RuntimeError("未配置 AMAP_API_KEY，请在环境变量或 .env 文件中设置高德地图的 API 密钥")
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return session
+
+
+session = _create_session()
+weather_cache = TTLCache(WEATHER_CACHE_TTL)
+
+
+def fetch_weather(adcode: str) -> Dict[str, Any]:
+    """直接请求高德天气接口，不经过缓存
+
+    Raises:
+        requests.RequestException: 网络错误或超时时抛出
+    """
+    response = session.get(
+        AMAP_WEATHER_URL,
+        params={"city": adcode, "key": AMAP_API_KEY},
+        timeout=WEATHER_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def get_weather(adcode: str) -> Dict[str, Any]:
+    """获取城市的实时天气，优先返回缓存结果
+
+    只缓存高德返回成功（status 为 "1"）的结果，错误信息原样返回但不缓存。
+
+    Args:
+        adcode: 高德城市编码
+
+    Returns:
+        Dict[str, Any]: 高德天气接口返回的数据
+
+    Raises:
+        requests.RequestException: 网络错误或超时时抛出
+    """
+    adcode = str(adcode).strip()
+    return weather_cache.get(
+        adcode,
+        lambda: fetch_weather(adcode),
+        cacheable=lambda data: data.get("status") == "1",
+    )
@@ -0,0 +1,204 @@
+import os
+import bisect
+import pickle
+import threading
+from typing import Dict, List, Optional
+import pandas as pd
+
+
+"""
+本模块负责根据城市名称查找高德地图的城市编码（adcode），供各个 function calling 示例共用。
+
+   AMap_adcode_citycode.xlsx → 首次加载时解析并保存快照（.pkl，按 xlsx 的修改时间和大小失效）
+                             → 构建索引：精确名称 / 去掉行政区划后缀的简称 / 按名称排序的前缀表 / 子串扫描
+                             → 查找顺序：精确 → 简称 → 前缀 → 子串，同一级别内取表中靠前的记录
+
+   只在进程内加载一次，之后每次查找只是字典或二分查找，不再读取 Excel。
+"""
+
+
+DEFAULT_XLSX_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "AMap_adcode_citycode.xlsx"
+)
+
+# 生成简称时去掉的行政区划后缀，较长的后缀在前
+ADMIN_SUFFIXES = (
+    "特别行政区",
+    "自治区",
+    "自治州",
+    "自治县",
+    "自治旗",
+    "地区",
+    "新区",
+    "林区",
+    "省",
+    "市",
+    "区",
+    "县",
+    "盟",
+    "旗",
+)
+
+
+def short_name(name: str) -> Optional[str]:
+    """去掉行政区划后缀得到简称，例如 杭州市 → 杭州；简称不足两个字时返回 None"""
+    for suffix in ADMIN_SUFFIXES:
+        if name.endswith(suffix) and len(name) - len(suffix) >= 2:
+            return name[: -len(suffix)]
+    return None
+
+
+def load_table(xlsx_path: str = DEFAULT_XLSX_PATH) -> Dict[str, list]:
+    """读取城市编码表，优先使用快照
+
+    快照中记录了生成时 xlsx 的修改时间和大小，两者任一变化即重新解析 Excel 并覆盖快照。
+
+    Args:
+        xlsx_path: 高德地图城市编码表路径
+
+    Returns:
+        Dict[str, list]: 按表中顺序排列的 names、adcodes、citycodes 列表
+    """
+    stat = os.stat(xlsx_path)
+    source = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    cache_path = os.path.splitext(xlsx_path)[0] + ".pkl"
+    try:
+        with open(cache_path, "rb") as f:
+            snapshot = pickle.load(f)
+        if snapshot.get("source") == source:
+            return snapshot["table"]
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError):
+        pass
+
+    df = pd.read_excel(xlsx_path, engine="openpyxl")
+    table = {
+        "names": [str(name).strip() for name in df.iloc[:, 0]],
+        "adcodes": [str(code) for code in df["adcode"]],
+        "citycodes": [
+            None if pd.isna(code) else str(int(code)).zfill(3) for code in df["citycode"]
+        ],
+    }
+
+    # 先写入临时文件再替换，多个进程同时生成快照时不会读到不完整的文件
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"source": source, "table": table}, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"城市编码快照保存失败: {str(e)}")
+    return table
+
+
+class CityIndex:
+    def __init__(self, table: Dict[str, list]):
+        """构建城市名称索引
+
+        Args:
+            table: load_table 返回的城市编码表
+        """
+        self.names: List[str] = table["names"]
+        self.adcodes: List[str] = table["adcodes"]
+        self.citycodes: List[Optional[str]] = table["citycodes"]
+
+        # 名称 / 简称 → 表中第一条记录的行号
+        self.exact: Dict[str, int] = {}
+        self.short: Dict[str, int] = {}
+        for row, name in enumerate(self.names):
+            self.exact.setdefault(name, row)
+            alias = short_name(name)
+            if alias is not None:
+                self.short.setdefault(alias, row)
+
+        # 按名称排序的 (名称, 行号)，前缀查找时二分定位
+        self.sorted_names = sorted((name, row) for row, name in enumerate(self.names))
+        self.sorted_keys = [name for name, _ in self.sorted_names]
+
+        # 所有名称以换行连接，子串查找时在整个字符串上做一次 find，再由偏移量换算行号
+        self.joined = "\n".join(self.names)
+        self.starts = []
+        offset = 0
+        for name in self.names:
+            self.starts.append(offset)
+            offset += len(name) + 1
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _record(self, row: int) -> Dict[str, Optional[str]]:
+        return {
+            "name": self.names[row],
+            "adcode": self.adcodes[row],
+            "citycode": self.citycodes[row],
+        }
+
+    def _prefix_row(self, prefix: str) -> Optional[int]:
+        """以 prefix 开头的名称中表内最靠前的行号"""
+        lo = bisect.bisect_left(self.sorted_keys, prefix)
+        hi = bisect.bisect_left(self.sorted_keys, prefix + "\uffff", lo)
+        if lo == hi:
+            return None
+        return min(row for _, row in self.sorted_names[lo:hi])
+
+    def _substring_row(self, text: str) -> Optional[int]:
+        """包含 text 的名称中表内最靠前的行号"""
+        pos = self.joined.find(text)
+        if pos < 0:
+            return None
+        return bisect.bisect_right(self.starts, pos) - 1
+
+    def lookup(self, city_name: str) -> Optional[Dict[str, Optional[str]]]:
+        """根据城市名称查找城市编码
+
+        Args:
+            city_name: 城市名称，可以是全称（杭州市）、简称（杭州）或名称的一部分
+
+        Returns:
+            Optional[Dict[str, Optional[str]]]: 匹配记录的 name、adcode、citycode，找不到时返回 None
+        """
+        city_name = (city_name or "").strip()
+        if not city_name or "\n" in city_name:
+            return None
+
+        row = self.exact.get(city_name)
+        if row is None:
+            row = self.short.get(city_name)
+        if row is None:
+            alias = short_name(city_name)
+            if alias is not None:
+                row = self.exact.get(alias, self.short.get(alias))
+        if row is None:
+            row = self._prefix_row(city_name)
+        if row is None:
+            row = self._substring_row(city_name)
+        return None if row is None else self._record(row)
+
+
+_indexes: Dict[str, CityIndex] = {}
+_lock = threading.Lock()
+
+
+def get_city_index(xlsx_path: str = DEFAULT_XLSX_PATH) -> CityIndex:
+    """获取进程内共享的城市名称索引，首次调用时加载
+
+    Args:
+        xlsx_path: 高德地图城市编码表路径
+
+    Returns:
+        CityIndex: 城市名称索引
+    """
+    index = _indexes.get(xlsx_path)
+    if index is None:
+        with _lock:
+            index = _indexes.get(xlsx_path)
+            if index is None:
+                index = CityIndex(load_table(xlsx_path))
+                _indexes[xlsx_path] = index
+    return index
+
+
+def lookup_city(
+    city_name: str, xlsx_path: str = DEFAULT_XLSX_PATH
+) -> Optional[Dict[str, Optional[str]]]:
+    """根据城市名称查找城市编码，见 CityIndex.lookup"""
+    return get_city_index(xlsx_path).lookup(city_name)
@@ -0,0 +1,317 @@
+import atexit
+import importlib
+import io
+import multiprocessing
+import os
+import queue
+import signal
+import tempfile
+import threading
+from contextlib import redirect_stdout, redirect_stderr
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，只能依靠超时终止进程
+    resource = None
+
+
+"""
+本模块负责在独立的子进程中执行模型生成的 Python 代码：
+
+   启动时预先创建 size 个工作进程 → 每个进程预先导入常用模块（pandas 等）并设置内存上限
+   run(code) → 取一个空闲进程 → 通过管道发送代码 → 进程设置本次的 CPU 时间上限后执行
+             → 通过管道返回 output / error / variables
+             → 超时或进程异常退出时终止该进程；执行满 max_runs 次后回收
+             → 被终止或回收的进程在后台补充新的进程
+
+   每次执行使用全新的命名空间，不同调用之间不共享变量；代码无法访问主进程的内存。
+
+   注意：这里只做资源限制（CPU、内存、执行时间）和进程隔离，不是安全沙箱。
+   工作进程以当前用户身份运行，代码仍然可以 import os / subprocess / socket，
+   读写该用户能访问的文件、访问网络。工作进程会清除环境变量（不继承 API 密钥等）
+   并在临时目录中运行，但这只能避免误用，不能阻止有意的访问。
+   只应执行可信来源的代码；需要隔离不可信代码时，应在容器或专用低权限用户下运行。
+"""
+
+
+# 工作进程保留的环境变量，其余（包括 API 密钥）在执行代码前清除
+KEEP_ENV = ("PATH", "LANG", "LC_ALL", "TZ")
+
+# 工作进程预先导入的模块：(模块名, 在代码中使用的名称)
+PRELOAD_MODULES = (
+    ("pandas", "pd"),
+    ("numpy", "np"),
+    ("math", "math"),
+    ("json", "json"),
+    ("datetime", "datetime"),
+)
+
+
+def _limit_memory(memory_mb: int):
+    """限制地址空间为当前大小加 memory_mb，预先导入的模块不计入额度
+
+    Linux 不支持限制 RSS（RLIMIT_RSS 不生效），以地址空间上限近似；超出时代码内抛出 MemoryError。
+    """
+    if resource is None or not memory_mb:
+        return
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    soft = current + memory_mb * 1024 * 1024
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def _limit_cpu(cpu_seconds: int):
+    """将 CPU 时间上限设置为已用时间加 cpu_seconds，超出时进程收到 SIGXCPU 被终止"""
+    if resource is None or not cpu_seconds:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _scrub_process():
+    """清除环境变量并切换到系统临时目录，避免代码顺手读到密钥或用相对路径改动项目文件"""
+    kept = {key: os.environ[key] for key in KEEP_ENV if key in os.environ}
+    os.environ.clear()
+    os.environ.update(kept)
+    os.chdir(tempfile.gettempdir())
+
+
+def _execute(code: str, base: Dict[str, Any]) -> Dict[str, Any]:
+    """在基于 base 的新命名空间中执行代码，返回输出、错误和新定义的变量"""
+    namespace = dict(base)
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            exec(code, namespace)
+    except (Exception, SystemExit) as e:
+        return {
+            "error": f"{type(e).__name__}: {str(e)}" if str(e) else type(e).__name__,
+            "output": stdout.getvalue(),
+            "variables": {},
+        }
+    return {
+        "output": stdout.getvalue(),
+        "error": stderr.getvalue(),
+        "variables": {
+            k: str(v)
+            for k, v in namespace.items()
+            if not k.startswith("_") and k not in base
+        },
+    }
+
+
+def _worker_main(
+    conn, preload: Sequence[Tuple[str, str]], cpu_seconds: int, memory_mb: int
+):
+    """工作进程入口：预先导入模块，之后循环接收代码并返回执行结果，收到 None 时退出"""
+    base = {"__name__": "__main__"}
+    for module_name, alias in preload:
+        try:
+            base[alias] = importlib.import_module(module_name)
+        except ImportError:
+            pass
+    _scrub_process()
+    _limit_memory(memory_mb)
+    conn.send("ready")
+
+    while True:
+        try:
+            code = conn.recv()
+        except (EOFError, OSError):
+            break
+        if code is None:
+            break
+        _limit_cpu(cpu_seconds)
+        conn.send(_execute(code, base))
+
+
+class SandboxWorker:
+    def __init__(self, ctx, preload, cpu_seconds: int, memory_mb: int):
+        """启动一个工作进程"""
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, preload, cpu_seconds, memory_mb),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.runs = 0
+
+    def wait_ready(self, timeout: float) -> bool:
+        """等待预先导入完成"""
+        try:
+            return self.conn.poll(timeout) and self.conn.recv() == "ready"
+        except (EOFError, OSError):
+            return False
+
+    def stop(self):
+        """通知进程退出，未及时退出时强制终止"""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    def __init__(
+        self,
+        size: int = 2,
+        max_runs: int = 50,
+        timeout: float = 15.0,
+        cpu_seconds: int = 10,
+        memory_mb: int = 512,
+        preload: Sequence[Tuple[str, str]] = PRELOAD_MODULES,
+        start_timeout: float = 60.0,
+    ):
+        """初始化代码执行进程池，并在后台启动工作进程
+
+        Args:
+            size: 工作进程数量，即可以同时执行的代码数量
+            max_runs: 每个工作进程最多执行的次数，达到后回收并启动新的进程
+            timeout: 单次执行的最长时间（秒），超出后终止工作进程
+            cpu_seconds: 单次执行的 CPU 时间上限（秒），为 0 时不限制
+            memory_mb: 执行代码可以额外使用的内存（MB），为 0 时不限制
+            preload: 工作进程预先导入的模块，见 PRELOAD_MODULES
+            start_timeout: 等待工作进程启动（包括预先导入模块）的最长时间（秒）
+        """
+        self.size = size
+        self.max_runs = max_runs
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.preload = tuple(preload)
+        self.start_timeout = start_timeout
+
+        # forkserver 进程只导入一次预加载模块，之后从它 fork 出的工作进程无需重新导入
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self.ctx = multiprocessing.get_context("forkserver")
+            self.ctx.set_forkserver_preload(
+                [__name__] + [module_name for module_name, _ in self.preload]
+            )
+        else:
+            self.ctx = multiprocessing.get_context("spawn")
+
+        self.idle: "queue.Queue[SandboxWorker]" = queue.Queue()
+        self.closed = False
+        for _ in range(size):
+            self._replenish()
+
+    def _start_worker(self):
+        """启动一个工作进程，预先导入完成后放入空闲队列"""
+        if self.closed:
+            return
+        worker = SandboxWorker(self.ctx, self.preload, self.cpu_seconds, self.memory_mb)
+        if not worker.wait_ready(self.start_timeout):
+            if not self.closed:
+                print("代码执行进程启动失败")
+            worker.kill()
+            return
+        if self.closed:
+            worker.stop()
+            return
+        self.idle.put(worker)
+
+    def _replenish(self):
+        """在后台补充一个工作进程，不阻塞当前调用"""
+        threading.Thread(target=self._start_worker, daemon=True).start()
+
+    def _exit_reason(self, worker: SandboxWorker) -> str:
+        worker.process.join(1)
+        exitcode = worker.process.exitcode
+        if hasattr(signal, "SIGXCPU") and exitcode == -signal.SIGXCPU:
+            return f"超出 CPU 时间限制（{self.cpu_seconds} 秒）"
+        return f"执行进程异常退出（退出码 {exitcode}）"
+
+    def run(self, code: str) -> Dict[str, Any]:
+        """在空闲的工作进程中执行代码
+
+        Args:
+            code: 要执行的 Python 代码
+
+        Returns:
+            Dict[str, Any]: output（标准输出）、error（标准错误或异常信息）和 variables（新定义的变量）
+        """
+        if self.closed:
+            return {"error": "代码执行进程池已关闭", "output": "", "variables": {}}
+        try:
+            worker = self.idle.get(timeout=self.start_timeout)
+        except queue.Empty:
+            return {"error": "没有可用的代码执行进程", "output": "", "variables": {}}
+
+        healthy = False
+        try:
+            worker.conn.send(code)
+            if not worker.conn.poll(self.timeout):
+                worker.kill()
+                return {
+                    "error": f"执行超时（{self.timeout:.0f} 秒）",
+                    "output": "",
+                    "variables": {},
+                }
+            result = worker.conn.recv()
+            worker.runs += 1
+            healthy = True
+            return result
+        except (EOFError, OSError):
+            return {"error": self._exit_reason(worker), "output": "", "variables": {}}
+        finally:
+            if healthy and worker.runs < self.max_runs and not self.closed:
+                self.idle.put(worker)
+            else:
+                if worker.process.is_alive():
+                    worker.stop()
+                else:
+                    worker.conn.close()
+                self._replenish()
+
+    def close(self):
+        """关闭进程池，停止所有空闲的工作进程"""
+        self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+_default_pool: Optional[SandboxPool] = None
+_default_lock = threading.Lock()
+
+
+def get_default_pool() -> SandboxPool:
+    """获取进程内共享的代码执行进程池，首次调用时创建，退出时自动关闭"""
+    global _default_pool
+    if _default_pool is None:
+        with _default_lock:
+            if _default_pool is None:
+                _default_pool = SandboxPool()
+                atexit.register(_default_pool.close)
+    return _default_pool
+
+
+def run_code(code: str) -> Dict[str, Any]:
+    """在共享的进程池中执行代码，见 SandboxPool.run"""
+    return get_default_pool().run(code)
@@ -0,0 +1,109 @@
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+import city_lookup
+from city_lookup import CityIndex, load_table
+
+
+"""
+city_lookup 的测试：查找顺序，以及 xlsx 变化后快照失效。
+
+   python -m unittest test_city_lookup
+"""
+
+
+ROWS = [
+    ("中华人民共和国", "100000", None),
+    ("浙江省", "330000", None),
+    ("杭州市", "330100", 571),
+    ("西湖区", "330106", 571),
+    ("杭州湾新区", "330282", 574),
+    ("宁夏回族自治区", "640000", None),
+]
+
+
+def write_xlsx(path: str, rows):
+    pd.DataFrame(
+        {
+            "中文名": [name for name, _, _ in rows],
+            "adcode": [adcode for _, adcode, _ in rows],
+            "citycode": [citycode for _, _, citycode in rows],
+        }
+    ).to_excel(path, index=False, engine="openpyxl")
+
+
+class CityIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = CityIndex(
+            {
+                "names": [name for name, _, _ in ROWS],
+                "adcodes": [adcode for _, adcode, _ in ROWS],
+                "citycodes": [None if c is None else str(c).zfill(3) for _, _, c in ROWS],
+            }
+        )
+
+    def adcode(self, name: str):
+        record = self.index.lookup(name)
+        return None if record is None else record["adcode"]
+
+    def test_lookup_order(self):
+        self.assertEqual(self.adcode("杭州市"), "330100")  # 精确
+        self.assertEqual(self.adcode("杭州"), "330100")  # 简称
+        self.assertEqual(self.adcode("浙江"), "330000")
+        self.assertEqual(self.adcode("西湖"), "330106")
+        self.assertEqual(self.adcode("杭州县"), "330100")  # 去掉后缀后按简称查找
+        self.assertEqual(self.adcode("宁夏"), "640000")  # 前缀
+        self.assertEqual(self.adcode("湾新"), "330282")  # 子串
+        self.assertEqual(self.index.lookup("杭州")["citycode"], "571")
+
+    def test_misses(self):
+        self.assertIsNone(self.index.lookup("北京"))
+        self.assertIsNone(self.index.lookup(""))
+        self.assertIsNone(self.index.lookup("杭州\n西湖"))
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.xlsx_path = os.path.join(self.tmp.name, "codes.xlsx")
+        self.cache_path = os.path.join(self.tmp.name, "codes.pkl")
+        write_xlsx(self.xlsx_path, ROWS)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_snapshot_is_reused(self):
+        table = load_table(self.xlsx_path)
+        self.assertTrue(os.path.exists(self.cache_path))
+        with mock.patch.object(city_lookup.pd, "read_excel") as read_excel:
+            self.assertEqual(load_table(self.xlsx_path), table)
+        read_excel.assert_not_called()
+
+    def test_stale_snapshot_after_xlsx_changes(self):
+        load_table(self.xlsx_path)
+        stat = os.stat(self.xlsx_path)
+
+        write_xlsx(self.xlsx_path, ROWS + [("北京市", "110000", 10)])
+        # 保证修改时间变化，不依赖文件系统的时间精度
+        os.utime(self.xlsx_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        table = load_table(self.xlsx_path)
+        self.assertEqual(table["names"][-1], "北京市")
+        self.assertEqual(table["citycodes"][-1], "010")
+        with open(self.cache_path, "rb") as f:
+            self.assertEqual(pickle.load(f)["table"], table)
+
+    def test_corrupt_snapshot_is_rebuilt(self):
+        with open(self.cache_path, "wb") as f:
+            f.write(b"not a pickle")
+        table = load_table(self.xlsx_path)
+        self.assertEqual(table["adcodes"][:3], ["100000", "330000", "330100"])
+        with open(self.cache_path, "rb") as f:
+            self.assertEqual(pickle.load(f)["table"], table)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import asyncio
+import inspect
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+"""
+本模块负责并发执行模型在同一轮中返回的多个工具调用：
+
+   message.tool_calls → 按工具类型分派
+                          io  （网络请求等）→ 线程池，async 函数直接在事件循环中执行
+                          cpu （计算、代码执行）→ 进程池
+                      → 每个调用单独超时 → 按 tool_calls 原始顺序返回结果
+
+   超时、未知工具和异常都转换为 {"error": ...} 结果返回给模型，不中断整轮调用。
+   超时后不再等待该调用，但已经开始执行的线程或进程不会被强制终止。
+"""
+
+
+TOOL_KINDS = ("io", "cpu")
+
+
+class ToolDispatcher:
+    def __init__(self, default_timeout: float = 30.0, max_workers: Optional[int] = None):
+        """初始化工具调度器
+
+        Args:
+            default_timeout: 注册工具时未指定超时时间时使用的超时时间（秒）
+            max_workers: 线程池大小，进程池大小为该值与 CPU 核数的较小值；默认按 CPU 核数计算
+        """
+        self.default_timeout = default_timeout
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.tools: Dict[str, Dict[str, Any]] = {}
+        self.thread_pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="tool"
+        )
+        self.process_pool: Optional[ProcessPoolExecutor] = None
+
+    def register(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        kind: str = "io",
+        timeout: Optional[float] = None,
+    ):
+        """注册工具
+
+        Args:
+            name: 工具名称，与 tools 定义中的 function.name 一致
+            func: 工具函数，接收模型返回的参数（JSON 字符串）；cpu 类型的函数需要可以被 pickle
+            kind: 工具类型，io 或 cpu（见 TOOL_KINDS）
+            timeout: 单次调用的超时时间（秒）
+
+        Raises:
+            ValueError: 工具类型不支持时抛出
+        """
+        if kind not in TOOL_KINDS:
+            raise ValueError(f"不支持的工具类型: {kind}")
+        self.tools[name] = {
+            "func": func,
+            "kind": kind,
+            "timeout": timeout or self.default_timeout,
+        }
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(
+                max_workers=min(self.max_workers, os.cpu_count() or 1)
+            )
+        return self.process_pool
+
+    async def _call(self, name: str, arguments: str) -> Any:
+        """执行单个工具调用，异常转换为错误结果"""
+        tool = self.tools.get(name)
+        if tool is None:
+            return {"error": f"Unknown tool: {name}"}
+
+        func = tool["func"]
+        loop = asyncio.get_running_loop()
+        if inspect.iscoroutinefunction(func):
+            call = func(arguments)
+        elif tool["kind"] == "cpu":
+            call = loop.run_in_executor(self._get_process_pool(), func, arguments)
+        else:
+            call = loop.run_in_executor(self.thread_pool, func, arguments)
+
+        try:
+            return await asyncio.wait_for(call, timeout=tool["timeout"])
+        except asyncio.TimeoutError:
+            return {"error": f"Tool {name} timed out after {tool['timeout']:.1f}s"}
+        except Exception as e:
+            return {"error": f"Error processing request: {str(e)}"}
+
+    async def _run(self, tool_call) -> Dict[str, Any]:
+        name = tool_call.function.name
+        arguments = tool_call.function.arguments
+        start_time = time.perf_counter()
+        result = await self._call(name, arguments)
+        return {
+            "tool_call_id": tool_call.id,
+            "name": name,
+            "arguments": arguments,
+            "result": result,
+            "duration": time.perf_counter() - start_time,
+        }
+
+    async def dispatch_async(self, tool_calls: List[Any]) -> List[Dict[str, Any]]:
+        """并发执行一轮工具调用
+
+        Args:
+            tool_calls: 模型返回的 message.tool_calls
+
+        Returns:
+            List[Dict[str, Any]]: 与 tool_calls 顺序一致的结果，每个结果包含
+                tool_call_id、name、arguments、result 和耗时 duration（秒）
+        """
+        return await asyncio.gather(*(self._run(tool_call) for tool_call in tool_calls))
+
+    def dispatch(self, tool_calls: List[Any]) -> List[Dict[str, Any]]:
+        """dispatch_async 的同步版本，供同步的 agent 循环使用"""
+        return asyncio.run(self.dispatch_async(tool_calls))
+
+    def close(self):
+        """关闭线程池和进程池，不等待超时后仍在执行的调用"""
+        self.thread_pool.shutdown(wait=False, cancel_futures=True)
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+            self.process_pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def tool_message(result: Dict[str, Any]) -> Dict[str, str]:
+    """将调度结果转换为追加到对话中的 tool 消息"""
+    return {
+        "role": "tool",
+        "tool_call_id": result["tool_call_id"],
+        "content": str(result["result"]),
+    }
@@ -1,11 +1,9 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
+from typing import List, AsyncGenerator
+from app.core.clients import llm_clients
+import json
 
 router = APIRouter()
 
@@ -22,14 +20,11 @@ class ChatResponse(BaseModel):
 @router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     try:
-        # 初始化 OpenAI 客户端
-        client = OpenAI(
-            api_key=os.getenv("DEEPSEEK_API_KEY"),
-            base_url=os.getenv("DEEPSEEK_BASE_URL")
-        )
+        # 获取共享的 DeepSeek 客户端
+        client = llm_clients.get("deepseek")
         
         # 调用 DeepSeek API
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="deepseek-v3",
             messages=[msg.dict() for msg in request.messages],
             stream=False
@@ -39,4 +34,66 @@ async def chat(request: ChatRequest):
             response=response.choices[0].message.content
         )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e)) 
+
+
+def format_sse(event: str, data: dict) -> str:
+    """格式化一条 SSE 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_chat_events(client, request: ChatRequest) -> AsyncGenerator[str, None]:
+    """将上游的流式增量转换为 SSE 事件
+
+    思考过程（reasoning_content）以 reasoning 事件发送，回复内容以 content 事件发送。
+    生成器每次只在上一条消息被客户端消费后才拉取下一个增量，
+    客户端读取较慢时上游读取也随之放缓，形成自然的背压。
+    """
+    try:
+        response = await client.chat.completions.create(
+            model="deepseek-v3",
+            messages=[msg.dict() for msg in request.messages],
+            stream=True
+        )
+    except Exception as e:
+        yield format_sse("error", {"detail": str(e)})
+        return
+
+    try:
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            # 获取思考过程（仅推理模型返回）
+            reasoning_chunk = getattr(delta, "reasoning_content", None)
+            # 获取回复
+            answer_chunk = delta.content
+            if reasoning_chunk:
+                yield format_sse("reasoning", {"delta": reasoning_chunk})
+            if answer_chunk:
+                yield format_sse("content", {"delta": answer_chunk})
+        yield format_sse("done", {})
+    except Exception as e:
+        yield format_sse("error", {"detail": str(e)})
+    finally:
+        # 客户端断开时关闭上游连接，避免继续消耗 token
+        await response.close()
+
+
+@router.post("/stream")
+async def chat_stream(request: ChatRequest):
+    """流式聊天接口，以 Server-Sent Events 形式逐块返回"""
+    try:
+        client = llm_clients.get("deepseek")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(
+        stream_chat_events(client, request),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # 关闭 Nginx 等反向代理的缓冲，保证首个 token 立即送达
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -0,0 +1,137 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Any, Dict, Iterator, List, Optional
+from app.api.v1.chat import format_sse
+from app.core.rag import rag_service
+
+router = APIRouter()
+
+class RagRequest(BaseModel):
+    query: str
+    k: int = 10  # 检索的候选数量
+    top_n: int = 5  # 返回（或作为上下文）的文档数量
+    rerank: bool = True
+    mode: str = "hybrid"  # 检索方式：vector、keyword 或 hybrid（向量与关键词融合）
+
+class RagDocument(BaseModel):
+    content: str
+    score: float
+    similarity: float
+    metadata: dict = {}
+
+class RagQueryResponse(BaseModel):
+    documents: List[RagDocument]
+    index_version: Optional[str] = None
+
+class RagAnswerResponse(BaseModel):
+    answer: str
+    documents: List[RagDocument]
+    index_version: Optional[str] = None
+    cached: bool = False  # 是否直接返回了相近问题的缓存回答
+
+class RagStatusResponse(BaseModel):
+    ready: bool
+    index_path: str
+    index_version: Optional[str] = None
+    documents: int = 0
+
+@router.post("/query", response_model=RagQueryResponse)
+async def rag_query(request: RagRequest):
+    try:
+        result = await rag_service.query(
+            request.query, request.k, request.top_n, request.rerank, request.mode
+        )
+        return RagQueryResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/answer", response_model=RagAnswerResponse)
+async def rag_answer(request: RagRequest):
+    try:
+        result = await rag_service.answer(
+            request.query, request.k, request.top_n, request.rerank, request.mode
+        )
+        return RagAnswerResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def stream_answer_events(result: Dict[str, Any]) -> Iterator[str]:
+    """将引用文档和回答的增量片段转换为 SSE 事件
+
+    先发送 documents 事件（引用文档、索引版本和是否命中缓存），再逐个发送 content 事件，
+    最后发送 done 事件；生成失败时发送 error 事件。
+    同步生成器由 StreamingResponse 在线程池中迭代，不阻塞事件循环。
+    """
+    documents = [RagDocument(**doc).dict() for doc in result["documents"]]
+    yield format_sse(
+        "documents",
+        {
+            "documents": documents,
+            "index_version": result["index_version"],
+            "cached": result["cached"],
+        },
+    )
+    deltas = result["deltas"]
+    try:
+        for delta in deltas:
+            yield format_sse("content", {"delta": delta})
+        yield format_sse("done", {})
+    except Exception as e:
+        yield format_sse("error", {"detail": str(e)})
+    finally:
+        # 客户端断开时关闭上游连接，避免继续生成
+        deltas.close()
+
+@router.post("/answer/stream")
+async def rag_answer_stream(request: RagRequest):
+    """流式 RAG 问答接口，检索完成后以 Server-Sent Events 形式逐块返回回答"""
+    try:
+        result = await rag_service.answer_stream(
+            request.query, request.k, request.top_n, request.rerank, request.mode
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(
+        stream_answer_events(result),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+@router.post("/reload", response_model=RagStatusResponse)
+async def rag_reload():
+    try:
+        await rag_service.reload()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return await rag_status()
+
+@router.get("/status", response_model=RagStatusResponse)
+async def rag_status():
+    snapshot = rag_service.snapshot
+    return RagStatusResponse(
+        ready=snapshot is not None,
+        index_path=rag_service.index_path,
+        index_version=snapshot.version if snapshot else None,
+        documents=len(snapshot.emb_processor.texts) if snapshot else 0,
+    )
@@ -1,10 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
+from app.core.clients import llm_clients
 
 router = APIRouter()
 
@@ -20,11 +16,8 @@ class RedbookResponse(BaseModel):
 @router.post("/redbook", response_model=RedbookResponse)
 async def generate_redbook(request: RedbookRequest):
     try:
-        # 初始化 OpenAI 客户端
-        client = OpenAI(
-            api_key=os.getenv("DEEPSEEK_API_KEY"),
-            base_url=os.getenv("DEEPSEEK_BASE_URL")
-        )
+        # 获取共享的 DeepSeek 客户端
+        client = llm_clients.get("deepseek")
 
         # 构建系统提示词
         system_prompt = f"""
@@ -87,7 +80,7 @@ async def generate_redbook(request: RedbookRequest):
         """
 
         # 调用 DeepSeek API
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="deepseek-v3",
             messages=[
                 {"role": "system", "content": system_prompt},
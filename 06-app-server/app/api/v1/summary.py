@@ -1,10 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
+from app.core.clients import llm_clients
 
 router = APIRouter()
 
@@ -18,11 +14,8 @@ class SummaryResponse(BaseModel):
 @router.post("/summary", response_model=SummaryResponse)
 async def create_summary(request: SummaryRequest):
     try:
-        # 初始化 OpenAI 客户端
-        client = OpenAI(
-            api_key=os.getenv("DEEPSEEK_API_KEY"),
-            base_url=os.getenv("DEEPSEEK_BASE_URL")
-        )
+        # 获取共享的 DeepSeek 客户端
+        client = llm_clients.get("deepseek")
 
         # 构建提示词
         prompt = f"""
@@ -39,7 +32,7 @@ async def create_summary(request: SummaryRequest):
         """
 
         # 调用 DeepSeek API
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="deepseek-v3",
             messages=[
                 {"role": "system", "content": prompt},
@@ -1,55 +1,43 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
-import requests
+from typing import AsyncGenerator, List, Optional, Tuple
+from app.api.v1.chat import format_sse
+from app.core.clients import llm_clients
+from app.core.config import settings
+from app.core.weather import weather_service
+import asyncio
 import json
 import logging
+import re
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
 router = APIRouter()
 
 class WeatherRequest(BaseModel):
-    location: str
+    location: str  # 城市名称或高德城市编码（adcode），为 6 位数字编码时跳过工具选择
+    prose: bool = False  # 是否由模型生成自然语言描述；为 False 时直接用天气数据生成描述
 
 class WeatherResponse(BaseModel):
     weather_info: dict
     description: str = ""
 
-# 高德地图 API 密钥
-AMAP_API_KEY = os.getenv("AMAP_API_KEY")
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL")
+# 6 位数字的高德城市编码
+ADCODE_PATTERN = re.compile(r"^\d{6}$")
 
-def get_weather(location: str) -> dict:
-    """直接调用高德地图 API 获取天气信息"""
-    if not AMAP_API_KEY:
-        raise HTTPException(status_code=500, detail="AMAP_API_KEY is not configured")
-    
-    url = f"https://restapi.amap.com/v3/weather/weatherInfo?city={location}&key={AMAP_API_KEY}"
+SYSTEM_PROMPT = "你是一个天气预报员，请根据用户的问题，使用 function calling 获取天气信息, 你非常了解各个城市的邮编，110101 是北京市的邮编"
+
+async def get_weather(location: str) -> dict:
+    """获取高德地图天气信息，同一城市的结果在有效期内直接复用"""
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # 检查 HTTP 错误
-        data = response.json()
-        
-        # 检查 API 返回状态
-        if data.get("status") != "1":
-            raise HTTPException(
-                status_code=400,
-                detail=f"Failed to get weather info: {data.get('info', 'Unknown error')}"
-            )
-        
-        return data
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch weather data: {str(e)}")
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse weather data: {str(e)}")
+        return await weather_service.get_weather(location)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 tools = [
     {
@@ -71,86 +59,205 @@ tools = [
     },
 ]
 
-@router.post("/weather", response_model=WeatherResponse)
-async def get_weather_info(request: WeatherRequest):
+def format_description(weather_info: dict) -> Optional[str]:
+    """由实时天气数据生成描述，多个城市的描述以空行分隔，没有实时天气数据时返回 None"""
+    lives = weather_info.get("lives")
+    if not lives or not isinstance(lives, list):
+        return None
+    return "\n\n".join(
+        f"{weather_data.get('province', '')}{weather_data.get('city', '')}的天气情况：\n"
+        f"天气：{weather_data.get('weather', '未知')}\n"
+        f"温度：{weather_data.get('temperature', '未知')}℃\n"
+        f"风向：{weather_data.get('winddirection', '未知')}\n"
+        f"风力：{weather_data.get('windpower', '未知')}\n"
+        f"湿度：{weather_data.get('humidity', '未知')}%\n"
+        f"发布时间：{weather_data.get('reporttime', '未知')}"
+        for weather_data in lives
+    )
+
+def merge_weather_info(responses: List[dict]) -> dict:
+    """合并多个城市的天气数据：lives 按工具调用顺序拼接，其余字段取第一个结果"""
+    if len(responses) == 1:
+        return responses[0]
+    lives = [
+        weather_data
+        for response in responses
+        for weather_data in (response.get("lives") or [])
+    ]
+    return {**responses[0], "count": str(len(lives)), "lives": lives}
+
+def get_client():
+    """获取共享的 OpenRouter 客户端"""
+    try:
+        return llm_clients.get("openrouter")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def fetch_by_adcode(location: str) -> Tuple[list, dict]:
+    """输入已经是城市编码时直接查询天气，不调用模型选择工具
+
+    返回的对话中补全了等价的工具调用和结果，需要模型生成描述时可以直接继续对话。
+    """
+    adcode = location.strip()
+    logger.info(f"Fetching weather directly for adcode: {adcode}")
     try:
-        # 初始化 OpenAI 客户端
-        client = OpenAI(
-            api_key=os.getenv("OPENROUTER_API_KEY"),
-            base_url=os.getenv("OPENROUTER_BASE_URL")
+        weather_info = await asyncio.wait_for(
+            get_weather(adcode), settings.TOOL_CALL_TIMEOUT
         )
+    except asyncio.TimeoutError:
+        logger.error("Tool call timed out")
+        raise HTTPException(status_code=504, detail="Tool call timed out")
 
-        # 使用 function calling 方式
-        messages = [
-            {
-                "role": "system",
-                "content": "你是一个天气预报员，请根据用户的问题，使用 function calling 获取天气信息, 你非常了解各个城市的邮编，110101 是北京市的邮编",
-            },
-            {"role": "user", "content": f"How's the weather in {request.location}?"},
-        ]
+    tool_call_id = f"direct-{adcode}"
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"How's the weather in {location}?"},
+        {
+            "role": "assistant",
+            "content": "",
+            "tool_calls": [
+                {
+                    "id": tool_call_id,
+                    "type": "function",
+                    "function": {
+                        "name": "get_weather",
+                        "arguments": json.dumps({"location": adcode}),
+                    },
+                }
+            ],
+        },
+        {"role": "tool", "tool_call_id": tool_call_id, "content": str(weather_info)},
+    ]
+    return messages, weather_info
 
-        logger.info(f"Sending request to OpenAI with location: {request.location}")
+async def fetch_by_tool_call(location: str) -> Tuple[list, dict]:
+    """由模型选择工具和参数后查询天气
 
-        try:
-            # 第一次调用获取 tool_calls
-            response = client.chat.completions.create(
-                model="deepseek/deepseek-chat",
-                messages=messages,
-                tools=tools
-            )
-        except Exception as e:
-            logger.error(f"OpenAI API call failed: {str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"OpenAI API call failed: {str(e)}"
-            )
+    Returns:
+        Tuple[list, dict]: 包含工具调用结果的对话，以及合并后的天气数据（见 merge_weather_info）
+    """
+    client = get_client()
+
+    # 使用 function calling 方式
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"How's the weather in {location}?"},
+    ]
+
+    logger.info(f"Sending request to OpenAI with location: {location}")
+
+    try:
+        # 第一次调用获取 tool_calls
+        response = await client.chat.completions.create(
+            model="deepseek/deepseek-chat",
+            messages=messages,
+            tools=tools
+        )
+    except Exception as e:
+        logger.error(f"OpenAI API call failed: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"OpenAI API call failed: {str(e)}"
+        )
+    
+    if not response.choices or not response.choices[0].message:
+        logger.error("No response from OpenAI")
+        raise HTTPException(status_code=500, detail="No response from OpenAI")
         
-        if not response.choices or not response.choices[0].message:
-            logger.error("No response from OpenAI")
-            raise HTTPException(status_code=500, detail="No response from OpenAI")
+    message = response.choices[0].message
+    logger.info(f"Received response from OpenAI: {message}")
+
+    if not message.tool_calls:
+        logger.error("No tool calls in response")
+        raise HTTPException(status_code=400, detail="No tool calls in response")
+
+    # 处理 tool_calls
+    messages.append({"role": "assistant", "content": "", "tool_calls": message.tool_calls})
+    available_functions = {"get_weather": get_weather}
+    
+    # 先解析所有 tool_calls，再并发执行（例如同时查询多个城市）；
+    # 无法执行的调用记录错误信息，每个 tool_call 都要有对应的 tool 消息，否则第二次调用会被拒绝
+    calls = []
+    errors = {}
+    for tool_call in message.tool_calls:
+        if not tool_call.function:
+            errors[tool_call.id] = "Error: unsupported tool call"
+            continue
             
-        message = response.choices[0].message
-        logger.info(f"Received response from OpenAI: {message}")
+        function_name = tool_call.function.name
+        if function_name not in available_functions:
+            logger.error(f"Unknown function: {function_name}")
+            errors[tool_call.id] = f"Error: unknown function {function_name}"
+            continue
+            
+        function_to_call = available_functions[function_name]
+        try:
+            function_args = json.loads(tool_call.function.arguments)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse function arguments: {str(e)}")
+            errors[tool_call.id] = f"Error: invalid arguments: {str(e)}"
+            continue
+        calls.append(
+            (tool_call, function_to_call(function_args.get("location", location)))
+        )
 
-        if not message.tool_calls:
-            logger.error("No tool calls in response")
-            raise HTTPException(status_code=400, detail="No tool calls in response")
+    tasks = [
+        asyncio.create_task(asyncio.wait_for(call, settings.TOOL_CALL_TIMEOUT))
+        for _, call in calls
+    ]
+    try:
+        function_responses = await asyncio.gather(*tasks)
+    except asyncio.TimeoutError:
+        logger.error("Tool call timed out")
+        raise HTTPException(status_code=504, detail="Tool call timed out")
+    finally:
+        # 某个调用超时或失败时取消其余仍在执行的调用，已完成的调用不受影响
+        for task in tasks:
+            task.cancel()
 
-        # 处理 tool_calls
-        messages.append({"role": "assistant", "content": "", "tool_calls": message.tool_calls})
-        available_functions = {"get_weather": get_weather}
-        
-        function_response = None
-        for tool_call in message.tool_calls:
-            if not tool_call.function:
-                continue
-                
-            function_name = tool_call.function.name
-            if function_name not in available_functions:
-                continue
-                
-            function_to_call = available_functions[function_name]
-            try:
-                function_args = json.loads(tool_call.function.arguments)
-                function_response = function_to_call(function_args.get("location", request.location))
-                messages.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": str(function_response)
-                    }
-                )
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse function arguments: {str(e)}")
-                continue
+    # tool 消息按 tool_calls 的原顺序追加
+    results = {
+        tool_call.id: function_response
+        for (tool_call, _), function_response in zip(calls, function_responses)
+    }
+    for tool_call in message.tool_calls:
+        messages.append(
+            {
+                "role": "tool",
+                "tool_call_id": tool_call.id,
+                "content": str(results.get(tool_call.id, errors.get(tool_call.id)))
+            }
+        )
+
+    weather_infos = [info for info in function_responses if info]
+    if not weather_infos:
+        logger.error("Failed to get weather information from function call")
+        raise HTTPException(status_code=500, detail="Failed to get weather information")
 
-        if not function_response:
-            logger.error("Failed to get weather information from function call")
-            raise HTTPException(status_code=500, detail="Failed to get weather information")
+    return messages, merge_weather_info(weather_infos)
+
+async def fetch_weather(location: str) -> Tuple[list, dict]:
+    """查询天气：城市编码直接查询，其他输入由模型选择工具"""
+    if ADCODE_PATTERN.match(location.strip()):
+        return await fetch_by_adcode(location)
+    return await fetch_by_tool_call(location)
+
+@router.post("/weather", response_model=WeatherResponse)
+async def get_weather_info(request: WeatherRequest):
+    """查询天气
+
+    天气数据足以生成描述且未要求 prose 时直接返回，不再调用模型生成最终回复。
+    """
+    try:
+        messages, weather_info = await fetch_weather(request.location)
+        description = format_description(weather_info)
+        if description is not None and not request.prose:
+            return WeatherResponse(weather_info=weather_info, description=description)
 
         # 第二次调用获取最终响应
+        client = get_client()
         try:
-            second_response = client.chat.completions.create(
+            second_response = await client.chat.completions.create(
                 model="deepseek/deepseek-chat",
                 messages=messages
             )
@@ -165,25 +272,9 @@ async def get_weather_info(request: WeatherRequest):
             logger.error("No final response from OpenAI")
             raise HTTPException(status_code=500, detail="Failed to get final response from OpenAI")
 
-        # 格式化天气描述
-        weather_info = function_response
-        if weather_info.get("lives") and isinstance(weather_info["lives"], list) and len(weather_info["lives"]) > 0:
-            weather_data = weather_info["lives"][0]
-            description = (
-                f"{weather_data.get('province', '')}{weather_data.get('city', '')}的天气情况：\n"
-                f"天气：{weather_data.get('weather', '未知')}\n"
-                f"温度：{weather_data.get('temperature', '未知')}℃\n"
-                f"风向：{weather_data.get('winddirection', '未知')}\n"
-                f"风力：{weather_data.get('windpower', '未知')}\n"
-                f"湿度：{weather_data.get('humidity', '未知')}%\n"
-                f"发布时间：{weather_data.get('reporttime', '未知')}"
-            )
-        else:
-            description = second_response.choices[0].message.content
-
         return WeatherResponse(
             weather_info=weather_info,
-            description=description
+            description=second_response.choices[0].message.content or description or ""
         )
 
     except HTTPException as e:
@@ -191,4 +282,64 @@ async def get_weather_info(request: WeatherRequest):
         raise e
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def stream_weather_events(
+    client, messages: list, weather_info: dict, description: Optional[str]
+) -> AsyncGenerator[str, None]:
+    """先发送天气数据，需要时再流式发送模型生成的描述
+
+    weather 事件包含天气数据和由数据生成的描述，客户端可以立即展示；
+    client 不为 None（要求 prose 或无法由数据生成描述）时，随后以 content 事件发送模型的增量输出。
+    """
+    yield format_sse("weather", {"weather_info": weather_info, "description": description or ""})
+    if client is None:
+        yield format_sse("done", {})
+        return
+
+    try:
+        response = await client.chat.completions.create(
+            model="deepseek/deepseek-chat",
+            messages=messages,
+            stream=True
+        )
+    except Exception as e:
+        yield format_sse("error", {"detail": str(e)})
+        return
+
+    try:
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            answer_chunk = chunk.choices[0].delta.content
+            if answer_chunk:
+                yield format_sse("content", {"delta": answer_chunk})
+        yield format_sse("done", {})
+    except Exception as e:
+        yield format_sse("error", {"detail": str(e)})
+    finally:
+        # 客户端断开时关闭上游连接，避免继续消耗 token
+        await response.close()
+
+@router.post("/weather/stream")
+async def get_weather_stream(request: WeatherRequest):
+    """流式查询天气，以 Server-Sent Events 形式返回（事件类型：weather、content、done、error）"""
+    try:
+        messages, weather_info = await fetch_weather(request.location)
+    except HTTPException as e:
+        logger.error(f"HTTP Exception: {str(e)}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    description = format_description(weather_info)
+    client = get_client() if request.prose or description is None else None
+    return StreamingResponse(
+        stream_weather_events(client, messages, weather_info, description),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
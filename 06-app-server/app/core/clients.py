@@ -0,0 +1,87 @@
+from typing import Dict, Optional
+import httpx
+from openai import AsyncOpenAI
+from app.core.config import Settings, settings
+
+
+class LLMClientRegistry:
+    """进程级 LLM 客户端注册表
+
+    在 FastAPI 启动时为每个服务商（DeepSeek、OpenRouter、阿里云）创建一个
+    AsyncOpenAI 客户端，所有客户端共享同一个带连接池的 httpx.AsyncClient，
+    从而复用 TCP/TLS 连接；在服务关闭时统一释放。
+    """
+
+    PROVIDERS = ("deepseek", "openrouter", "aliyun")
+
+    def __init__(self, config: Settings):
+        self.config = config
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self.clients: Dict[str, AsyncOpenAI] = {}
+
+    def _provider_config(self, provider: str) -> tuple:
+        """返回服务商对应的 (api_key, base_url)"""
+        return {
+            "deepseek": (self.config.DEEPSEEK_API_KEY, self.config.DEEPSEEK_BASE_URL),
+            "openrouter": (self.config.OPENROUTER_API_KEY, self.config.OPENROUTER_BASE_URL),
+            "aliyun": (self.config.ALIYUN_API_KEY, self.config.ALIYUN_BASE_URL),
+        }[provider]
+
+    async def startup(self):
+        """创建共享的 HTTP 连接池和各服务商客户端"""
+        if self.http_client is not None:
+            return
+
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=self.config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=self.config.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                self.config.HTTP_READ_TIMEOUT,
+                connect=self.config.HTTP_CONNECT_TIMEOUT,
+            ),
+        )
+
+        for provider in self.PROVIDERS:
+            api_key, base_url = self._provider_config(provider)
+            # 未配置密钥的服务商不创建客户端，调用时再报错
+            if not api_key:
+                continue
+            self.clients[provider] = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=self.http_client,
+            )
+
+    async def shutdown(self):
+        """关闭所有客户端并释放连接池"""
+        self.clients.clear()
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+    def get(self, provider: str) -> AsyncOpenAI:
+        """获取指定服务商的客户端
+
+        Args:
+            provider: 服务商名称，可选 deepseek、openrouter、aliyun
+
+        Returns:
+            AsyncOpenAI: 共享的异步客户端
+
+        Raises:
+            ValueError: 未知服务商时抛出
+            RuntimeError: 注册表未启动或服务商未配置时抛出
+        """
+        if provider not in self.PROVIDERS:
+            raise ValueError(f"未知的服务商: {provider}")
+        if self.http_client is None:
+            raise RuntimeError("LLM 客户端尚未初始化，请确认应用已启动")
+        if provider not in self.clients:
+            raise RuntimeError(f"{provider} 未配置 API 密钥")
+        return self.clients[provider]
+
+
+llm_clients = LLMClientRegistry(settings)
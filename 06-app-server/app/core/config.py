@@ -1,5 +1,9 @@
 from pydantic_settings import BaseSettings
 from typing import Optional
+import os
+
+# 仓库根目录，用于定位 07-Rag 中的 RAG 模块
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
 
 class Settings(BaseSettings):
     # API 配置
@@ -24,6 +28,27 @@ class Settings(BaseSettings):
     
     # 高德地图配置
     AMAP_API_KEY: Optional[str] = None
+    WEATHER_CACHE_TTL: float = 600.0  # 同一城市天气结果的有效期（秒）
+    WEATHER_CACHE_SIZE: int = 1024  # 缓存的城市数量
+    WEATHER_TIMEOUT: float = 5.0  # 请求高德接口的超时时间（秒）
+    TOOL_CALL_TIMEOUT: float = 10.0  # 单个工具调用的超时时间（秒），同一轮的工具调用并发执行
+    
+    # HTTP 连接池配置（所有 LLM 客户端共享）
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_READ_TIMEOUT: float = 60.0
+    
+    # RAG 服务配置
+    RAG_MODULE_DIR: str = os.path.join(REPO_DIR, "07-Rag", "02-Rag-Demo")
+    RAG_INDEX_PATH: str = os.path.join(REPO_DIR, "07-Rag", "02-Rag-Demo", "dist", "index")
+    RAG_RELOAD_INTERVAL: float = 10.0  # 检查索引是否重建的间隔（秒）
+    RAG_RERANK_TIMEOUT: float = 3.0  # 重排序的延迟预算（秒），超时后使用检索相似度排序
+    RAG_RERANK_CACHE_SIZE: int = 1024  # 重排序结果缓存的条目数
+    RAG_MAX_CONTEXT_TOKENS: int = 3000  # 生成回答时参考内容的总词元数上限
+    RAG_ANSWER_CACHE_SIZE: int = 1024  # 语义回答缓存的条目数，为 0 时关闭
+    RAG_ANSWER_CACHE_THRESHOLD: float = 0.95  # 语义回答缓存命中所需的最低问题相似度
     
     # 服务器配置
     PORT: int = 8000
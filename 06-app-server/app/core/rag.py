@@ -0,0 +1,388 @@
+import asyncio
+import logging
+import sys
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from openai import OpenAIError
+from app.core.config import Settings, settings
+
+# RAG 模块位于 07-Rag/02-Rag-Demo，以目录形式组织，需要加入导入路径
+if settings.RAG_MODULE_DIR not in sys.path:
+    sys.path.append(settings.RAG_MODULE_DIR)
+
+from embedding_processor import EmbeddingProcessor, read_index_version
+from query_processor import QueryProcessor
+from rerank_processor import RerankProcessor
+from generation_processor import GenerationProcessor
+from answer_cache import SemanticAnswerCache
+
+logger = logging.getLogger(__name__)
+
+
+class RagSnapshot:
+    """一个已加载的索引版本，加载完成后只读，可被多个请求并发使用"""
+
+    def __init__(self, index_path: str, encoder: EmbeddingProcessor):
+        """加载索引
+
+        Args:
+            index_path: 索引路径
+            encoder: 服务共用的向量化处理器，各索引版本共用它的客户端、缓存和线程池
+        """
+        self.emb_processor = encoder.share()
+        self.emb_processor.load_index(index_path)
+        self.query_processor = QueryProcessor(self.emb_processor)
+        self.version = self.emb_processor.version
+
+
+class RagService:
+    """常驻的 RAG 查询服务
+
+    启动时加载一次索引并保持常驻，后台定期检查索引版本，
+    重建完成后在后台加载新索引并原子替换，进行中的请求继续使用旧索引。
+    """
+
+    def __init__(self, config: Settings):
+        self.config = config
+        self.index_path = config.RAG_INDEX_PATH
+        self.snapshot: Optional[RagSnapshot] = None
+        self.encoder: Optional[EmbeddingProcessor] = None
+        self.reranker: Optional[RerankProcessor] = None
+        self.generator: Optional[GenerationProcessor] = None
+        self.answer_cache: Optional[SemanticAnswerCache] = None
+        # 配置错误（例如未设置 ALIYUN_API_KEY）时不可用的原因，重启前不会恢复
+        self.config_error: Optional[str] = None
+        self.reload_lock = asyncio.Lock()
+        self.watch_task: Optional[asyncio.Task] = None
+
+    async def startup(self):
+        """加载索引并启动后台热加载任务
+
+        索引不存在时等待后台任务加载；向量化服务未配置时 RAG 接口不可用（返回 503），
+        但不影响应用中的其他接口启动。
+        """
+        self.reranker = RerankProcessor(
+            timeout=self.config.RAG_RERANK_TIMEOUT,
+            cache_size=self.config.RAG_RERANK_CACHE_SIZE,
+        )
+        self.generator = GenerationProcessor(
+            max_context_tokens=self.config.RAG_MAX_CONTEXT_TOKENS
+        )
+        try:
+            # 向量化客户端、缓存和线程池只创建一次，热加载的各个索引版本共用
+            self.encoder = await asyncio.to_thread(EmbeddingProcessor)
+            await self.reload()
+        except FileNotFoundError:
+            logger.warning(f"RAG 索引不存在: {self.index_path}，等待索引构建完成")
+        except OpenAIError as e:
+            self.config_error = f"RAG 服务未配置（需要 ALIYUN_API_KEY）: {str(e)}"
+            logger.warning(f"{self.config_error}，RAG 接口不可用")
+            return
+        self.watch_task = asyncio.create_task(self._watch_index())
+
+    async def shutdown(self):
+        """停止后台热加载任务，释放向量化客户端、缓存和线程池"""
+        if self.watch_task is not None:
+            self.watch_task.cancel()
+            try:
+                await self.watch_task
+            except asyncio.CancelledError:
+                pass
+            self.watch_task = None
+        if self.encoder is not None:
+            self.encoder.close()
+            self.encoder = None
+
+    async def reload(self) -> Optional[str]:
+        """重新加载索引，加载完成后原子替换当前索引
+
+        Returns:
+            Optional[str]: 当前生效的索引版本
+
+        Raises:
+            FileNotFoundError: 索引文件不存在时抛出
+            RuntimeError: 服务未配置或尚未启动时抛出
+        """
+        if self.config_error:
+            raise RuntimeError(self.config_error)
+        if self.encoder is None:
+            raise RuntimeError("RAG 服务尚未启动")
+        async with self.reload_lock:
+            version = read_index_version(self.index_path)
+            if self.snapshot is not None and version == self.snapshot.version:
+                return self.snapshot.version
+
+            snapshot = await asyncio.to_thread(RagSnapshot, self.index_path, self.encoder)
+            self.snapshot = snapshot
+            logger.info(f"RAG 索引已加载，版本: {snapshot.version}")
+            return snapshot.version
+
+    async def _watch_index(self):
+        """定期检查索引版本，发现变化时热加载"""
+        while True:
+            await asyncio.sleep(self.config.RAG_RELOAD_INTERVAL)
+            try:
+                version = read_index_version(self.index_path)
+                if version is not None and (
+                    self.snapshot is None or version != self.snapshot.version
+                ):
+                    await self.reload()
+            except Exception as e:
+                logger.error(f"RAG 索引热加载失败: {str(e)}")
+
+    def current(self) -> RagSnapshot:
+        """获取当前生效的索引
+
+        Raises:
+            RuntimeError: 服务未配置或索引尚未加载时抛出
+        """
+        snapshot = self.snapshot
+        if snapshot is None:
+            raise RuntimeError(self.config_error or "RAG 索引尚未加载")
+        return snapshot
+
+    def _retrieve(
+        self,
+        snapshot: RagSnapshot,
+        query: str,
+        k: int,
+        top_n: int,
+        rerank: bool,
+        mode: str,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
+        """检索并重排序（同步执行，在线程池中调用）"""
+        results = snapshot.query_processor.search(
+            query, k, mode=mode, query_embedding=query_embedding
+        )
+        documents = [
+            {
+                "content": result["text"],
+                "similarity": result["similarity"],
+                "metadata": result["metadata"],
+            }
+            for result in results
+        ]
+        if not rerank or not documents:
+            for doc in documents:
+                doc["score"] = doc["similarity"]
+            return documents[:top_n]
+        return self.reranker.rerank_with_metadata(query, documents, top_n)
+
+    async def query(
+        self,
+        query: str,
+        k: int = 10,
+        top_n: int = 5,
+        rerank: bool = True,
+        mode: str = "hybrid",
+    ) -> Dict[str, Any]:
+        """检索与查询相关的文档
+
+        Args:
+            query: 查询文本
+            k: 检索的候选数量
+            top_n: 返回的文档数量
+            rerank: 是否使用重排序
+            mode: 检索方式，vector、keyword 或 hybrid
+
+        Returns:
+            Dict[str, Any]: 包含检索结果和索引版本
+        """
+        snapshot = self.current()
+        documents = await asyncio.to_thread(
+            self._retrieve, snapshot, query, k, top_n, rerank, mode
+        )
+        return {"documents": documents, "index_version": snapshot.version}
+
+    def _get_answer_cache(self, dimension: int) -> Optional[SemanticAnswerCache]:
+        """获取语义回答缓存，首次使用或向量维度变化时创建"""
+        if self.config.RAG_ANSWER_CACHE_SIZE <= 0:
+            return None
+        if self.answer_cache is None or self.answer_cache.dimension != dimension:
+            self.answer_cache = SemanticAnswerCache(
+                dimension,
+                threshold=self.config.RAG_ANSWER_CACHE_THRESHOLD,
+                max_entries=self.config.RAG_ANSWER_CACHE_SIZE,
+            )
+        return self.answer_cache
+
+    async def _lookup_answer(
+        self, snapshot: RagSnapshot, query: str, mode: str, params: str
+    ) -> Tuple[Optional[np.ndarray], Optional[Dict[str, Any]]]:
+        """创建问题向量并查找语义回答缓存
+
+        关键词检索不需要问题向量，为了查缓存而调用向量化接口得不偿失，因此不使用缓存。
+
+        Returns:
+            Tuple[Optional[np.ndarray], Optional[Dict[str, Any]]]: 问题向量（未启用缓存时为 None）和命中的缓存条目
+        """
+        if mode == "keyword":
+            return None, None
+        emb_processor = snapshot.emb_processor
+        cache = self._get_answer_cache(emb_processor.dimension)
+        if cache is None:
+            return None, None
+        embedding = (
+            await asyncio.to_thread(emb_processor.create_embeddings, [query])
+        )[0]
+        if embedding is None:
+            return None, None
+        hit = cache.get(embedding, snapshot.version, params)
+        if hit is not None:
+            logger.info(
+                f"语义回答缓存命中: {query} ≈ {hit['query']}（相似度 {hit['similarity']:.4f}）"
+            )
+        return embedding, hit
+
+    def _store_answer(
+        self,
+        embedding: Optional[np.ndarray],
+        version: Optional[str],
+        query: str,
+        answer: str,
+        documents: List[Dict[str, Any]],
+        params: str,
+    ):
+        """将生成的回答写入语义回答缓存"""
+        if answer and embedding is not None and self.answer_cache is not None:
+            self.answer_cache.put(embedding, version, query, answer, documents, params)
+
+    def _generate(
+        self, query: str, documents: List[Dict[str, Any]], top_n: int
+    ) -> Tuple[str, bool]:
+        """生成完整回答（同步执行，在线程池中调用）
+
+        Returns:
+            Tuple[str, bool]: 回答（失败时为错误信息）和是否生成成功
+        """
+        try:
+            deltas = self.generator.generate_stream(
+                query, [(doc["content"], doc["score"]) for doc in documents], top_n
+            )
+            return "".join(deltas), True
+        except Exception as e:
+            return f"生成出错: {str(e)}", False
+
+    async def answer(
+        self,
+        query: str,
+        k: int = 10,
+        top_n: int = 3,
+        rerank: bool = True,
+        mode: str = "hybrid",
+    ) -> Dict[str, Any]:
+        """检索相关文档并生成回答
+
+        相同或相近的问题（语义回答缓存命中）直接返回缓存的回答，跳过检索、重排序和生成。
+
+        Args:
+            query: 用户问题
+            k: 检索的候选数量
+            top_n: 作为上下文的文档数量
+            rerank: 是否使用重排序
+            mode: 检索方式，vector、keyword 或 hybrid
+
+        Returns:
+            Dict[str, Any]: 包含回答、引用文档、索引版本和是否命中缓存
+        """
+        snapshot = self.current()
+        params = f"{mode}:{k}:{top_n}:{rerank}"
+        embedding, hit = await self._lookup_answer(snapshot, query, mode, params)
+        if hit is not None:
+            return {
+                "answer": hit["answer"],
+                "documents": hit["documents"],
+                "index_version": snapshot.version,
+                "cached": True,
+            }
+
+        documents = await asyncio.to_thread(
+            self._retrieve, snapshot, query, k, top_n, rerank, mode, embedding
+        )
+        answer, ok = await asyncio.to_thread(self._generate, query, documents, top_n)
+        if ok:
+            self._store_answer(embedding, snapshot.version, query, answer, documents, params)
+        return {
+            "answer": answer,
+            "documents": documents,
+            "index_version": snapshot.version,
+            "cached": False,
+        }
+
+    async def answer_stream(
+        self,
+        query: str,
+        k: int = 10,
+        top_n: int = 3,
+        rerank: bool = True,
+        mode: str = "hybrid",
+    ) -> Dict[str, Any]:
+        """检索相关文档，返回引用文档和流式回答
+
+        检索和重排序在返回前完成，回答以同步迭代器的形式返回，
+        由调用方逐个读取增量片段（例如交给 StreamingResponse 在线程池中迭代）。
+        语义回答缓存命中时一次性返回缓存的回答；未命中时完整读取后写入缓存。
+
+        Args:
+            query: 用户问题
+            k: 检索的候选数量
+            top_n: 作为上下文的文档数量
+            rerank: 是否使用重排序
+            mode: 检索方式，vector、keyword 或 hybrid
+
+        Returns:
+            Dict[str, Any]: 包含回答的增量片段迭代器 deltas、引用文档、索引版本和是否命中缓存
+        """
+        snapshot = self.current()
+        params = f"{mode}:{k}:{top_n}:{rerank}"
+        embedding, hit = await self._lookup_answer(snapshot, query, mode, params)
+        if hit is not None:
+            return {
+                "deltas": self._replay_answer(hit["answer"]),
+                "documents": hit["documents"],
+                "index_version": snapshot.version,
+                "cached": True,
+            }
+
+        documents = await asyncio.to_thread(
+            self._retrieve, snapshot, query, k, top_n, rerank, mode, embedding
+        )
+        deltas = self.generator.generate_stream(
+            query,
+            [(doc["content"], doc["score"]) for doc in documents],
+            top_n,
+        )
+        return {
+            "deltas": self._record_answer(
+                deltas, embedding, snapshot.version, query, documents, params
+            ),
+            "documents": documents,
+            "index_version": snapshot.version,
+            "cached": False,
+        }
+
+    @staticmethod
+    def _replay_answer(answer: str) -> Iterator[str]:
+        yield answer
+
+    def _record_answer(
+        self,
+        deltas: Iterator[str],
+        embedding: Optional[np.ndarray],
+        version: Optional[str],
+        query: str,
+        documents: List[Dict[str, Any]],
+        params: str,
+    ) -> Iterator[str]:
+        """转发增量片段，完整生成后写入语义回答缓存；生成失败或客户端提前断开时不写入"""
+        parts = []
+        try:
+            for delta in deltas:
+                parts.append(delta)
+                yield delta
+        finally:
+            deltas.close()
+        self._store_answer(embedding, version, query, "".join(parts), documents, params)
+
+rag_service = RagService(settings)
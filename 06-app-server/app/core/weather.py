@@ -0,0 +1,145 @@
+import asyncio
+import copy
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+import httpx
+from app.core.clients import llm_clients
+from app.core.config import Settings, settings
+
+logger = logging.getLogger(__name__)
+
+AMAP_WEATHER_URL = "https://restapi.amap.com/v3/weather/weatherInfo"
+
+
+class AsyncTTLCache:
+    """带过期时间的异步缓存，同一个键的并发加载合并为一次
+
+    未过期的结果直接返回；缓存未命中时，同一个键的并发请求共享同一个加载任务，
+    只有第一个请求会真正调用加载函数。加载失败时不缓存，所有等待者收到同一个异常。
+    每个调用方得到结果的独立副本，修改返回值不会影响缓存和其他调用方。
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        """
+        Args:
+            ttl: 结果的有效期（秒）
+            max_entries: 最多缓存的结果数量，超出后淘汰最久未访问的结果
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.inflight: Dict[str, asyncio.Future] = {}
+
+    def _get_fresh(self, key: str) -> Tuple[bool, Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            return False, None
+        self.entries.move_to_end(key)
+        return True, value
+
+    def _put(self, key: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            self._put(key, value)
+            return value
+        finally:
+            self.inflight.pop(key, None)
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """获取缓存结果，未命中时调用 loader 加载
+
+        Args:
+            key: 缓存键
+            loader: 无参数的异步加载函数
+
+        Returns:
+            Any: 缓存或新加载的结果（深拷贝）
+        """
+        hit, value = self._get_fresh(key)
+        if hit:
+            return copy.deepcopy(value)
+
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self.inflight[key] = task
+        # 某个等待者被取消时不影响共享的加载任务和其他等待者
+        return copy.deepcopy(await asyncio.shield(task))
+
+
+class WeatherService:
+    """高德天气查询服务
+
+    复用 llm_clients 的 httpx 连接池请求高德接口，按 adcode 缓存结果 WEATHER_CACHE_TTL 秒，
+    同一城市的并发请求只向高德发送一次。
+    """
+
+    def __init__(self, config: Settings):
+        self.config = config
+        self.cache = AsyncTTLCache(config.WEATHER_CACHE_TTL, config.WEATHER_CACHE_SIZE)
+
+    async def _fetch(self, adcode: str) -> Dict[str, Any]:
+        """请求高德天气接口
+
+        Raises:
+            ValueError: 高德返回错误状态（例如城市编码无效）时抛出
+            RuntimeError: 未配置密钥、网络错误或响应无法解析时抛出
+        """
+        if not self.config.AMAP_API_KEY:
+            raise RuntimeError("AMAP_API_KEY is not configured")
+        http_client = llm_clients.http_client
+        if http_client is None:
+            raise RuntimeError("HTTP 连接池尚未初始化，请确认应用已启动")
+
+        logger.info(f"请求高德天气接口: {adcode}")
+        try:
+            response = await http_client.get(
+                AMAP_WEATHER_URL,
+                params={"city": adcode, "key": self.config.AMAP_API_KEY},
+                timeout=self.config.WEATHER_TIMEOUT,
+            )
+            response.raise_for_status()
+            data = response.json()
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Failed to fetch weather data: {str(e)}")
+        except ValueError as e:
+            raise RuntimeError(f"Failed to parse weather data: {str(e)}")
+
+        if data.get("status") != "1":
+            raise ValueError(
+                f"Failed to get weather info: {data.get('info', 'Unknown error')}"
+            )
+        return data
+
+    async def get_weather(self, adcode: str) -> Dict[str, Any]:
+        """获取城市的实时天气，优先返回缓存结果
+
+        Args:
+            adcode: 高德城市编码
+
+        Returns:
+            Dict[str, Any]: 高德天气接口返回的数据
+
+        Raises:
+            ValueError: 高德返回错误状态时抛出
+            RuntimeError: 请求失败时抛出
+        """
+        adcode = str(adcode).strip()
+        return await self.cache.get(adcode, lambda: self._fetch(adcode))
+
+
+weather_service = WeatherService(settings)
@@ -1,12 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.clients import llm_clients
+from app.core.rag import rag_service
 from app.api.v1 import router as api_v1_router
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时创建共享的 LLM 客户端，关闭时释放连接池
+    await llm_clients.startup()
+    # 加载常驻的 RAG 索引，并在后台监听索引重建
+    await rag_service.startup()
+    yield
+    await rag_service.shutdown()
+    await llm_clients.shutdown()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="API server for LLM learning project",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 配置 CORS
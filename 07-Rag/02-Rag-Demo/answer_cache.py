@@ -0,0 +1,147 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import numpy as np
+
+
+"""
+本模块负责缓存已经生成的回答，相同或相近的问题直接返回缓存结果：
+
+   查询向量 → 归一化 → 与已回答问题的向量矩阵做内积（余弦相似度）
+           → 最高相似度 ≥ threshold 且检索参数相同 → 命中，返回缓存的回答和引用文档
+           → 否则走完整流程（检索 → 重排序 → 生成），结果写入缓存
+
+   文档索引更新到新版本时清空缓存，避免返回基于旧文档的回答；
+   使用旧版本索引的查询和回答既不命中也不写入缓存。
+"""
+
+
+class SemanticAnswerCache:
+    def __init__(self, dimension: int, threshold: float = 0.95, max_entries: int = 1024):
+        """初始化语义回答缓存
+
+        问题向量存放在预先分配的 max_entries × dimension 矩阵中，
+        查找时一次矩阵乘法得到与所有已缓存问题的余弦相似度，淘汰后空出的行直接复用。
+
+        Args:
+            dimension: 问题向量维度，与向量化模型一致
+            threshold: 命中所需的最低余弦相似度
+            max_entries: 最多缓存的回答数量，超出后淘汰最久未命中的回答
+        """
+        self.dimension = dimension
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.vectors = np.zeros((max_entries, dimension), dtype=np.float32)
+        self.valid = np.zeros(max_entries, dtype=bool)
+        # 行号 → 缓存条目，按访问顺序排列，最前面的最久未命中
+        self.entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.version: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    @staticmethod
+    def _is_newer(version: Optional[str], current: Optional[str]) -> bool:
+        """版本号为写入索引时的纳秒时间戳，按数值比较"""
+        if current is None:
+            return True
+        if version is None:
+            return False
+        try:
+            return int(version) > int(current)
+        except ValueError:
+            return version != current
+
+    def _check_version(self, version: Optional[str]) -> bool:
+        """索引更新到新版本时清空缓存（调用方持有锁）
+
+        Returns:
+            bool: 版本是否为当前版本；比当前版本旧时返回 False，缓存保持不变
+        """
+        if version == self.version:
+            return True
+        if not self._is_newer(version, self.version):
+            return False
+        self.valid[:] = False
+        self.entries.clear()
+        self.version = version
+        return True
+
+    def get(
+        self, embedding: np.ndarray, version: Optional[str], params: str = ""
+    ) -> Optional[Dict[str, Any]]:
+        """查找相近问题的缓存回答
+
+        Args:
+            embedding: 问题向量
+            version: 当前文档索引版本
+            params: 检索参数（检索方式、候选数量等），只有参数相同的回答才会命中
+
+        Returns:
+            Optional[Dict[str, Any]]: 命中时返回缓存条目（query、answer、documents、similarity），否则返回 None
+        """
+        vector = self._normalize(embedding)
+        if vector is None:
+            return None
+        with self.lock:
+            if not self._check_version(version) or not self.entries:
+                return None
+            scores = self.vectors @ vector
+            scores[~self.valid] = -np.inf
+            for row, entry in self.entries.items():
+                if entry["params"] != params:
+                    scores[row] = -np.inf
+            row = int(np.argmax(scores))
+            similarity = float(scores[row])
+            if similarity < self.threshold:
+                return None
+            self.entries.move_to_end(row)
+            return {**self.entries[row], "similarity": similarity}
+
+    def put(
+        self,
+        embedding: np.ndarray,
+        version: Optional[str],
+        query: str,
+        answer: str,
+        documents: list,
+        params: str = "",
+    ):
+        """写入一条回答
+
+        Args:
+            embedding: 问题向量
+            version: 生成回答时使用的文档索引版本，比缓存中的版本旧时丢弃该回答
+            query: 问题原文
+            answer: 生成的回答
+            documents: 作为上下文的引用文档
+            params: 检索参数，见 get
+        """
+        vector = self._normalize(embedding)
+        if vector is None or self.max_entries <= 0:
+            return
+        with self.lock:
+            if not self._check_version(version):
+                # 生成期间索引已经更新，基于旧文档的回答不再写入
+                return
+            if len(self.entries) >= self.max_entries:
+                row, _ = self.entries.popitem(last=False)
+            else:
+                row = int(np.argmin(self.valid))
+            self.vectors[row] = vector
+            self.valid[row] = True
+            self.entries[row] = {
+                "query": query,
+                "answer": answer,
+                "documents": documents,
+                "params": params,
+            }
@@ -0,0 +1,158 @@
+import argparse
+import bisect
+import random
+import time
+from typing import Callable, List
+from text_chunker import TextChunker, find_sentence_boundaries
+
+
+"""
+本脚本比较原分块实现与 text_chunker 的耗时和分块结果。
+
+   生成合成语料 → 原实现（逐字符查找边界 + 每块二分查找）→ 新实现（字符 / 词元 / 流式）→ 输出耗时对比
+   → 比较块数，并验证除块长上限规则外两者结果一致（见 text_chunker 模块说明）
+
+   python benchmark_chunker.py --size-mb 50
+"""
+
+
+SENTENCES = [
+    "西湖位于浙江省杭州市西部，是中国著名的风景名胜区。",
+    "苏堤春晓、断桥残雪、雷峰夕照都是西湖十景之一！",
+    "The West Lake is a freshwater lake in Hangzhou, China.",
+    "每年春天，游客们会沿着湖边散步、骑行或者乘船游览？",
+    "Visitors can take a boat tour or walk along the causeways.",
+    "灵隐寺始建于东晋咸和元年，距今已有一千七百多年的历史。\n",
+]
+
+
+def legacy_find_sentence_boundaries(text: str) -> List[int]:
+    """原实现：逐字符查找句子边界"""
+    boundaries = []
+    for i, char in enumerate(text):
+        if char in ".。!！?？\n":
+            boundaries.append(i)
+    return boundaries
+
+
+def legacy_split_text(
+    text: str, chunk_size: int, chunk_overlap: int, allow_overflow: bool = True
+) -> List[str]:
+    """原实现：每个块通过二分查找定位句子边界
+
+    原实现在最后一个块之后会反复回退 chunk_overlap 而无法结束，这里补充了结束条件，其余保持不变。
+    原实现中位于 chunk_size 处的句子结束符会并入当前块（块长 chunk_size + 1）；
+    allow_overflow 为 False 时只使用块内的句子边界，与 TextChunker 的规则相同。
+    """
+    if not text:
+        return []
+
+    boundaries = legacy_find_sentence_boundaries(text)
+    if not boundaries:
+        return [
+            text[i : i + chunk_size]
+            for i in range(0, len(text), chunk_size - chunk_overlap)
+        ]
+
+    chunks = []
+    start = 0
+    text_length = len(text)
+
+    while start < text_length:
+        end = min(start + chunk_size, text_length)
+
+        if end < text_length:
+            limit = end if allow_overflow else end - 1
+            boundary_idx = bisect.bisect_right(boundaries, limit) - 1
+            if boundary_idx >= 0:
+                end = boundaries[boundary_idx] + 1
+
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+
+        if end >= text_length:
+            break
+        start = end - chunk_overlap
+
+    return chunks
+
+
+def make_corpus(size_mb: float, seed: int = 0) -> str:
+    """生成指定大小（按字符数计，1 MB 约 100 万字符）的合成语料"""
+    rng = random.Random(seed)
+    target = int(size_mb * 1_000_000)
+    parts = []
+    length = 0
+    while length < target:
+        sentence = rng.choice(SENTENCES)
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)
+
+
+def measure(name: str, func: Callable[[], int], repeat: int) -> float:
+    """多次运行取最短耗时"""
+    best = float("inf")
+    result = 0
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start_time)
+    print(f"{name:<24} {best:>8.3f} 秒  ({result} 个)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文本分块性能对比")
+    parser.add_argument("--size-mb", type=float, default=20, help="合成语料大小（百万字符）")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"生成合成语料: {args.size_mb} 百万字符...")
+    text = make_corpus(args.size_mb)
+    pieces = [text[i : i + 65536] for i in range(0, len(text), 65536)]
+    char_chunker = TextChunker(args.chunk_size, args.chunk_overlap)
+    token_chunker = TextChunker(args.chunk_size, args.chunk_overlap, unit="token")
+
+    print("\n句子边界查找")
+    legacy = measure("原实现", lambda: len(legacy_find_sentence_boundaries(text)), args.repeat)
+    current = measure("正则扫描", lambda: len(find_sentence_boundaries(text)), args.repeat)
+    print(f"加速比: {legacy / current:.1f}x")
+
+    print("\n文本分块")
+    legacy = measure(
+        "原实现",
+        lambda: len(legacy_split_text(text, args.chunk_size, args.chunk_overlap)),
+        args.repeat,
+    )
+    current = measure("TextChunker", lambda: len(char_chunker.split_spans(text)), args.repeat)
+    measure(
+        "TextChunker（流式）",
+        lambda: sum(1 for _ in char_chunker.split_stream(pieces)),
+        args.repeat,
+    )
+    measure(
+        "TextChunker（词元）",
+        lambda: len(token_chunker.split_spans(text)),
+        args.repeat,
+    )
+    print(f"加速比: {legacy / current:.1f}x")
+
+    print("\n分块结果")
+    legacy_chunks = legacy_split_text(text, args.chunk_size, args.chunk_overlap)
+    chunks = char_chunker.split(text)
+    overflow = sum(len(chunk) > args.chunk_size for chunk in legacy_chunks)
+    print(f"原实现 {len(legacy_chunks)} 个块，其中 {overflow} 个超过 chunk_size")
+    print(f"TextChunker {len(chunks)} 个块")
+    strict = legacy_split_text(
+        text, args.chunk_size, args.chunk_overlap, allow_overflow=False
+    )
+    assert strict == chunks, "TextChunker 与限制块长后的原实现结果不一致"
+    print("✓ 限制块长不超过 chunk_size 后，原实现与 TextChunker 结果一致")
+
+
+if __name__ == "__main__":
+    main()
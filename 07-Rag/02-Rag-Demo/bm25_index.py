@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import math
+import shutil
+from array import array
+from collections import Counter
+from typing import Iterable, List, Tuple
+import numpy as np
+
+
+"""
+本模块负责关键词检索：为文本块建立 BM25 倒排索引，与 FAISS 索引一同构建和保存。
+
+   文本块 → 分词（汉字二元组 + 英文单词 / 数字）→ 倒排表（词 → 文本块序号、词频）→ BM25 打分
+
+   目录结构（<索引路径>.bm25/）：
+   ├── bm25.json          # 参数、平均长度和词表（按词编号排列）
+   ├── offsets.npy        # 每个词的倒排表在 doc_ids / tfs 中的起止位置（长度为词数 + 1）
+   ├── doc_ids.npy        # 倒排表中的文本块序号，与 FAISS 索引中的序号一致
+   ├── tfs.npy            # 倒排表中的词频
+   └── doc_lens.npy       # 每个文本块的词数
+"""
+
+
+TOKEN_PATTERN = re.compile(r"[\u4e00-\u9fff]+|[^\W\u4e00-\u9fff]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """分词
+
+    中文不依赖词典，连续的汉字切分为相邻两字组成的二元组（单个汉字保留为一个词），
+    英文单词和数字整体作为一个词并转为小写，可以精确匹配景点名称、编号等。
+
+    Args:
+        text: 要分词的文本
+
+    Returns:
+        List[str]: 词列表
+    """
+    tokens = []
+    for m in TOKEN_PATTERN.finditer(text):
+        run = m.group()
+        if "\u4e00" <= run[0] <= "\u9fff":
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """初始化 BM25 索引
+
+        Args:
+            k1: 词频饱和参数
+            b: 文本长度归一化参数
+        """
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.int32)
+        self.doc_lens = np.zeros(0, dtype=np.int32)
+        self.avgdl = 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_lens)
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """逐个读取文本块构建索引
+
+        Args:
+            texts: 文本块的可迭代对象，顺序即文本块序号
+            k1: 词频饱和参数
+            b: 文本长度归一化参数
+
+        Returns:
+            BM25Index: 构建好的索引
+        """
+        index = cls(k1, b)
+        term_col, doc_col, tf_col, doc_lens = array("i"), array("i"), array("i"), array("i")
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_col.append(index.vocab.setdefault(term, len(index.vocab)))
+                doc_col.append(doc_id)
+                tf_col.append(tf)
+
+        # 按词编号排序，得到每个词连续存放的倒排表（同一个词内文本块序号保持升序）
+        terms = np.frombuffer(term_col, dtype=np.int32)
+        order = np.argsort(terms, kind="stable")
+        index.doc_ids = np.frombuffer(doc_col, dtype=np.int32)[order]
+        index.tfs = np.frombuffer(tf_col, dtype=np.int32)[order]
+        index.offsets = np.zeros(len(index.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(index.vocab)), out=index.offsets[1:])
+        index.doc_lens = np.array(doc_lens, dtype=np.int32)
+        index.avgdl = float(index.doc_lens.mean()) if len(index.doc_lens) else 0.0
+        return index
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """检索与查询最相关的文本块
+
+        Args:
+            query: 查询文本
+            k: 返回的文本块数量
+
+        Returns:
+            List[Tuple[int, float]]: (文本块序号, BM25 分数) 列表，按分数降序排列，只包含命中查询词的文本块
+        """
+        n = len(self)
+        if n == 0 or k <= 0:
+            return []
+
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tfs = self.tfs[start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lens[docs] / self.avgdl)
+            # 同一个词的倒排表中文本块序号不重复，可以直接按下标累加
+            scores[docs] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(i), float(scores[i])) for i in hits]
+
+    def save(self, index_dir: str):
+        """保存索引，先写入临时目录再替换旧目录
+
+        Args:
+            index_dir: 索引目录
+        """
+        tmp_dir = f"{index_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        terms = [None] * len(self.vocab)
+        for term, term_id in self.vocab.items():
+            terms[term_id] = term
+        with open(os.path.join(tmp_dir, "bm25.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {"k1": self.k1, "b": self.b, "avgdl": self.avgdl, "terms": terms},
+                f,
+                ensure_ascii=False,
+            )
+        for name in ("offsets", "doc_ids", "tfs", "doc_lens"):
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(self, name))
+
+        old_dir = f"{index_dir}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(index_dir):
+            os.rename(index_dir, old_dir)
+        os.rename(tmp_dir, index_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, index_dir: str) -> "BM25Index":
+        """加载索引，倒排表以内存映射方式打开
+
+        Args:
+            index_dir: 索引目录
+
+        Returns:
+            BM25Index: 加载的索引
+        """
+        with open(os.path.join(index_dir, "bm25.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(data["k1"], data["b"])
+        index.avgdl = data["avgdl"]
+        index.vocab = {term: term_id for term_id, term in enumerate(data["terms"])}
+        for name in ("offsets", "doc_ids", "tfs", "doc_lens"):
+            setattr(index, name, np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r"))
+        return index
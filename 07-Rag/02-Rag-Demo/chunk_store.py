@@ -0,0 +1,160 @@
+import os
+import json
+from typing import Any, Dict, Iterable, Iterator
+import numpy as np
+
+
+"""
+本模块负责保存文档处理阶段产生的文本块，作为文档处理和向量化之间的交换格式。
+
+   chunks.jsonl      # 每行一个文本块（JSON），可追加
+   chunks.jsonl.idx  # 每行在 chunks.jsonl 中的字节偏移（int64），用于随机读取
+
+   每条记录包含：
+   id          全局序号
+   source      来源文件（相对路径）
+   chunk_id    文件内序号
+   start, end  文本块在预处理后文本中的字符偏移
+   page, page_end  文本块的起止页码（仅 PDF 和 DOCX）
+   chunk_hash  文本内容哈希
+   text        文本内容
+"""
+
+
+class ChunkStore:
+    def __init__(self, path: str, overwrite: bool = False):
+        """打开文本块存储
+
+        Args:
+            path: JSONL 文件路径
+            overwrite: 是否清空已有内容
+        """
+        self.path = path
+        self.index_path = f"{path}.idx"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        if overwrite:
+            for file_path in (self.path, self.index_path):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+
+        if not os.path.exists(self.path):
+            open(self.path, "wb").close()
+        if not self._index_is_valid():
+            self._rebuild_index()
+
+        self.offsets = self._load_offsets()
+        # 本次追加的偏移，避免每次追加都复制整个数组
+        self.new_offsets = []
+        self.data_file = None
+        self.index_file = None
+
+    def _index_is_valid(self) -> bool:
+        """检查偏移文件是否与数据文件一致"""
+        if not os.path.exists(self.index_path):
+            return False
+        size = os.path.getsize(self.index_path)
+        if size % 8 != 0:
+            return False
+        if size == 0:
+            return os.path.getsize(self.path) == 0
+        with open(self.index_path, "rb") as f:
+            f.seek(size - 8)
+            last_offset = int(np.frombuffer(f.read(8), dtype=np.int64)[0])
+        with open(self.path, "rb") as f:
+            f.seek(last_offset)
+            f.readline()
+            return f.tell() == os.path.getsize(self.path)
+
+    def _rebuild_index(self):
+        """扫描数据文件重建偏移文件"""
+        offsets = []
+        with open(self.path, "rb") as f:
+            position = 0
+            for line in f:
+                if line.strip():
+                    offsets.append(position)
+                position += len(line)
+        with open(self.index_path, "wb") as f:
+            f.write(np.array(offsets, dtype=np.int64).tobytes())
+
+    def _load_offsets(self) -> np.ndarray:
+        if os.path.getsize(self.index_path) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.fromfile(self.index_path, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.offsets) + len(self.new_offsets)
+
+    def _offset(self, i: int) -> int:
+        if i < len(self.offsets):
+            return int(self.offsets[i])
+        return self.new_offsets[i - len(self.offsets)]
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        """按全局序号随机读取文本块"""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        self.flush()
+        with open(self.path, "rb") as f:
+            f.seek(self._offset(i))
+            return json.loads(f.readline())
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """顺序读取全部文本块"""
+        self.flush()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """追加一个文本块
+
+        Args:
+            record: 文本块记录，id 字段会被设置为全局序号
+
+        Returns:
+            int: 文本块的全局序号
+        """
+        if self.data_file is None:
+            self.data_file = open(self.path, "ab")
+            self.index_file = open(self.index_path, "ab")
+
+        chunk_id = len(self)
+        record = {"id": chunk_id, **{k: v for k, v in record.items() if k != "id"}}
+        offset = self.data_file.tell()
+        self.data_file.write(
+            (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        )
+        self.index_file.write(np.int64(offset).tobytes())
+        self.new_offsets.append(offset)
+        return chunk_id
+
+    def extend(self, records: Iterable[Dict[str, Any]]) -> int:
+        """追加多个文本块，返回追加的数量"""
+        count = 0
+        for record in records:
+            self.append(record)
+            count += 1
+        return count
+
+    def flush(self):
+        if self.data_file is not None:
+            self.data_file.flush()
+            self.index_file.flush()
+
+    def close(self):
+        if self.data_file is not None:
+            self.data_file.close()
+            self.index_file.close()
+            self.data_file = None
+            self.index_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
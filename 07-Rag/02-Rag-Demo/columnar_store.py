@@ -0,0 +1,294 @@
+import os
+import json
+import shutil
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+
+
+"""
+本模块负责以列式格式存储文本块和元数据，并通过内存映射按需读取。
+
+   目录结构（<索引路径>.store/）：
+   ├── schema.json             # 记录数量、相似度度量、元数据列及其类型
+   ├── texts.bin               # 所有文本块 UTF-8 编码后首尾相接
+   ├── texts.offsets.npy       # 每个文本块在 texts.bin 中的起止偏移（int64，长度 n+1）
+   ├── meta.<列名>.npy         # 整数列
+   └── meta.<列名>.bin / .offsets.npy  # 字符串列或 JSON 列，格式同文本块
+
+   写入：<索引路径>.store.tmp/ 写完 → 旧目录改名为 .store.old/ → .tmp 改名为 .store/ → 删除 .old
+   两次改名之间进程中断时，下次打开或写入前由 recover_store 恢复（见该函数）。
+"""
+
+
+class StringWriter:
+    def __init__(self, path_prefix: str):
+        """以追加方式写入字符串列：UTF-8 数据文件和偏移数组
+
+        Args:
+            path_prefix: 列文件路径前缀（不包含 .bin / .offsets.npy）
+        """
+        self.path_prefix = path_prefix
+        self.file = open(f"{path_prefix}.bin", "wb")
+        self.offsets_file = open(f"{path_prefix}.offsets.tmp", "wb")
+        self.position = 0
+        self.count = 0
+        self.offsets_file.write(np.int64(0).tobytes())
+
+    def append(self, value: str):
+        data = value.encode("utf-8")
+        self.file.write(data)
+        self.position += len(data)
+        self.count += 1
+        self.offsets_file.write(np.int64(self.position).tobytes())
+
+    def close(self):
+        """关闭文件，并将偏移转换为 .npy 格式"""
+        self.file.close()
+        self.offsets_file.close()
+        raw = np.memmap(
+            f"{self.path_prefix}.offsets.tmp", dtype=np.int64, mode="r", shape=(self.count + 1,)
+        )
+        np.save(f"{self.path_prefix}.offsets.npy", raw)
+        del raw
+        os.remove(f"{self.path_prefix}.offsets.tmp")
+
+
+class StringColumn:
+    def __init__(self, path_prefix: str):
+        """以内存映射方式打开字符串列，只在访问时解码对应的行
+
+        Args:
+            path_prefix: 列文件路径前缀（不包含 .bin / .offsets.npy）
+        """
+        self.offsets = np.load(f"{path_prefix}.offsets.npy", mmap_mode="r")
+        # 空文件无法内存映射
+        if os.path.getsize(f"{path_prefix}.bin") > 0:
+            self.data = np.memmap(f"{path_prefix}.bin", dtype=np.uint8, mode="r")
+        else:
+            self.data = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.data[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class MetadataColumns:
+    def __init__(self, store_dir: str, columns: Dict[str, str], count: int):
+        """以列式方式读取元数据，访问某一行时才组装为字典
+
+        Args:
+            store_dir: 存储目录
+            columns: {列名: 类型}，类型为 int、str 或 json
+            count: 记录数量
+        """
+        self.count = count
+        self.columns = {}
+        for name, column_type in columns.items():
+            path_prefix = os.path.join(store_dir, f"meta.{name}")
+            if column_type == "int":
+                self.columns[name] = (column_type, np.load(f"{path_prefix}.npy", mmap_mode="r"))
+            else:
+                self.columns[name] = (column_type, StringColumn(path_prefix))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        row = {}
+        for name, (column_type, column) in self.columns.items():
+            if column_type == "int":
+                row[name] = int(column[i])
+            elif column_type == "str":
+                row[name] = column[i]
+            else:
+                value = json.loads(column[i])
+                # json 列中缺失的字段不写入结果
+                if value is not None:
+                    row[name] = value
+        return row
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+def recover_store(store_dir: str):
+    """恢复替换目录时中断的存储
+
+    存储目录不存在时：临时目录已写完（schema.json 最后写入）则使用新数据，
+    否则将 .old 目录改回原名，使用上一次写入的数据。存储目录存在时删除残留的 .old 目录。
+
+    Args:
+        store_dir: 存储目录
+    """
+    tmp_dir = f"{store_dir}.tmp"
+    old_dir = f"{store_dir}.old"
+    if not os.path.isdir(store_dir):
+        if os.path.exists(os.path.join(tmp_dir, "schema.json")):
+            os.rename(tmp_dir, store_dir)
+        elif os.path.isdir(old_dir):
+            os.rename(old_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+class StoreWriter:
+    def __init__(self, store_dir: str):
+        """以流式方式写入文本块和元数据
+
+        逐条追加，内存占用与记录数量无关。先写入临时目录，
+        调用 close 时再替换旧目录，正在读取旧文件的进程不受影响。
+
+        Args:
+            store_dir: 存储目录
+        """
+        self.store_dir = store_dir
+        self.tmp_dir = f"{store_dir}.tmp"
+        recover_store(store_dir)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+
+        self.texts = StringWriter(os.path.join(self.tmp_dir, "texts"))
+        # 元数据先逐行暂存为 JSONL，列类型确定后再转换为列式格式
+        self.meta_file = open(
+            os.path.join(self.tmp_dir, "meta.jsonl"), "w", encoding="utf-8"
+        )
+        self.column_types: Dict[str, str] = {}
+        self.column_counts: Dict[str, int] = {}
+        self.count = 0
+
+    def append(self, text: str, meta: Dict[str, Any]):
+        """追加一条记录"""
+        self.texts.append(text)
+        self.meta_file.write(json.dumps(meta, ensure_ascii=False) + "\n")
+        self.count += 1
+
+        for name, value in meta.items():
+            if isinstance(value, int) and not isinstance(value, bool):
+                value_type = "int"
+            elif isinstance(value, str):
+                value_type = "str"
+            else:
+                value_type = "json"
+            current = self.column_types.get(name, value_type)
+            self.column_types[name] = current if current == value_type else "json"
+            self.column_counts[name] = self.column_counts.get(name, 0) + 1
+
+    def _write_columns(self) -> Dict[str, str]:
+        """将暂存的元数据转换为列式格式"""
+        columns = {}
+        writers = {}
+        for name, column_type in self.column_types.items():
+            # 部分记录缺少的字段以 JSON 列存储，以区分缺失值
+            if self.column_counts[name] < self.count:
+                column_type = "json"
+            columns[name] = column_type
+            path_prefix = os.path.join(self.tmp_dir, f"meta.{name}")
+            if column_type == "int":
+                writers[name] = np.lib.format.open_memmap(
+                    f"{path_prefix}.npy", mode="w+", dtype=np.int64, shape=(self.count,)
+                )
+            else:
+                writers[name] = StringWriter(path_prefix)
+
+        meta_path = os.path.join(self.tmp_dir, "meta.jsonl")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                meta = json.loads(line)
+                for name, column_type in columns.items():
+                    value = meta.get(name)
+                    if column_type == "int":
+                        writers[name][i] = value
+                    elif column_type == "str":
+                        writers[name].append(value)
+                    else:
+                        writers[name].append(json.dumps(value, ensure_ascii=False))
+
+        for name, writer in writers.items():
+            if columns[name] == "int":
+                writer.flush()
+                del writer
+            else:
+                writer.close()
+        os.remove(meta_path)
+        return columns
+
+    def abort(self):
+        """放弃写入，删除临时目录，旧目录保持不变"""
+        self.texts.file.close()
+        self.texts.offsets_file.close()
+        self.meta_file.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def close(self, extra: Optional[Dict[str, Any]] = None):
+        """完成写入并替换旧目录
+
+        Args:
+            extra: 需要一并写入 schema.json 的其他信息
+        """
+        self.texts.close()
+        self.meta_file.close()
+        columns = self._write_columns()
+
+        schema = {"count": self.count, "columns": columns}
+        schema.update(extra or {})
+        with open(os.path.join(self.tmp_dir, "schema.json"), "w", encoding="utf-8") as f:
+            json.dump(schema, f, ensure_ascii=False, indent=2)
+
+        old_dir = f"{self.store_dir}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(self.store_dir):
+            os.rename(self.store_dir, old_dir)
+        os.rename(self.tmp_dir, self.store_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def save_store(
+    store_dir: str,
+    texts: List[str],
+    metadata: List[Dict[str, Any]],
+    extra: Optional[Dict[str, Any]] = None,
+):
+    """保存文本块和元数据
+
+    Args:
+        store_dir: 存储目录
+        texts: 文本块列表
+        metadata: 元数据列表
+        extra: 需要一并写入 schema.json 的其他信息
+    """
+    writer = StoreWriter(store_dir)
+    for text, meta in zip(texts, metadata):
+        writer.append(text, meta)
+    writer.close(extra)
+
+
+def load_store(store_dir: str):
+    """以内存映射方式打开文本块和元数据
+
+    Args:
+        store_dir: 存储目录
+
+    Returns:
+        Tuple[StringColumn, MetadataColumns, Dict[str, Any]]: 文本块、元数据和 schema
+    """
+    recover_store(store_dir)
+    with open(os.path.join(store_dir, "schema.json"), "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    texts = StringColumn(os.path.join(store_dir, "texts"))
+    metadata = MetadataColumns(store_dir, schema["columns"], schema["count"])
+    return texts, metadata, schema
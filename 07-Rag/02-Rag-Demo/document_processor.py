@@ -1,34 +1,57 @@
 import os
-from typing import List, Union, Generator
+from typing import List, Union, Generator, Iterator, Tuple, Dict, Any, Optional
 import re
+import tempfile
+import bisect
 from docx import Document
 from PyPDF2 import PdfReader
 from tqdm import tqdm
-import bisect
 from multiprocessing import Pool
 from functools import partial
+from index_manifest import hash_text
+from chunk_store import ChunkStore
+from text_chunker import TextChunker, find_sentence_boundaries
 
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(
+        self,
+        chunk_unit: str = "char",
+        num_workers: Optional[int] = None,
+        large_file_size: int = 10 * 1024 * 1024,
+        pages_per_task: int = 50,
+    ):
         """初始化文档处理器
         
         初始化文档处理器，准备处理各种格式的文档。
         目前支持 txt、pdf、docx 格式的文档。
+        
+        Args:
+            chunk_unit: 文本块大小的单位，char 为字符数，token 为词元数（见 text_chunker）
+            num_workers: 并行处理的进程数，默认为 CPU 核数
+            large_file_size: 超过该大小（字节）的 PDF 按页拆分为多个任务并行处理
+            pages_per_task: 拆分大文件时每个任务处理的页数
         """
-        pass
+        self.chunk_unit = chunk_unit
+        self.num_workers = num_workers
+        self.large_file_size = large_file_size
+        self.pages_per_task = pages_per_task
 
-    def load_document(self, file_path: str) -> str:
-        """加载文档内容
+    def iter_document(
+        self, file_path: str, page_range: Optional[Tuple[int, int]] = None
+    ) -> Generator[Tuple[str, Optional[int]], None, None]:
+        """逐段读取文档内容
         
-        根据文件扩展名选择合适的方法加载文档内容。
-        支持 txt、pdf、docx 格式。
+        不会一次性载入完整文档：
+        PDF 逐页提取文本，DOCX 逐段落读取，TXT 逐行读取。
         
         Args:
             file_path: 文档文件路径
+            page_range: 只读取指定的页 (起始页码, 结束页码)，页码从 1 开始且包含两端，仅对 PDF 有效
             
         Returns:
-            str: 文档的文本内容
+            Generator[Tuple[str, Optional[int]], None, None]: (文本片段, 页码) 生成器，
+                页码从 1 开始；DOCX 的页码根据文档中的分页符推算，TXT 没有页码
             
         Raises:
             FileNotFoundError: 文件不存在时抛出
@@ -43,16 +66,26 @@ class DocumentProcessor:
         try:
             if file_ext == ".txt":
                 with open(file_path, "r", encoding="utf-8") as f:
-                    return f.read()
+                    for line in f:
+                        yield line, None
             elif file_ext == ".pdf":
-                reader = PdfReader(file_path)
-                text_parts = []
-                for page in reader.pages:
-                    text_parts.append(page.extract_text())
-                return "".join(text_parts)
+                # 传入文件对象而不是路径，PdfReader 不会把整个文件读入内存
+                with open(file_path, "rb") as f:
+                    reader = PdfReader(f)
+                    first, last = page_range or (1, len(reader.pages))
+                    for page_number in range(first, last + 1):
+                        yield reader.pages[page_number - 1].extract_text() or "", page_number
             elif file_ext == ".docx":
                 doc = Document(file_path)
-                return "\n".join([paragraph.text for paragraph in doc.paragraphs])
+                page_number = 1
+                for paragraph in doc.paragraphs:
+                    yield paragraph.text, page_number
+                    # 段落中的手动分页符和 Word 保存时记录的分页位置
+                    page_number += len(
+                        paragraph._p.xpath(
+                            './/w:br[@w:type="page"] | .//w:lastRenderedPageBreak'
+                        )
+                    )
             else:
                 raise ValueError(f"不支持的文件格式: {file_ext}")
         except (IOError, ValueError) as e:
@@ -91,11 +124,25 @@ class DocumentProcessor:
         Returns:
             List[int]: 句子边界位置的列表
         """
-        boundaries = []
-        for i, char in enumerate(text):
-            if char in ".。!！?？\n":
-                boundaries.append(i)
-        return boundaries
+        return find_sentence_boundaries(text)
+
+    def split_text_spans(
+        self, text: str, chunk_size: int = 1000, chunk_overlap: int = 200
+    ) -> List[Tuple[int, int]]:
+        """将文本分割成块，返回每个块在文本中的起止位置
+        
+        分割规则与 split_text 相同，块首尾的空白字符不计入范围。
+        句子边界查找和分块均为线性时间，实现见 text_chunker.TextChunker。
+        
+        Args:
+            text: 要分割的文本
+            chunk_size: 每个块的最大长度（单位见 chunk_unit）
+            chunk_overlap: 相邻块之间的重叠长度
+            
+        Returns:
+            List[Tuple[int, int]]: (起始位置, 结束位置) 列表，text[start:end] 即为文本块
+        """
+        return TextChunker(chunk_size, chunk_overlap, self.chunk_unit).split_spans(text)
 
     def split_text(
         self, text: str, chunk_size: int = 1000, chunk_overlap: int = 200
@@ -107,76 +154,328 @@ class DocumentProcessor:
         
         Args:
             text: 要分割的文本
-            chunk_size: 每个块的最大字符数
-            chunk_overlap: 相邻块之间的重叠字符数
+            chunk_size: 每个块的最大长度（单位见 chunk_unit）
+            chunk_overlap: 相邻块之间的重叠长度
             
         Returns:
             List[str]: 文本块列表
         """
-        if not text:
-            return []
-
-        boundaries = self.find_sentence_boundaries(text)
-        if not boundaries:
-            return [
-                text[i : i + chunk_size]
-                for i in range(0, len(text), chunk_size - chunk_overlap)
-            ]
-
-        chunks = []
-        start = 0
-        text_length = len(text)
-
-        while start < text_length:
-            end = min(start + chunk_size, text_length)
-
-            if end < text_length:
-                boundary_idx = bisect.bisect_right(boundaries, end) - 1
-                if boundary_idx >= 0:
-                    end = boundaries[boundary_idx] + 1
-
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
+        return [
+            text[start:end]
+            for start, end in self.split_text_spans(text, chunk_size, chunk_overlap)
+        ]
 
-            start = end - chunk_overlap
+    def iter_preprocessed(
+        self,
+        file_path: str,
+        page_starts: List[Tuple[int, Optional[int]]],
+        page_range: Optional[Tuple[int, int]] = None,
+    ) -> Generator[str, None, None]:
+        """逐段读取并预处理文档，记录每一页在预处理后文本中的起始位置
+        
+        各片段分别预处理后以空格连接，结果与整篇预处理基本一致。
+        
+        Args:
+            file_path: 文档文件路径
+            page_starts: 用于记录 (起始位置, 页码) 的列表，读取过程中追加
+            page_range: 只读取指定的页，见 iter_document
+            
+        Returns:
+            Generator[str, None, None]: 预处理后的文本片段生成器
+        """
+        position = 0
+        for segment, page_number in self.iter_document(file_path, page_range):
+            segment = self.preprocess_text(segment)
+            if not segment:
+                continue
+            if position > 0:
+                yield " "
+                position += 1
+            if not page_starts or page_number != page_starts[-1][1]:
+                page_starts.append((position, page_number))
+            yield segment
+            position += len(segment)
 
-        return chunks
+    def iter_single_file(
+        self,
+        file_path: str,
+        chunk_size: int,
+        chunk_overlap: int,
+        page_range: Optional[Tuple[int, int]] = None,
+    ) -> Generator[Tuple[str, Dict[str, Any]], None, None]:
+        """逐个产出单个文件的文本块及其位置信息
+        
+        逐段加载、预处理并流式分割文件内容，不在内存中保留完整文档或全部文本块。
+        
+        Args:
+            file_path: 文件路径
+            chunk_size: 文本块大小
+            chunk_overlap: 文本块重叠大小
+            page_range: 只处理指定的页，见 iter_document
+            
+        Returns:
+            Generator[Tuple[str, Dict[str, Any]], None, None]: (文本块, 位置信息) 生成器，
+                位置信息包含 start / end（在预处理后文本中的字符位置），
+                有页码时还包含 page / page_end
+        """
+        chunker = TextChunker(chunk_size, chunk_overlap, self.chunk_unit)
+        page_starts: List[Tuple[int, Optional[int]]] = []
+        positions: List[int] = []
+        for chunk, start, end in chunker.split_stream(
+            self.iter_preprocessed(file_path, page_starts, page_range)
+        ):
+            info = {"start": start, "end": end}
+            # 页起始位置按顺序追加，增量维护用于二分查找的位置列表
+            positions.extend(pos for pos, _ in page_starts[len(positions) :])
+            first = page_starts[bisect.bisect_right(positions, start) - 1][1]
+            last = page_starts[bisect.bisect_right(positions, end - 1) - 1][1]
+            if first is not None:
+                info["page"] = first
+                info["page_end"] = last
+            yield chunk, info
 
     def process_single_file(
-        self, file_path: str, chunk_size: int, chunk_overlap: int
-    ) -> List[str]:
+        self,
+        file_path: str,
+        chunk_size: int,
+        chunk_overlap: int,
+        with_metadata: bool = False,
+        page_range: Optional[Tuple[int, int]] = None,
+    ) -> Union[List[str], List[Tuple[str, Dict[str, Any]]]]:
         """处理单个文件
         
-        加载、预处理并分割单个文件的内容。
+        返回文件的全部文本块列表，适合小文件；大批量处理请使用 process_files，
+        文本块会写入临时文件而不是保存在内存中。
         
         Args:
             file_path: 文件路径
             chunk_size: 文本块大小
             chunk_overlap: 文本块重叠大小
+            with_metadata: 是否同时返回每个文本块的位置信息
+            page_range: 只处理指定的页，见 iter_document
             
         Returns:
-            List[str]: 处理后的文本块列表
+            Union[List[str], List[Tuple[str, Dict[str, Any]]]]: 处理后的文本块列表，
+                with_metadata 为 True 时为 (文本块, 位置信息) 列表，格式见 iter_single_file
         """
         try:
-            print(f"开始处理文件: {file_path}")
-            text = self.load_document(file_path)
-            print(f"文件加载完成，开始预处理...")
-            text = self.preprocess_text(text)
-            print(f"预处理完成，开始分割...")
-            chunks = self.split_text(text, chunk_size, chunk_overlap)
+            chunks = [
+                (chunk, info) if with_metadata else chunk
+                for chunk, info in self.iter_single_file(
+                    file_path, chunk_size, chunk_overlap, page_range
+                )
+            ]
             print(f"分割完成，共 {len(chunks)} 个文本块")
             return chunks
         except Exception as e:
             print(f"处理文件 {file_path} 时出错: {str(e)}")
             return []
 
+    def list_documents(self, directory_path: str, recursive: bool = True) -> List[str]:
+        """列出目录下所有支持的文档
+        
+        Args:
+            directory_path: 目录路径
+            recursive: 是否包含子目录中的文档
+            
+        Returns:
+            List[str]: 文档路径列表
+            
+        Raises:
+            NotADirectoryError: 目录不存在时抛出
+        """
+        if not os.path.isdir(directory_path):
+            raise NotADirectoryError(f"目录不存在: {directory_path}")
+
+        supported_extensions = (".txt", ".pdf", ".docx")
+        files = []
+        for root, dirs, names in os.walk(directory_path):
+            dirs.sort()
+            files.extend(
+                os.path.join(root, f)
+                for f in sorted(names)
+                if any(f.lower().endswith(ext) for ext in supported_extensions)
+            )
+            if not recursive:
+                break
+        return files
+
+    def plan_tasks(
+        self, file_paths: List[str]
+    ) -> List[Tuple[str, int, Optional[Tuple[int, int]], int]]:
+        """将文档拆分为处理任务，并按预估工作量从大到小排序
+        
+        大的 PDF 按页拆分为多个任务，使单个大文件可以由多个进程并行处理；
+        先处理大任务，避免最后剩下一个大文件而其他进程空闲。
+        
+        Args:
+            file_paths: 文档路径列表
+            
+        Returns:
+            List[Tuple[str, int, Optional[Tuple[int, int]], int]]:
+                (文件路径, 分段序号, 页码范围, 预估工作量) 列表，工作量以字节计
+        """
+        tasks = []
+        for file_path in file_paths:
+            size = os.path.getsize(file_path)
+            page_count = 0
+            if file_path.lower().endswith(".pdf") and size > self.large_file_size:
+                try:
+                    with open(file_path, "rb") as f:
+                        page_count = len(PdfReader(f).pages)
+                except Exception as e:
+                    print(f"读取文件 {file_path} 页数失败，不拆分: {str(e)}")
+
+            if page_count <= self.pages_per_task:
+                tasks.append((file_path, 0, None, size))
+                continue
+
+            for part, first in enumerate(range(1, page_count + 1, self.pages_per_task)):
+                last = min(first + self.pages_per_task - 1, page_count)
+                weight = size * (last - first + 1) // page_count
+                tasks.append((file_path, part, (first, last), weight))
+
+        tasks.sort(key=lambda task: task[3], reverse=True)
+        return tasks
+
+    def _process_task(
+        self,
+        task: Tuple[str, int, Optional[Tuple[int, int]], int],
+        chunk_size: int,
+        chunk_overlap: int,
+        spill_dir: str,
+    ) -> Tuple[str, int, Optional[str]]:
+        """在子进程中执行单个任务
+        
+        文本块逐个写入 spill_dir 下的临时 ChunkStore，只把文件路径传回主进程，
+        子进程和主进程都不需要在内存中保存整个文件的文本块。
+        处理失败时删除临时文件并返回 None，由主进程丢弃整个文件。
+        """
+        file_path, part, page_range, _ = task
+        if page_range:
+            print(f"开始处理文件: {file_path}（第 {page_range[0]}-{page_range[1]} 页）")
+        else:
+            print(f"开始处理文件: {file_path}")
+
+        spill_path = os.path.join(spill_dir, f"{os.getpid()}-{hash_text(file_path)}-{part}.jsonl")
+        store = ChunkStore(spill_path, overwrite=True)
+        try:
+            for chunk, info in self.iter_single_file(
+                file_path, chunk_size, chunk_overlap, page_range
+            ):
+                store.append({**info, "text": chunk})
+        except Exception as e:
+            print(f"处理文件 {file_path} 时出错: {str(e)}")
+            store.close()
+            self._remove_spill(spill_path)
+            return file_path, part, None
+        store.close()
+        print(f"分割完成，共 {len(store)} 个文本块")
+        return file_path, part, spill_path
+
+    @staticmethod
+    def _remove_spill(spill_path: str):
+        """删除临时 ChunkStore 的数据文件和偏移文件"""
+        for path in (spill_path, f"{spill_path}.idx"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _merge_parts(
+        self, spill_paths: List[str], with_metadata: bool
+    ) -> Generator[Union[str, Tuple[str, Dict[str, Any]]], None, None]:
+        """按页码顺序逐个读出同一文件各分段的文本块
+        
+        各分段的字符位置相对于分段本身，合并时换算为相对于整个文件（分段之间以一个空格连接，
+        与 iter_preprocessed 一致）。预处理后的文本以非空白字符结尾，
+        因此分段最后一个块的结束位置即为该分段的文本长度。读完的临时文件随即删除。
+        """
+        offset = 0
+        for spill_path in spill_paths:
+            store = ChunkStore(spill_path)
+            end = None
+            for record in store:
+                chunk = record.pop("text")
+                record.pop("id")
+                record["start"] += offset
+                record["end"] += offset
+                end = record["end"]
+                yield (chunk, record) if with_metadata else chunk
+            if end is not None:
+                offset = end + 1
+            self._remove_spill(spill_path)
+
+    def process_files(
+        self,
+        file_paths: List[str],
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        with_metadata: bool = False,
+    ) -> Generator[Tuple[str, Iterator], None, None]:
+        """并行处理一组文档
+        
+        使用多进程处理文档，按文件返回分块结果，便于调用方记录每个块的来源。
+        任务按工作量从大到小调度，哪个进程空闲就领取下一个任务，
+        文件按处理完成的顺序返回，不保证与输入顺序一致。
+        大的 PDF 按页拆分并行处理，分段边界处的文本块不跨越分段。
+        
+        子进程把文本块写入临时文件，主进程按需逐个读出，内存占用与文件大小无关。
+        返回的文本块迭代器需在取下一个文件之前读完，之后临时文件会被清理。
+        处理失败的文件不会返回；大文件的任一分段失败时整个文件都会被丢弃，
+        避免缺失的分段使其余分段的字符位置和块序号错位。
+        
+        Args:
+            file_paths: 文档路径列表
+            chunk_size: 文本块大小
+            chunk_overlap: 文本块重叠大小
+            with_metadata: 是否同时返回文本块的位置信息，格式见 iter_single_file
+            
+        Returns:
+            Generator[Tuple[str, Iterator], None, None]: (文件路径, 文本块迭代器) 生成器
+        """
+        if not file_paths:
+            return
+
+        tasks = self.plan_tasks(file_paths)
+        part_counts: Dict[str, int] = {}
+        for file_path, _, _, _ in tasks:
+            part_counts[file_path] = part_counts.get(file_path, 0) + 1
+        pending: Dict[str, Dict[int, Optional[str]]] = {}
+
+        with tempfile.TemporaryDirectory(prefix="chunks-") as spill_dir, Pool(
+            self.num_workers
+        ) as pool:
+            process_func = partial(
+                self._process_task,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                spill_dir=spill_dir,
+            )
+
+            with tqdm(total=len(part_counts), desc="处理文档") as progress:
+                for file_path, part, spill_path in pool.imap_unordered(process_func, tasks):
+                    parts = pending.setdefault(file_path, {})
+                    parts[part] = spill_path
+                    if len(parts) < part_counts[file_path]:
+                        continue
+
+                    del pending[file_path]
+                    progress.update(1)
+                    spill_paths = [parts[i] for i in range(len(parts))]
+                    if None in spill_paths:
+                        print(f"文件 {file_path} 有分段处理失败，跳过整个文件")
+                        for spill_path in spill_paths:
+                            if spill_path is not None:
+                                self._remove_spill(spill_path)
+                        continue
+
+                    yield file_path, self._merge_parts(spill_paths, with_metadata)
+
     def process_directory(
         self, directory_path: str, chunk_size: int = 1000, chunk_overlap: int = 200
     ) -> Generator[str, None, None]:
         """处理整个目录下的文档
         
-        并行处理目录下的所有文档，支持 txt、pdf、docx 格式。
+        并行处理目录（包括子目录）下的所有文档，支持 txt、pdf、docx 格式。
         使用多进程加速处理。
         
         Args:
@@ -190,28 +489,44 @@ class DocumentProcessor:
         Raises:
             NotADirectoryError: 目录不存在时抛出
         """
-        if not os.path.isdir(directory_path):
-            raise NotADirectoryError(f"目录不存在: {directory_path}")
+        files = self.list_documents(directory_path)
 
-        supported_extensions = (".txt", ".pdf", ".docx")
-        files = [
-            f
-            for f in os.listdir(directory_path)
-            if any(f.lower().endswith(ext) for ext in supported_extensions)
-        ]
+        for _, chunks in self.process_files(files, chunk_size, chunk_overlap):
+            for chunk in chunks:
+                yield chunk
 
-        with Pool() as pool:
-            process_func = partial(
-                self.process_single_file, chunk_size=chunk_size, chunk_overlap=chunk_overlap
-            )
+    def iter_chunks(
+        self, directory_path: str, chunk_size: int = 1000, chunk_overlap: int = 200
+    ) -> Generator[Tuple[str, Dict[str, Any]], None, None]:
+        """处理整个目录下的文档，逐个返回文本块及其来源信息
+        
+        与 process_directory 相同，但每个文本块附带元数据，
+        可直接交给 EmbeddingProcessor.build_index_from_stream 构建索引。
+        
+        Args:
+            directory_path: 目录路径
+            chunk_size: 文本块大小
+            chunk_overlap: 文本块重叠大小
+            
+        Returns:
+            Generator[Tuple[str, Dict[str, Any]], None, None]: (文本块, 元数据) 生成器，
+                元数据包含 source（相对路径）、chunk_id（文件内序号）、
+                start / end（在预处理后文本中的字符位置）、page / page_end（起止页码，
+                仅 PDF 和 DOCX）和 chunk_hash
+        """
+        files = self.list_documents(directory_path)
 
-            for chunks in tqdm(
-                pool.imap(process_func, [os.path.join(directory_path, f) for f in files]),
-                total=len(files),
-                desc="处理文档",
-            ):
-                for chunk in chunks:
-                    yield chunk
+        for file_path, chunks in self.process_files(
+            files, chunk_size, chunk_overlap, with_metadata=True
+        ):
+            source = os.path.relpath(file_path, directory_path)
+            for chunk_id, (chunk, info) in enumerate(chunks):
+                yield chunk, {
+                    "source": source,
+                    "chunk_id": chunk_id,
+                    **info,
+                    "chunk_hash": hash_text(chunk),
+                }
 
     def process_directory_and_save(
         self, 
@@ -222,8 +537,8 @@ class DocumentProcessor:
     ) -> str:
         """处理目录下的所有文档并保存结果
         
-        处理目录下的所有文档，并将结果保存到指定目录。
-        每个文本块都会添加序号标记。
+        处理目录下的所有文档，逐块写入 chunks.jsonl（格式见 chunk_store）。
+        每个文本块记录来源文件、文件内序号、字符位置和内容哈希。
         
         Args:
             input_dir: 输入文档目录
@@ -237,16 +552,13 @@ class DocumentProcessor:
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
         
-        # 处理文档
+        # 处理文档并逐块保存
         print("\n处理文档...")
-        chunks = list(self.process_directory(input_dir, chunk_size, chunk_overlap))
-        print(f"✓ 处理完成，共 {len(chunks)} 个文本块")
-        
-        # 保存结果
-        output_file = os.path.join(output_dir, "processed_chunks.txt")
-        with open(output_file, "w", encoding="utf-8") as f:
-            for i, chunk in enumerate(chunks, 1):
-                f.write(f"=== 块 {i} ===\n{chunk}\n\n")
+        output_file = os.path.join(output_dir, "chunks.jsonl")
+        with ChunkStore(output_file, overwrite=True) as store:
+            for chunk, meta in self.iter_chunks(input_dir, chunk_size, chunk_overlap):
+                store.append({**meta, "text": chunk})
+            print(f"✓ 处理完成，共 {len(store)} 个文本块")
         print(f"✓ 结果已保存到: {output_file}")
         
-        return output_file 
\ No newline at end of file
+        return output_file
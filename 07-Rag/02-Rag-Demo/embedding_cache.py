@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+import numpy as np
+from index_manifest import hash_text
+
+
+"""
+本模块负责持久化缓存文本向量，避免重复调用向量化接口。
+
+   缓存键：(模型, 向量维度, 文本哈希)
+   存储：SQLite，按最近访问时间进行 LRU 淘汰
+"""
+
+
+class EmbeddingCache:
+    def __init__(self, cache_path: str, max_entries: int = 100000):
+        """初始化向量缓存
+
+        Args:
+            cache_path: SQLite 缓存文件路径
+            max_entries: 最多缓存的向量数量，超出后淘汰最久未访问的向量
+        """
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings (last_access)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model: str, dimension: int, text: str) -> str:
+        """生成缓存键"""
+        return f"{model}:{dimension}:{hash_text(text)}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """批量查询缓存
+
+        Args:
+            keys: 缓存键列表
+
+        Returns:
+            Dict[str, np.ndarray]: 命中的 {缓存键: 向量}
+        """
+        if not keys:
+            return {}
+
+        found = {}
+        with self.lock:
+            # SQLite 单条语句的参数数量有限，分批查询
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self.conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        """批量写入缓存，并在超出容量时淘汰最久未访问的向量
+
+        Args:
+            items: {缓存键: 向量}
+        """
+        if not items:
+            return
+
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for key, vector in items.items()
+                ],
+            )
+            count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                self.conn.execute(
+                    """
+                    DELETE FROM embeddings WHERE key IN (
+                        SELECT key FROM embeddings ORDER BY last_access LIMIT ?
+                    )
+                    """,
+                    (count - self.max_entries,),
+                )
+            self.conn.commit()
+
+    def close(self):
+        """关闭缓存连接"""
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,253 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional
+import numpy as np
+from tqdm import tqdm
+
+
+"""
+本模块负责并发执行向量化请求，并根据限流情况和请求延迟自适应调整请求速率、并发数和批次大小。
+
+   按当前批次大小取出下一批 → 令牌桶限速 → 多个批次并发请求 → 按原顺序写回结果
+                             → 限流 / 网络错误 / 5xx：带抖动的指数退避重试同一批次
+                             → 输入被拒绝（400 等）：拆分批次定位有问题的文本，单条被拒绝的文本返回 None
+                             → 重试耗尽：抛出 EmbeddingError，不再以 None 填充整批
+"""
+
+
+class AdaptiveRateLimiter:
+    def __init__(
+        self,
+        requests_per_second: float = 10.0,
+        max_concurrency: int = 8,
+        min_rate: float = 0.5,
+        target_latency: float = 5.0,
+        max_batch_size: int = 10,
+    ):
+        """初始化自适应限流器
+
+        使用令牌桶控制请求速率，同时限制同时进行的请求数量和每批的文本数量。
+        遇到限流（429）时速率、并发数和批次大小减半，请求成功时缓慢恢复（加性增、乘性减）；
+        请求延迟超过目标值时并发数减一、批次大小减半。
+
+        Args:
+            requests_per_second: 最大请求速率
+            max_concurrency: 最大并发请求数
+            min_rate: 最小请求速率
+            target_latency: 目标请求延迟（秒）
+            max_batch_size: 最大批次大小
+        """
+        self.max_rate = requests_per_second
+        self.min_rate = min_rate
+        self.rate = requests_per_second
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.max_batch_size = max_batch_size
+        self.batch_size = max_batch_size
+        self.tokens = 1.0
+        self.in_flight = 0
+        self.last_refill = time.monotonic()
+        self.condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            max(self.rate, 1.0), self.tokens + (now - self.last_refill) * self.rate
+        )
+        self.last_refill = now
+
+    def acquire(self):
+        """等待令牌和并发名额"""
+        with self.condition:
+            while True:
+                self._refill()
+                if self.in_flight < self.concurrency and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    self.in_flight += 1
+                    return
+                wait = (1.0 - self.tokens) / self.rate if self.tokens < 1.0 else None
+                self.condition.wait(timeout=wait)
+
+    def release(self, throttled: bool = False, latency: float = 0.0):
+        """归还并发名额，并根据请求结果调整速率和并发数
+
+        Args:
+            throttled: 本次请求是否被限流
+            latency: 本次请求耗时（秒）
+        """
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.concurrency = max(1, self.concurrency // 2)
+                self.batch_size = max(1, self.batch_size // 2)
+            elif latency > self.target_latency:
+                self.concurrency = max(1, self.concurrency - 1)
+                self.batch_size = max(1, self.batch_size // 2)
+            else:
+                self.rate = min(self.max_rate, self.rate + 0.1 * self.max_rate)
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+                self.batch_size = min(self.max_batch_size, self.batch_size + 1)
+            self.condition.notify_all()
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """判断异常是否为限流错误（HTTP 429，openai.RateLimitError 也带有该状态码）
+
+    只看状态码，不匹配异常文本，避免请求 ID 或文本内容中恰好出现 429 时误判。
+    """
+    return getattr(error, "status_code", None) == 429
+
+
+def is_rejected_input(error: Exception) -> bool:
+    """判断异常是否为输入被拒绝（除限流和超时外的 4xx），重试同样的输入不会成功"""
+    status_code = getattr(error, "status_code", None)
+    return (
+        isinstance(status_code, int)
+        and 400 <= status_code < 500
+        and status_code not in (408, 429)
+    )
+
+
+class EmbeddingError(RuntimeError):
+    """批次重试耗尽后仍然失败"""
+
+
+# 文本数量不少于该值时显示进度条，查询等少量文本不显示
+PROGRESS_MIN_TEXTS = 100
+
+
+class ConcurrentEmbedder:
+    def __init__(
+        self,
+        request_fn: Callable[[List[str]], List[np.ndarray]],
+        max_concurrency: int = 8,
+        requests_per_second: float = 10.0,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        max_batch_size: int = 10,
+    ):
+        """初始化并发向量化引擎
+
+        Args:
+            request_fn: 对一个批次调用向量化接口的函数
+            max_concurrency: 最大并发批次数
+            requests_per_second: 最大请求速率
+            max_retries: 每个批次的最大重试次数
+            base_delay: 重试退避的基础等待时间（秒）
+            max_delay: 重试退避的最长等待时间（秒）
+            max_batch_size: 最大批次大小，实际批次大小由限流器根据限流和延迟调整
+        """
+        self.request_fn = request_fn
+        self.max_concurrency = max_concurrency
+        self.limiter = AdaptiveRateLimiter(
+            requests_per_second, max_concurrency, max_batch_size=max_batch_size
+        )
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="embed"
+        )
+
+    def _run_batch(self, batch: List[str]) -> List[Optional[np.ndarray]]:
+        """执行单个批次
+
+        限流、网络错误和服务端错误时按指数退避加随机抖动重试同一批次；
+        输入被拒绝时将批次一分为二分别执行，定位有问题的文本，单条被拒绝的文本返回 None。
+
+        Raises:
+            EmbeddingError: 重试耗尽后仍然失败时抛出
+        """
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            throttled = False
+            start_time = time.monotonic()
+            try:
+                return self.request_fn(batch)
+            except Exception as e:
+                throttled = is_rate_limited(e)
+                if is_rejected_input(e):
+                    if len(batch) == 1:
+                        print(f"文本被向量化接口拒绝，已跳过: {str(e)}")
+                        return [None]
+                    rejected = True
+                elif attempt == self.max_retries:
+                    raise EmbeddingError(
+                        f"向量化批次失败，已重试 {attempt} 次: {str(e)}"
+                    ) from e
+                else:
+                    rejected = False
+            finally:
+                self.limiter.release(throttled, time.monotonic() - start_time)
+
+            if rejected:
+                mid = len(batch) // 2
+                return self._run_batch(batch[:mid]) + self._run_batch(batch[mid:])
+
+            delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+            time.sleep(random.uniform(0, delay))
+
+    def embed(self, texts: List[str], batch_size: int = 10) -> List[Optional[np.ndarray]]:
+        """并发创建文本向量
+
+        每次提交批次时按限流器当前的批次大小（不超过 batch_size）从剩余文本中取出下一批，
+        同时进行的批次数不超过限流器当前的并发数。只有一个批次时直接在调用线程中执行。
+
+        Args:
+            texts: 要向量化的文本列表
+            batch_size: 最大批次大小
+
+        Returns:
+            List[Optional[np.ndarray]]: 与输入顺序一致的向量列表，被接口拒绝的文本为 None
+
+        Raises:
+            EmbeddingError: 某个批次重试耗尽后仍然失败时抛出
+        """
+        if not texts:
+            return []
+        # 调用方要求更大的批次时提高批次大小上限，实际大小仍由限流器逐步调整
+        self.limiter.max_batch_size = max(self.limiter.max_batch_size, batch_size)
+        if len(texts) <= min(batch_size, self.limiter.batch_size):
+            return self._run_batch(texts)
+
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        pending = {}
+        cursor = 0
+        with tqdm(
+            total=len(texts), desc="创建向量", disable=len(texts) < PROGRESS_MIN_TEXTS
+        ) as progress:
+            try:
+                while cursor < len(texts) or pending:
+                    while cursor < len(texts) and len(pending) < self.limiter.concurrency:
+                        size = min(batch_size, self.limiter.batch_size)
+                        batch = texts[cursor : cursor + size]
+                        pending[self.executor.submit(self._run_batch, batch)] = cursor
+                        cursor += len(batch)
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        start = pending.pop(future)
+                        embeddings = future.result()
+                        results[start : start + len(embeddings)] = embeddings
+                        progress.update(len(embeddings))
+            finally:
+                # 出错时取消尚未开始的批次
+                for future in pending:
+                    future.cancel()
+
+        return results
+
+    def close(self):
+        """关闭线程池，取消尚未开始的批次"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
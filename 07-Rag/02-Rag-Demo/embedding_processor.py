@@ -1,24 +1,70 @@
 from openai import OpenAI
 from dotenv import load_dotenv
 import os
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any, Optional, Iterable, Iterator
+import copy
+import queue
+import threading
 import numpy as np
-import json
-from tqdm import tqdm
 import time
 import faiss
 import pickle
+from columnar_store import save_store, load_store, recover_store, StoreWriter
+from embedding_cache import EmbeddingCache
+from embedding_engine import ConcurrentEmbedder
+from chunk_store import ChunkStore
+from bm25_index import BM25Index
 
 
 """
 本模块负责将文本块转换为向量，并构建向量索引。
 
-   输入文件 → 读取文本块 → 创建向量 → 构建索引 → 保存结果
+   输入文件 → 读取文本块 → 创建向量 → 构建索引（同时构建 BM25 关键词索引）→ 保存结果
 """
 
+# 支持的索引类型
+INDEX_TYPES = ("auto", "flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# 支持的相似度度量：l2 为欧氏距离，cosine 为归一化向量上的内积（余弦相似度）
+METRICS = ("l2", "cosine")
+
+# 自动选择索引类型时的规模阈值
+FLAT_MAX_SIZE = 10000
+HNSW_MAX_SIZE = 1000000
+
+# 默认的向量缓存文件，索引构建和查询共用
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), "dist", "embedding_cache.db")
+
+
+def normalize_vectors(vectors: np.ndarray) -> np.ndarray:
+    """原地将 float32 向量矩阵按行做 L2 归一化"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.maximum(norms, 1e-12, out=norms)
+    np.divide(vectors, norms, out=vectors)
+    return vectors
+
+
+def read_index_version(index_path: str) -> Optional[str]:
+    """读取索引版本号，旧版本索引没有版本文件时使用索引文件的修改时间"""
+    version_file = f"{index_path}.version"
+    if os.path.exists(version_file):
+        with open(version_file, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    if os.path.exists(f"{index_path}.index"):
+        return str(os.stat(f"{index_path}.index").st_mtime_ns)
+    return None
+
 
 class EmbeddingProcessor:
-    def __init__(self, model: str = "text-embedding-v3", dimension: int = 1024):
+    def __init__(
+        self,
+        model: str = "text-embedding-v3",
+        dimension: int = 1024,
+        cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+        max_concurrency: int = 8,
+        requests_per_second: float = 10.0,
+        metric: str = "cosine",
+    ):
         """初始化向量化处理器
 
         初始化向量化处理器，设置模型和向量维度。
@@ -27,64 +73,149 @@ class EmbeddingProcessor:
         Args:
             model: 使用的向量模型名称，默认为 "text-embedding-v3"
             dimension: 向量维度，默认为 1024
+            cache_path: 向量缓存文件路径，为 None 时不使用缓存
+            max_concurrency: 同时进行的最大批次数
+            requests_per_second: 向量化接口的最大请求速率
+            metric: 相似度度量，cosine（默认）或 l2；加载索引时以索引保存的度量为准
         """
+        if metric not in METRICS:
+            raise ValueError(f"不支持的相似度度量: {metric}")
+
         load_dotenv()
         self.client = OpenAI(
             api_key=os.getenv("ALIYUN_API_KEY"), base_url=os.getenv("ALIYUN_BASE_URL")
         )
         self.model = model
         self.dimension = dimension
+        self.metric = metric
+        self.cache = EmbeddingCache(cache_path) if cache_path else None
+        self.max_concurrency = max_concurrency
+        self.embedder = ConcurrentEmbedder(
+            self._request_batch,
+            max_concurrency=max_concurrency,
+            requests_per_second=requests_per_second,
+        )
+        # 通过 share 创建的处理器与原处理器共用客户端、缓存和线程池，不负责释放
+        self.owns_resources = True
+        self._reset_index()
+
+    def _reset_index(self):
         self.index = None
+        self.version = None
+        self.embeddings = None
+        self.bm25 = None
         self.texts = []
         self.metadata = []
 
+    def share(self) -> "EmbeddingProcessor":
+        """创建一个共用客户端、向量缓存和向量化线程池的新处理器，用于加载另一个索引版本
+
+        常驻服务每次热加载索引时使用，避免每个索引版本各自创建线程池和数据库连接。
+        新处理器的 close 不会释放共用的资源，由原处理器负责释放。
+
+        Returns:
+            EmbeddingProcessor: 尚未加载索引的新处理器
+        """
+        other = copy.copy(self)
+        other.owns_resources = False
+        other._reset_index()
+        return other
+
+    def close(self):
+        """释放向量化线程池、缓存连接和 HTTP 客户端"""
+        if not self.owns_resources:
+            return
+        self.embedder.close()
+        if self.cache is not None:
+            self.cache.close()
+        self.client.close()
+
     def create_embeddings(
         self, texts: List[str], batch_size: int = 10
     ) -> List[np.ndarray]:
         """批量创建文本向量
 
         批量处理文本列表，将每个文本转换为向量。
-        使用批处理来提高效率，并添加延迟以避免 API 限制。
+        优先从向量缓存读取，只为未命中的文本调用接口。
+        多个批次并发请求，并根据限流情况和延迟自适应调整请求速率、并发数和批次大小。
 
         Args:
             texts: 要向量化的文本列表
-            batch_size: 每批处理的文本数量，默认为 10
+            batch_size: 每批最多处理的文本数量，默认为 10
 
         Returns:
-            List[np.ndarray]: 文本向量列表
+            List[np.ndarray]: 文本向量列表，被接口拒绝的文本为 None
+
+        Raises:
+            EmbeddingError: 某个批次重试耗尽后仍然失败时抛出
         """
-        embeddings = []
-        for i in tqdm(range(0, len(texts), batch_size), desc="创建向量"):
-            batch = texts[i : i + batch_size]
-            try:
-                response = self.client.embeddings.create(model=self.model, input=batch)
-                batch_embeddings = [np.array(item.embedding) for item in response.data]
-                embeddings.extend(batch_embeddings)
-                time.sleep(0.1)  # 避免API限制
-            except Exception as e:
-                print(f"处理批次 {i//batch_size + 1} 时出错: {str(e)}")
-                embeddings.extend([None] * len(batch))
-        return embeddings
+        if self.cache is None:
+            return self._request_embeddings(texts, batch_size)
+
+        keys = [EmbeddingCache.make_key(self.model, self.dimension, t) for t in texts]
+        cached = self.cache.get_many(keys)
+
+        # 只为未命中的文本请求向量，重复文本只请求一次
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            new_embeddings = self._request_embeddings(list(missing.values()), batch_size)
+            fresh = {
+                key: emb
+                for key, emb in zip(missing.keys(), new_embeddings)
+                if emb is not None
+            }
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+
+        return [cached.get(key) for key in keys]
+
+    def _request_embeddings(
+        self, texts: List[str], batch_size: int = 10
+    ) -> List[np.ndarray]:
+        """并发调用向量化接口创建文本向量，被接口拒绝的文本为 None
+
+        Raises:
+            EmbeddingError: 某个批次重试耗尽后仍然失败时抛出
+        """
+        return self.embedder.embed(texts, batch_size)
+
+    def _request_batch(self, batch: List[str]) -> List[np.ndarray]:
+        """对单个批次调用向量化接口"""
+        response = self.client.embeddings.create(model=self.model, input=batch)
+        # 按返回的 index 排序，保证与输入顺序一致
+        data = sorted(response.data, key=lambda item: item.index)
+        return [np.array(item.embedding, dtype=np.float32) for item in data]
 
     def build_faiss_index(
         self,
         embeddings: List[np.ndarray],
         texts: List[str],
         metadata: List[Dict[str, Any]],
+        index_type: str = "auto",
     ):
         """构建FAISS索引
 
         使用 FAISS 构建向量索引，支持快速相似度搜索。
         过滤掉无效的向量，确保索引质量。
+        使用 cosine 度量时，向量在建索引前统一归一化，之后用内积检索。
 
         Args:
             embeddings: 向量列表
             texts: 对应的文本列表
             metadata: 文本的元数据列表
+            index_type: 索引类型，可选 auto、flat、ivf_flat、ivf_pq、hnsw，
+                auto 时根据向量数量自动选择
 
         Raises:
-            ValueError: 输入列表长度不匹配或没有有效向量时抛出
+            ValueError: 输入列表长度不匹配、索引类型不支持或没有有效向量时抛出
         """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"不支持的索引类型: {index_type}")
+
         if len(embeddings) != len(texts) or len(embeddings) != len(metadata):
             raise ValueError("输入列表长度不匹配")
 
@@ -101,26 +232,346 @@ class EmbeddingProcessor:
         if not valid_embeddings:
             raise ValueError("没有有效的向量可以构建索引")
 
-        embeddings_array = np.array(valid_embeddings).astype("float32")
+        embeddings_array = np.array(valid_embeddings, dtype=np.float32)
 
         if embeddings_array.shape[1] != self.dimension:
             raise ValueError(
                 f"向量维度不匹配: 期望 {self.dimension}, 实际 {embeddings_array.shape[1]}"
             )
 
-        self.index = faiss.IndexFlatL2(self.dimension)
+        if self.metric == "cosine":
+            normalize_vectors(embeddings_array)
+
+        self.index = self._create_index(embeddings_array, index_type)
         self.index.add(embeddings_array)
+        self.embeddings = embeddings_array
         self.texts = valid_texts
         self.metadata = valid_metadata
 
-    def save_index(self, save_path: str):
+    def embed_stream(
+        self,
+        chunks: Iterable[Tuple[str, Dict[str, Any]]],
+        batch_size: int = 10,
+        queue_size: int = 1000,
+    ) -> Iterator[Tuple[str, Dict[str, Any], np.ndarray]]:
+        """流式创建文本向量
+
+        后台线程从 chunks 读取文本块放入有界队列，主线程每次取出若干批次并发向量化。
+        队列满时读取方（文档处理）会阻塞等待，内存占用与文本块总数无关。
+
+        Args:
+            chunks: (文本, 元数据) 的可迭代对象
+            batch_size: 每批处理的文本数量
+            queue_size: 队列中最多缓存的文本块数量
+
+        Returns:
+            Iterator[Tuple[str, Dict[str, Any], np.ndarray]]: (文本, 元数据, 向量)，
+                向量化失败的文本块会被跳过
+        """
+        chunk_queue = queue.Queue(maxsize=queue_size)
+        done = object()
+        errors = []
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for chunk in chunks:
+                    while not stop.is_set():
+                        try:
+                            chunk_queue.put(chunk, timeout=0.5)
+                            break
+                        except queue.Full:
+                            continue
+                    if stop.is_set():
+                        return
+            except Exception as e:
+                errors.append(e)
+            finally:
+                chunk_queue.put(done)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+
+        # 每组包含足够多的批次，使并发向量化引擎保持满载
+        group_size = batch_size * self.max_concurrency * 2
+        finished = False
+        try:
+            while not finished:
+                group = []
+                while len(group) < group_size:
+                    item = chunk_queue.get()
+                    if item is done:
+                        finished = True
+                        break
+                    group.append(item)
+
+                if not group:
+                    continue
+
+                embeddings = self.create_embeddings([text for text, _ in group], batch_size)
+                for (text, meta), emb in zip(group, embeddings):
+                    if emb is not None:
+                        yield text, meta, emb
+        finally:
+            stop.set()
+            # 提前退出时清空队列，让生产线程结束
+            while producer.is_alive():
+                try:
+                    chunk_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            producer.join()
+
+        if errors:
+            raise errors[0]
+
+    def build_index_from_stream(
+        self,
+        chunks: Iterable[Tuple[str, Dict[str, Any]]],
+        save_path: str,
+        batch_size: int = 10,
+        index_type: str = "auto",
+        add_block_size: int = 65536,
+    ) -> int:
+        """从文本块流直接构建并保存索引
+
+        文本块边向量化边写入磁盘，见 build_index_from_vectors。
+
+        Args:
+            chunks: (文本, 元数据) 的可迭代对象
+            save_path: 保存路径（不包含扩展名）
+            batch_size: 每批处理的文本数量
+            index_type: 索引类型，默认根据文本块数量自动选择
+            add_block_size: 每次添加到索引的向量数量
+
+        Returns:
+            int: 写入索引的文本块数量
+
+        Raises:
+            ValueError: 索引类型不支持、向量维度不匹配或没有有效向量时抛出
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"不支持的索引类型: {index_type}")
+        return self.build_index_from_vectors(
+            self.embed_stream(chunks, batch_size), save_path, index_type, add_block_size
+        )
+
+    def build_index_from_vectors(
+        self,
+        rows: Iterable[Tuple[str, Dict[str, Any], np.ndarray]],
+        save_path: str,
+        index_type: str = "auto",
+        add_block_size: int = 65536,
+        allow_empty: bool = False,
+    ) -> int:
+        """从已经向量化的文本块流构建并保存索引
+
+        文本和元数据追加写入列式存储，向量追加写入临时文件，
+        全部写完后以内存映射方式读取向量训练、构建索引，不在内存中保留完整的文本块列表。
+
+        Args:
+            rows: (文本, 元数据, 向量) 的可迭代对象
+            save_path: 保存路径（不包含扩展名）
+            index_type: 索引类型，默认根据文本块数量自动选择
+            add_block_size: 每次添加到索引的向量数量
+            allow_empty: 没有任何文本块时是否写入空索引（覆盖旧索引），否则抛出 ValueError
+
+        Returns:
+            int: 写入索引的文本块数量
+
+        Raises:
+            ValueError: 索引类型不支持、向量维度不匹配或没有有效向量时抛出
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"不支持的索引类型: {index_type}")
+
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        writer = StoreWriter(f"{save_path}.store")
+        raw_file = f"{save_path}.vectors.tmp"
+        count = 0
+        try:
+            with open(raw_file, "wb") as f:
+                for text, meta, emb in rows:
+                    # 缓存命中的向量是只读的（np.frombuffer），复制后再原地归一化
+                    vector = np.array(emb, dtype=np.float32).reshape(1, -1)
+                    if vector.shape[1] != self.dimension:
+                        raise ValueError(
+                            f"向量维度不匹配: 期望 {self.dimension}, 实际 {vector.shape[1]}"
+                        )
+                    if self.metric == "cosine":
+                        normalize_vectors(vector)
+                    f.write(vector.tobytes())
+                    writer.append(text, meta)
+                    count += 1
+            if count == 0 and not allow_empty:
+                raise ValueError("没有有效的向量可以构建索引")
+        except BaseException:
+            # 出错时保留旧索引，删除写了一半的临时文件
+            writer.abort()
+            os.remove(raw_file)
+            raise
+
+        # 将原始向量转换为 .npy 格式，并以内存映射方式读取
+        vectors_file = f"{save_path}.npy"
+        shape = (count, self.dimension)
+        vectors = np.lib.format.open_memmap(
+            f"{vectors_file}.tmp", mode="w+", dtype=np.float32, shape=shape
+        )
+        # 空文件无法内存映射，没有文本块时只写入空的 .npy
+        if count:
+            raw = np.memmap(raw_file, dtype=np.float32, mode="r", shape=shape)
+            for start in range(0, count, add_block_size):
+                vectors[start : start + add_block_size] = raw[start : start + add_block_size]
+            del raw
+        vectors.flush()
+        del vectors
+        os.remove(raw_file)
+        os.replace(f"{vectors_file}.tmp", vectors_file)
+        self.embeddings = np.load(vectors_file, mmap_mode="r")
+
+        print("\n构建索引...")
+        self.index = self._create_index(self.embeddings, index_type)
+        for start in range(0, count, add_block_size):
+            self.index.add(np.ascontiguousarray(self.embeddings[start : start + add_block_size]))
+
+        writer.close(extra={"metric": self.metric})
+        self.texts, self.metadata, _ = load_store(f"{save_path}.store")
+
+        # 索引和向量已写入，保存索引文件和版本号
+        self.save_index(save_path, include_data=False)
+        return count
+
+    def _create_index(
+        self, embeddings_array: np.ndarray, index_type: str, train_size: int = 100000
+    ) -> faiss.Index:
+        """创建并训练指定类型的索引
+
+        Args:
+            embeddings_array: 全部向量
+            index_type: 索引类型
+            train_size: 训练 IVF 索引时最多使用的样本数量
+
+        Returns:
+            faiss.Index: 可以直接添加向量的索引
+        """
+        n = len(embeddings_array)
+        faiss_metric = (
+            faiss.METRIC_INNER_PRODUCT if self.metric == "cosine" else faiss.METRIC_L2
+        )
+        # 没有向量时无法训练，使用空的精确索引
+        if n == 0:
+            return faiss.IndexFlat(self.dimension, faiss_metric)
+
+        if index_type == "auto":
+            if n <= FLAT_MAX_SIZE:
+                index_type = "flat"
+            elif n <= HNSW_MAX_SIZE:
+                index_type = "hnsw"
+            else:
+                index_type = "ivf_pq"
+
+        # PQ 每个子空间需要至少 256 个训练样本
+        if index_type == "ivf_pq" and n < 256:
+            print(f"向量数量 {n} 过少，无法训练 IVF-PQ，改用 IVF-Flat")
+            index_type = "ivf_flat"
+
+        # 聚类中心数取 4*sqrt(n)，并保证每个中心至少有 39 个训练样本
+        nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+
+        if index_type == "flat":
+            return faiss.IndexFlat(self.dimension, faiss_metric)
+        elif index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dimension, 32, faiss_metric)
+            index.hnsw.efConstruction = 200
+            return index
+        elif index_type == "ivf_flat":
+            index = faiss.index_factory(self.dimension, f"IVF{nlist},Flat", faiss_metric)
+        else:
+            # 子量化器数量需要整除向量维度
+            m = next(m for m in (64, 32, 16, 8, 4, 2, 1) if self.dimension % m == 0)
+            index = faiss.index_factory(
+                self.dimension, f"IVF{nlist},PQ{m}", faiss_metric
+            )
+
+        print(f"训练 {index_type} 索引，nlist={nlist}")
+        if n > train_size:
+            sample = np.random.default_rng(0).choice(n, train_size, replace=False)
+            index.train(embeddings_array[sample])
+        else:
+            index.train(embeddings_array)
+        return index
+
+    def search_params(
+        self, nprobe: Optional[int] = None, ef_search: Optional[int] = None
+    ) -> Optional[faiss.SearchParameters]:
+        """根据索引类型生成单次搜索参数
+
+        以参数对象的形式传给 index.search，不修改索引本身，可以安全地用于并发查询。
+
+        Args:
+            nprobe: IVF 索引搜索的聚类数量，越大召回率越高、速度越慢
+            ef_search: HNSW 索引搜索的候选队列长度，越大召回率越高、速度越慢
+
+        Returns:
+            Optional[faiss.SearchParameters]: 搜索参数，无需设置时返回 None
+        """
+        if nprobe is not None and faiss.try_extract_index_ivf(self.index) is not None:
+            return faiss.SearchParametersIVF(nprobe=nprobe)
+        if ef_search is not None and hasattr(self.index, "hnsw"):
+            return faiss.SearchParametersHNSW(efSearch=ef_search)
+        return None
+
+    def prepare_queries(self, query_embeddings: List[np.ndarray]) -> np.ndarray:
+        """将查询向量整理为 float32 矩阵，cosine 度量下同时做归一化"""
+        queries = np.array(query_embeddings, dtype=np.float32).reshape(
+            -1, self.dimension
+        )
+        if self.metric == "cosine":
+            normalize_vectors(queries)
+        return queries
+
+    def to_similarity(self, distances: np.ndarray) -> np.ndarray:
+        """将 FAISS 返回的距离转换为相似度
+
+        cosine 度量下内积即余弦相似度；l2 度量下使用 1/(1+d)。
+        """
+        if self.metric == "cosine":
+            return distances
+        return 1.0 / (1.0 + distances)
+
+    def score_rows(self, query_embedding: np.ndarray, rows: List[int]) -> np.ndarray:
+        """使用保存的原始向量计算查询与指定文本块的相似度
+
+        用于补全不在向量检索结果中的文本块（例如只被关键词检索命中）的相似度，
+        计算方式与 to_similarity 一致。
+
+        Args:
+            query_embedding: 查询向量
+            rows: 文本块序号列表
+
+        Returns:
+            np.ndarray: 相似度数组；没有原始向量时全部为 0
+        """
+        if self.embeddings is None or not rows:
+            return np.zeros(len(rows), dtype=np.float32)
+        query = self.prepare_queries([query_embedding])[0]
+        vectors = np.asarray(self.embeddings[rows], dtype=np.float32)
+        if self.metric == "cosine":
+            return vectors @ query
+        return self.to_similarity(((vectors - query) ** 2).sum(axis=1))
+
+    def save_index(self, save_path: str, include_data: bool = True):
         """保存FAISS索引和相关数据
 
         将 FAISS 索引和相关的文本、元数据保存到文件。
-        使用 pickle 序列化文本和元数据。
+        文本和元数据以列式格式保存在 .store 目录中，加载时内存映射、按需解码；
+        原始向量另存为 .npy 文件，供增量更新时复用未变化文本块的向量；
+        同时根据文本块构建 BM25 关键词索引，保存在 .bm25 目录中。
 
         Args:
             save_path: 保存路径（不包含扩展名）
+            include_data: 是否写入文本、元数据和原始向量；
+                流式构建时这些数据已经写入磁盘，只需保存索引文件
 
         Raises:
             ValueError: 索引未构建时抛出
@@ -129,20 +580,45 @@ class EmbeddingProcessor:
             raise ValueError("没有可保存的索引")
 
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        faiss.write_index(self.index, f"{save_path}.index")
+        faiss.write_index(self.index, f"{save_path}.index.tmp")
+        os.replace(f"{save_path}.index.tmp", f"{save_path}.index")
+
+        if include_data:
+            save_store(
+                f"{save_path}.store",
+                self.texts,
+                self.metadata,
+                extra={"metric": self.metric},
+            )
 
-        data = {
-            "texts": self.texts,
-            "metadata": self.metadata
-        }
+            if self.embeddings is not None:
+                # 先写临时文件再替换，避免覆盖仍被内存映射的旧向量文件
+                tmp_file = f"{save_path}.npy.tmp"
+                with open(tmp_file, "wb") as f:
+                    np.save(f, self.embeddings)
+                os.replace(tmp_file, f"{save_path}.npy")
 
-        with open(f"{save_path}.data", 'wb') as f:
-            pickle.dump(data, f)
+        # 关键词索引与向量索引使用相同的文本块序号
+        self.bm25 = BM25Index.build(self.texts)
+        self.bm25.save(f"{save_path}.bm25")
+
+        # 移除旧版本的 pickle 数据文件，避免与新数据不一致
+        if os.path.exists(f"{save_path}.data"):
+            os.remove(f"{save_path}.data")
+
+        # 所有文件写完后最后更新版本号，常驻服务据此判断何时热加载新索引
+        self.version = str(time.time_ns())
+        with open(f"{save_path}.version.tmp", "w", encoding="utf-8") as f:
+            f.write(self.version)
+        os.replace(f"{save_path}.version.tmp", f"{save_path}.version")
 
     def load_index(self, load_path: str):
         """加载FAISS索引和相关数据
 
         从文件加载 FAISS 索引和相关的文本、元数据。
+        文本和元数据以内存映射方式打开，只在访问某一行时解码；
+        兼容旧版本 pickle 格式的 .data 文件。
+        如果存在原始向量文件，则以内存映射方式加载；如果存在 BM25 关键词索引，则一并加载。
 
         Args:
             load_path: 加载路径（不包含扩展名）
@@ -151,33 +627,58 @@ class EmbeddingProcessor:
             FileNotFoundError: 索引文件不存在时抛出
         """
         index_file = f"{load_path}.index"
+        store_dir = f"{load_path}.store"
         data_file = f"{load_path}.data"
+        recover_store(store_dir)
         
-        if not os.path.exists(index_file) or not os.path.exists(data_file):
+        if not os.path.exists(index_file) or not (
+            os.path.isdir(store_dir) or os.path.exists(data_file)
+        ):
             raise FileNotFoundError(f"索引文件不存在: {load_path}")
             
+        self.version = read_index_version(load_path)
         self.index = faiss.read_index(index_file)
 
-        with open(data_file, 'rb') as f:
-            data = pickle.load(f)
-            self.texts = data["texts"]
-            self.metadata = data["metadata"]
+        if os.path.isdir(store_dir):
+            self.texts, self.metadata, schema = load_store(store_dir)
+            self.metric = schema.get("metric", "l2")
+        else:
+            with open(data_file, 'rb') as f:
+                data = pickle.load(f)
+                self.texts = data["texts"]
+                self.metadata = data["metadata"]
+                # 旧版本索引没有记录度量，均为 l2
+                self.metric = data.get("metric", "l2")
+
+        vectors_file = f"{load_path}.npy"
+        if os.path.exists(vectors_file):
+            self.embeddings = np.load(vectors_file, mmap_mode="r")
+        else:
+            self.embeddings = None
+
+        bm25_dir = f"{load_path}.bm25"
+        self.bm25 = BM25Index.load(bm25_dir) if os.path.isdir(bm25_dir) else None
 
     def process_directory_and_save(
-        self, input_file: str, output_dir: str, batch_size: int = 10
+        self,
+        input_file: str,
+        output_dir: str,
+        batch_size: int = 10,
+        index_type: str = "auto",
     ) -> str:
         """处理目录下的所有文档并保存向量索引
 
         完整的文档处理流程：
-        1. 读取处理后的文本块
+        1. 逐条读取处理后的文本块（chunks.jsonl）
         2. 创建文本向量
         3. 构建 FAISS 索引
         4. 保存索引和相关数据
 
         Args:
-            input_file: 输入文件路径（处理后的文本块文件）
+            input_file: 输入文件路径（DocumentProcessor 生成的 chunks.jsonl）
             output_dir: 输出目录
             batch_size: 批量处理大小，默认为 10
+            index_type: 索引类型，默认根据文本块数量自动选择
 
         Returns:
             str: 索引文件路径
@@ -185,31 +686,19 @@ class EmbeddingProcessor:
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
 
-        # 读取文本块
         print("\n读取文本块...")
-        with open(input_file, "r", encoding="utf-8") as f:
-            chunks = [
-                line.strip()
-                for line in f
-                if line.strip() and not line.startswith("===")
-            ]
-        print(f"✓ 读取完成，共 {len(chunks)} 个文本块")
-
-        # 创建向量
-        print("\n创建向量...")
-        embeddings = self.create_embeddings(chunks, batch_size)
-        print(f"✓ 向量创建完成，共 {len(embeddings)} 个向量")
-
-        # 构建索引
-        print("\n构建索引...")
-        # 为每个文本块创建简单的元数据
-        metadata = [{"source": input_file, "chunk_id": i} for i in range(len(chunks))]
-        self.build_faiss_index(embeddings, chunks, metadata)
-        print("✓ 索引构建完成")
+        store = ChunkStore(input_file)
+        print(f"✓ 共 {len(store)} 个文本块")
+
+        # 文本块记录中除文本外的字段（来源、位置、哈希等）作为元数据
+        chunks = (
+            (record["text"], {k: v for k, v in record.items() if k != "text"})
+            for record in store
+        )
 
-        # 保存索引
+        print("\n创建向量并构建索引...")
         index_path = os.path.join(output_dir, "index")
-        self.save_index(index_path)
-        print(f"✓ 索引已保存到: {index_path}")
+        count = self.build_index_from_stream(chunks, index_path, batch_size, index_type)
+        print(f"✓ 索引已保存到: {index_path}，共 {count} 个文本块")
 
         return index_path
@@ -2,24 +2,89 @@ import dashscope
 from dotenv import load_dotenv
 import os
 from datetime import datetime
-from typing import List, Tuple
+from http import HTTPStatus
+from typing import Iterator, List, Tuple
+from text_chunker import token_spans
 
 load_dotenv()
 dashscope.api_key = os.getenv("DASHSCOPE_API_KEY")
 
 
+"""
+本模块负责根据重排序结果生成回答：
+
+   重排序结果 → 上下文预算（按排名保留，总词元数不超过 max_context_tokens）→ 提示词
+             → generate_response 一次性返回完整回答
+             → generate_stream   逐段返回增量内容（incremental_output）
+
+词元按 text_chunker.TOKEN_PATTERN 计数（每个汉字、连续字母数字串、标点各计一个）。
+"""
+
+
 class GenerationProcessor:
-    def __init__(self, model_name: str = "qwen-max"):
+    def __init__(self, model_name: str = "qwen-max", max_context_tokens: int = 3000):
         """初始化生成处理器
 
         Args:
             model_name: 使用的模型名称，默认为 qwen-max
+            max_context_tokens: 参考内容的总词元数上限，为 0 时不限制
         """
         self.model = model_name
+        self.max_context_tokens = max_context_tokens
         print("\n=== 初始化生成处理器 ===")
         print(f"模型: {self.model}")
+        if self.max_context_tokens:
+            print(f"上下文预算: {self.max_context_tokens} 词元")
         print("=" * 50)
 
+    def budget_context(
+        self, reranked_results: List[Tuple[str, float]], top_k: int = 3
+    ) -> List[str]:
+        """按排名选取参考内容，总词元数不超过 max_context_tokens
+
+        排名靠前的内容优先完整保留，预算不足时截断最后一段，之后的内容丢弃。
+
+        Args:
+            reranked_results: 重排序后的结果列表，每个元素为(内容, 分数)
+            top_k: 最多使用的结果数量
+
+        Returns:
+            List[str]: 作为上下文的参考内容
+        """
+        passages = []
+        remaining = self.max_context_tokens
+        for content, _ in reranked_results[:top_k]:
+            content = str(content)
+            if not self.max_context_tokens:
+                passages.append(content)
+                continue
+            _, ends = token_spans(content)
+            if len(ends) <= remaining:
+                passages.append(content)
+                remaining -= len(ends)
+                continue
+            if remaining > 0:
+                passages.append(content[: ends[remaining - 1]])
+            break
+        return passages
+
+    def build_prompt(
+        self, query: str, reranked_results: List[Tuple[str, float]], top_k: int = 3
+    ) -> str:
+        """构建提示词，参考内容经过 budget_context 裁剪"""
+        context = "\n".join(
+            f"参考内容 {i+1}: {passage}"
+            for i, passage in enumerate(self.budget_context(reranked_results, top_k))
+        )
+        return f"""基于以下参考内容，请回答用户的问题。如果参考内容中没有相关信息，请说明无法回答。
+
+参考内容：
+{context}
+
+用户问题：{query}
+
+请用中文回答："""
+
     def generate_response(
         self, query: str, reranked_results: List[Tuple[str, float]], top_k: int = 3
     ) -> str:
@@ -39,21 +104,7 @@ class GenerationProcessor:
         print("-" * 50)
 
         try:
-            # 构建提示词
-            context = "\n".join(
-                [
-                    f"参考内容 {i+1}: {result[0]}"
-                    for i, result in enumerate(reranked_results[:top_k])
-                ]
-            )
-            prompt = f"""基于以下参考内容，请回答用户的问题。如果参考内容中没有相关信息，请说明无法回答。
-
-参考内容：
-{context}
-
-用户问题：{query}
-
-请用中文回答："""
+            prompt = self.build_prompt(query, reranked_results, top_k)
 
             start_time = datetime.now()
             response = dashscope.Generation.call(
@@ -83,3 +134,59 @@ class GenerationProcessor:
             print(error_msg)
             print("=" * 50)
             return error_msg
+
+    def generate_stream(
+        self, query: str, reranked_results: List[Tuple[str, float]], top_k: int = 3
+    ) -> Iterator[str]:
+        """使用大模型流式生成回答
+
+        以 incremental_output 方式调用，每次只返回新生成的片段，
+        首个片段生成后即可展示，不必等待完整回答。调用方提前停止迭代时关闭上游连接。
+
+        Args:
+            query: 用户查询
+            reranked_results: 重排序后的结果列表，每个元素为(内容, 分数)
+            top_k: 使用前k个结果作为上下文
+
+        Returns:
+            Iterator[str]: 回答的增量片段
+
+        Raises:
+            RuntimeError: 模型返回错误时抛出
+        """
+        print("\n=== 开始流式生成回答 ===")
+        print(f"查询: {query}")
+        print(f"使用前 {top_k} 个相关结果作为上下文")
+        print("-" * 50)
+
+        prompt = self.build_prompt(query, reranked_results, top_k)
+        start_time = datetime.now()
+        responses = dashscope.Generation.call(
+            model=self.model,
+            prompt=prompt,
+            temperature=0.7,
+            top_p=0.8,
+            result_format="message",
+            stream=True,
+            incremental_output=True,
+        )
+        first_token = None
+        try:
+            for response in responses:
+                if response.status_code != HTTPStatus.OK:
+                    raise RuntimeError(f"生成失败: {response.message}")
+                delta = response.output.choices[0].message.content
+                if not delta:
+                    continue
+                if first_token is None:
+                    first_token = (datetime.now() - start_time).total_seconds()
+                    print(f"首个片段耗时: {first_token:.2f}秒")
+                yield delta
+        finally:
+            close = getattr(responses, "close", None)
+            if close is not None:
+                close()
+
+        duration = (datetime.now() - start_time).total_seconds()
+        print(f"\n生成完成，耗时: {duration:.2f}秒")
+        print("=" * 50)
@@ -0,0 +1,203 @@
+import os
+from typing import Any, Dict, Iterator, List, Tuple
+import numpy as np
+from document_processor import DocumentProcessor
+from embedding_processor import EmbeddingProcessor
+from index_manifest import IndexManifest, hash_text
+
+
+"""
+本模块负责增量更新向量索引。
+
+   扫描文件 → 对比清单（构建参数变化时全部失效）→ 只分块变化的文件 → 只向量化新文本块
+           → 按文件顺序流式写出所有文本块（未变化的从旧索引内存映射读取）→ 重写索引 → 保存清单
+
+   增量的是分块和向量化；FAISS 索引、列式存储和 BM25 索引每次都完整重写。
+   IVF / HNSW 索引不支持高效删除向量，完整重写也使文本块序号保持连续、与完整构建一致。
+   旧索引的文本和向量以内存映射方式逐行读取，内存中只保留 文本块哈希 → 行号 的映射。
+"""
+
+
+class IncrementalIndexer:
+    def __init__(
+        self,
+        doc_dir: str,
+        index_path: str,
+        manifest_path: str,
+        chunk_size: int = 50,
+        chunk_overlap: int = 10,
+        index_type: str = "auto",
+    ):
+        """初始化增量索引器
+
+        Args:
+            doc_dir: 文档目录
+            index_path: 索引文件路径（不包含扩展名）
+            manifest_path: 清单文件路径
+            chunk_size: 文本块大小
+            chunk_overlap: 文本块重叠大小
+            index_type: 索引类型，默认根据文本块数量自动选择
+        """
+        self.doc_dir = doc_dir
+        self.index_path = index_path
+        self.manifest_path = manifest_path
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.index_type = index_type
+        self.doc_processor = DocumentProcessor()
+        self.emb_processor = EmbeddingProcessor()
+        # 加载旧索引会覆盖 metric，记录配置的度量用于比较和重建
+        self.metric = self.emb_processor.metric
+
+    def build_params(self) -> Dict[str, Any]:
+        """影响文本块或向量的构建参数，任一变化时旧的文本块和向量都不能复用"""
+        return {
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "chunk_unit": self.doc_processor.chunk_unit,
+            "model": self.emb_processor.model,
+            "dimension": self.emb_processor.dimension,
+            "metric": self.metric,
+        }
+
+    def _load_previous_rows(self) -> Dict[str, int]:
+        """加载上次的索引（内存映射），返回 {文本块哈希: 行号}"""
+        try:
+            self.emb_processor.load_index(self.index_path)
+        except FileNotFoundError:
+            return {}
+        finally:
+            self.emb_processor.metric = self.metric
+
+        if self.emb_processor.embeddings is None:
+            return {}
+
+        rows = {}
+        for row, meta in enumerate(self.emb_processor.metadata):
+            chunk_hash = meta.get("chunk_hash")
+            if chunk_hash:
+                rows.setdefault(chunk_hash, row)
+        return rows
+
+    def update(self) -> str:
+        """增量更新索引
+
+        Returns:
+            str: 索引文件路径
+        """
+        manifest = IndexManifest(self.manifest_path)
+        if manifest.check_params(self.build_params()):
+            previous_rows = self._load_previous_rows()
+        else:
+            print("构建参数已变化，重新处理所有文件")
+            previous_rows = {}
+        previous_texts = self.emb_processor.texts
+        previous_vectors = self.emb_processor.embeddings
+
+        # 扫描文件，区分未变化和需要重新分块的文件
+        print("\n扫描文档...")
+        file_paths = {
+            os.path.relpath(path, self.doc_dir): path
+            for path in self.doc_processor.list_documents(self.doc_dir)
+        }
+        unchanged, changed = [], set()
+        for key, path in sorted(file_paths.items()):
+            # 旧版本清单没有位置信息的文件也重新分块，使元数据与完整构建一致
+            if (
+                manifest.is_unchanged(key, path)
+                and manifest.chunk_info(key) is not None
+                and all(h in previous_rows for h in manifest.chunk_hashes(key))
+            ):
+                unchanged.append(key)
+            else:
+                changed.add(key)
+
+        removed = [key for key in manifest.files if key not in file_paths]
+        for key in removed:
+            manifest.remove_file(key)
+
+        print(
+            f"✓ 未变化 {len(unchanged)} 个，需处理 {len(changed)} 个，已删除 {len(removed)} 个"
+        )
+
+        # 只对变化的文件重新分块，内存占用与变化的文件大小成正比
+        changed_chunks: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        for path, chunks in self.doc_processor.process_files(
+            [file_paths[key] for key in sorted(changed)],
+            self.chunk_size,
+            self.chunk_overlap,
+            with_metadata=True,
+        ):
+            changed_chunks[os.path.relpath(path, self.doc_dir)] = list(chunks)
+
+        # 处理失败的文件不记录在清单中，下次运行会重新处理
+        for key in changed.difference(changed_chunks):
+            manifest.remove_file(key)
+
+        # 只为新的文本块创建向量，相同内容的文本块只向量化一次
+        new_texts: Dict[str, str] = {}
+        for chunks in changed_chunks.values():
+            for chunk, _ in chunks:
+                chunk_hash = hash_text(chunk)
+                if chunk_hash not in previous_rows:
+                    new_texts.setdefault(chunk_hash, chunk)
+
+        reused = sum(len(manifest.chunk_hashes(key)) for key in unchanged)
+        print(f"\n复用 {reused} 个文本块，需新建 {len(new_texts)} 个向量")
+        new_vectors: Dict[str, np.ndarray] = {}
+        if new_texts:
+            new_embeddings = self.emb_processor.create_embeddings(list(new_texts.values()))
+            for chunk_hash, emb in zip(new_texts.keys(), new_embeddings):
+                if emb is not None:
+                    new_vectors[chunk_hash] = emb
+
+        def vector_of(chunk_hash: str):
+            if chunk_hash in new_vectors:
+                return new_vectors[chunk_hash]
+            row = previous_rows.get(chunk_hash)
+            return None if row is None else previous_vectors[row]
+
+        def rows() -> Iterator[Tuple[str, Dict[str, Any], np.ndarray]]:
+            """按文件顺序逐个产出 (文本, 元数据, 向量)，元数据与 DocumentProcessor.iter_chunks 一致"""
+            for key in sorted(unchanged + list(changed_chunks)):
+                if key in changed_chunks:
+                    chunks = changed_chunks[key]
+                else:
+                    chunks = (
+                        (previous_texts[previous_rows[h]], info)
+                        for h, info in zip(
+                            manifest.chunk_hashes(key), manifest.chunk_info(key)
+                        )
+                    )
+
+                chunk_hashes, chunk_info = [], []
+                complete = True
+                for chunk_id, (chunk, info) in enumerate(chunks):
+                    chunk_hash = hash_text(chunk)
+                    chunk_hashes.append(chunk_hash)
+                    chunk_info.append(info)
+                    vector = vector_of(chunk_hash)
+                    if vector is None:
+                        complete = False
+                        continue
+                    yield chunk, {
+                        "source": key,
+                        "chunk_id": chunk_id,
+                        **info,
+                        "chunk_hash": chunk_hash,
+                    }, vector
+
+                # 存在向量化失败的文本块时不记录该文件，下次运行会重新处理
+                if not complete:
+                    manifest.remove_file(key)
+                elif key in changed:
+                    manifest.update_file(key, file_paths[key], chunk_hashes, chunk_info)
+
+        # 新索引写完后才替换旧文件，读取中的旧索引内存映射不受影响
+        count = self.emb_processor.build_index_from_vectors(
+            rows(), self.index_path, self.index_type, allow_empty=True
+        )
+        manifest.save()
+        print(f"✓ 索引已更新，共 {count} 个文本块")
+
+        return self.index_path
@@ -0,0 +1,140 @@
+import os
+import json
+import hashlib
+from typing import Dict, List, Any, Optional
+
+
+"""
+本模块负责记录索引清单，用于增量更新索引。
+
+   清单内容：构建参数（分块大小、重叠、向量模型、维度、相似度度量），
+            每个文件的修改时间、大小、内容哈希，以及该文件产生的文本块哈希列表和位置信息
+   构建参数变化时清单整体失效，所有文件重新分块和向量化。
+"""
+
+
+def hash_text(text: str) -> str:
+    """计算文本的内容哈希"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+    """分块读取文件并计算内容哈希"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IndexManifest:
+    def __init__(self, manifest_path: str):
+        """初始化索引清单
+
+        Args:
+            manifest_path: 清单文件路径（JSON 格式）
+        """
+        self.manifest_path = manifest_path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.params: Dict[str, Any] = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self.params = data.get("params", {})
+
+    def check_params(self, params: Dict[str, Any]) -> bool:
+        """检查构建参数是否与上次一致，不一致时清空所有文件记录
+
+        Args:
+            params: 本次的构建参数
+
+        Returns:
+            bool: 参数一致时返回 True；不一致（包括旧版本清单没有记录参数）时返回 False
+        """
+        if self.params == params:
+            return True
+        self.files = {}
+        self.params = dict(params)
+        return False
+
+    def is_unchanged(self, key: str, file_path: str) -> bool:
+        """判断文件自上次索引以来是否未发生变化
+
+        先比较修改时间和文件大小，两者一致时直接认为未变化；
+        否则再比较内容哈希，内容一致时仅更新记录的修改时间。
+
+        Args:
+            key: 文件在清单中的键（相对路径）
+            file_path: 文件实际路径
+
+        Returns:
+            bool: 文件未变化时返回 True
+        """
+        entry = self.files.get(key)
+        if entry is None:
+            return False
+
+        stat = os.stat(file_path)
+        if entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            return True
+
+        if entry["hash"] != hash_file(file_path):
+            return False
+
+        entry["mtime"] = stat.st_mtime
+        entry["size"] = stat.st_size
+        return True
+
+    def chunk_hashes(self, key: str) -> List[str]:
+        """返回文件对应的文本块哈希列表"""
+        entry = self.files.get(key)
+        return entry["chunks"] if entry else []
+
+    def chunk_info(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """返回文件对应的文本块位置信息列表，旧版本清单没有记录时返回 None"""
+        entry = self.files.get(key)
+        if entry is None:
+            return None
+        info = entry.get("chunk_info")
+        if info is None or len(info) != len(entry["chunks"]):
+            return None
+        return info
+
+    def update_file(
+        self,
+        key: str,
+        file_path: str,
+        chunk_hashes: List[str],
+        chunk_info: Optional[List[Dict[str, Any]]] = None,
+    ):
+        """记录文件的最新状态
+
+        Args:
+            key: 文件在清单中的键（相对路径）
+            file_path: 文件实际路径
+            chunk_hashes: 该文件产生的文本块哈希列表
+            chunk_info: 与 chunk_hashes 一一对应的位置信息（start / end / page / page_end）
+        """
+        stat = os.stat(file_path)
+        self.files[key] = {
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "hash": hash_file(file_path),
+            "chunks": chunk_hashes,
+            "chunk_info": chunk_info or [{} for _ in chunk_hashes],
+        }
+
+    def remove_file(self, key: str) -> Optional[Dict[str, Any]]:
+        """从清单中移除文件记录"""
+        return self.files.pop(key, None)
+
+    def save(self):
+        """保存清单到文件"""
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"params": self.params, "files": self.files}, f, ensure_ascii=False, indent=2
+            )
+        os.replace(tmp_path, self.manifest_path)
@@ -4,6 +4,7 @@ from embedding_processor import EmbeddingProcessor
 from query_processor import QueryProcessor
 from rerank_processor import RerankProcessor
 from generation_processor import GenerationProcessor
+from incremental_indexer import IncrementalIndexer
 from datetime import datetime
 import dashscope
 from dotenv import load_dotenv
@@ -18,8 +19,9 @@ class RagProcessor:
         self.base_dir = os.path.dirname(__file__)
         self.doc_dir = os.path.join(self.base_dir, "data")
         self.output_dir = os.path.join(self.base_dir, "dist")
-        self.processed_file = os.path.join(self.output_dir, "processed_chunks.txt")
+        self.processed_file = os.path.join(self.output_dir, "chunks.jsonl")
         self.index_path = os.path.join(self.output_dir, "index")
+        self.manifest_path = os.path.join(self.output_dir, "manifest.json")
         print("\n=== RAG 系统初始化 ===")
         print(f"文档目录: {self.doc_dir}")
         print(f"输出目录: {self.output_dir}")
@@ -69,16 +71,64 @@ class RagProcessor:
         print("=" * 50)
         return result
 
-    def query_documents(self, index_path: str = None, queries: list = None):
+    def build_index(self) -> str:
+        """流式构建索引（替代第一步和第二步）
+
+        文本块从文档处理直接流入向量化和索引构建，不经过中间文本文件，
+        每个文本块保留来源文件和序号。
+
+        Returns:
+            str: 索引文件路径
+        """
+        print("\n=== 流式构建索引 ===")
+        start_time = datetime.now()
+        doc_processor = DocumentProcessor()
+        emb_processor = EmbeddingProcessor()
+        count = emb_processor.build_index_from_stream(
+            doc_processor.iter_chunks(self.doc_dir, chunk_size=50, chunk_overlap=10),
+            self.index_path,
+        )
+        duration = (datetime.now() - start_time).total_seconds()
+        print(f"索引构建完成，共 {count} 个文本块，耗时: {duration:.2f}秒")
+        print("=" * 50)
+        return self.index_path
+
+    def update_index(self) -> str:
+        """增量更新索引（替代第一步和第二步）
+
+        只重新分块发生变化的文件，只为新的文本块创建向量，
+        并从索引中移除已删除文件的文本块。
+
+        Returns:
+            str: 索引文件路径
+        """
+        print("\n=== 增量更新索引 ===")
+        start_time = datetime.now()
+        indexer = IncrementalIndexer(self.doc_dir, self.index_path, self.manifest_path)
+        result = indexer.update()
+        duration = (datetime.now() - start_time).total_seconds()
+        print(f"增量更新完成，耗时: {duration:.2f}秒")
+        print("=" * 50)
+        return result
+
+    def query_documents(
+        self, index_path: str = None, queries: list = None, mode: str = "hybrid"
+    ):
         """第三步：查询处理
 
         Args:
             index_path: 索引文件路径，如果为None则使用默认路径
             queries: 查询列表，如果为None则使用默认查询
+            mode: 检索方式，默认融合向量检索和关键词检索（见 QueryProcessor.search）
+
+        Returns:
+            list: 与查询顺序一致的重排序结果列表
         """
         print("\n=== 第三步：查询处理 ===")
         if not index_path:
             index_path = self.index_path
+        if not queries:
+            queries = ["介绍西湖"]
 
         if not os.path.exists(f"{index_path}.index"):
             print(f"索引文件不存在: {index_path}.index")
@@ -92,28 +142,37 @@ class RagProcessor:
             emb_processor.load_index(index_path)
             query_processor = QueryProcessor(emb_processor)
 
-            # 执行查询
+            # 批量执行检索：一次性创建所有查询向量，并只调用一次 FAISS 搜索
             print("\n执行查询...")
-            for query in queries:
+            start_time = datetime.now()
+            all_results = query_processor.search_many(queries, mode=mode)
+            duration = (datetime.now() - start_time).total_seconds()
+            print(f"检索完成，共 {len(queries)} 个查询，耗时: {duration:.2f}秒")
+
+            # 初始化重排序器
+            reranker = RerankProcessor()
+
+            all_reranked = []
+            for query, results in zip(queries, all_results):
                 print(f"\n查询: {query}")
-                start_time = datetime.now()
-                results = query_processor.search(query)
-                duration = (datetime.now() - start_time).total_seconds()
-                print(f"检索完成，耗时: {duration:.2f}秒")
                 print(query_processor.format_results(results))
 
-                # 初始化重排序器
-                reranker = RerankProcessor()
-
                 # 对检索结果进行重排序
                 print("\n开始重排序...")
                 start_time = datetime.now()
-                reranked_results = reranker.rerank(query, results)
+                # 只传入文本，重排序按序号对应回检索结果，超时时使用检索相似度
+                reranked_results = reranker.rerank(
+                    query,
+                    [result["text"] for result in results],
+                    fallback_scores=[result["similarity"] for result in results],
+                )
                 duration = (datetime.now() - start_time).total_seconds()
                 print(f"重排序完成，耗时: {duration:.2f}秒")
                 print(reranker.format_results(reranked_results))
 
-                return reranked_results
+                all_reranked.append(reranked_results)
+
+            return all_reranked
 
         except Exception as e:
             print(f"查询处理出错: {str(e)}")
@@ -132,23 +191,29 @@ def main():
     # 单独运行某一步
     # rag.process_documents()  # 只运行文档处理
     # rag.create_embeddings()  # 只运行向量化处理
+    # rag.build_index()  # 流式构建索引，文档处理和向量化一步完成
+    # rag.update_index()  # 增量更新索引，只处理变化的文件
 
     # 运行查询处理
     query = "介绍西湖"
-    reranked_results = rag.query_documents(rag.index_path, [query])
+    all_reranked = rag.query_documents(rag.index_path, [query])
+    reranked_results = all_reranked[0] if all_reranked else None
 
     if reranked_results:
         # 初始化生成处理器
         generator = GenerationProcessor()
 
-        # 模型生成
+        # 模型生成：流式输出，生成的片段到达后立即打印
         print("\n=== 第四步：模型生成 ===")
-        start_time = datetime.now()
-        response = generator.generate_response(query, reranked_results)
-        duration = (datetime.now() - start_time).total_seconds()
-        print(f"生成完成，耗时: {duration:.2f}秒")
+        generation_start = datetime.now()
         print("\n生成结果:")
-        print(response)
+        try:
+            for delta in generator.generate_stream(query, reranked_results):
+                print(delta, end="", flush=True)
+        except Exception as e:
+            print(f"\n生成出错: {str(e)}")
+        duration = (datetime.now() - generation_start).total_seconds()
+        print(f"\n生成完成，耗时: {duration:.2f}秒")
         print("=" * 50)
 
     duration = (datetime.now() - start_time).total_seconds()
@@ -1,7 +1,20 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import numpy as np
 from embedding_processor import EmbeddingProcessor
 
 
+"""
+本模块负责执行查询，支持三种检索方式：
+
+   vector   向量检索（FAISS）
+   keyword  关键词检索（BM25）
+   hybrid   两路各自召回候选 → 倒数排名融合（RRF）→ 取前 k 个
+"""
+
+# 支持的检索方式
+SEARCH_MODES = ("vector", "keyword", "hybrid")
+
+
 class QueryProcessor:
     def __init__(self, embedding_processor: EmbeddingProcessor):
         """初始化查询处理器
@@ -11,38 +24,204 @@ class QueryProcessor:
         """
         self.embedding_processor = embedding_processor
 
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        min_score: Optional[float] = None,
+        mode: str = "vector",
+        rrf_k: int = 60,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
         """执行查询并返回结果
         
         Args:
             query: 查询文本
             k: 返回的最相似文本数量
+            nprobe: IVF 索引搜索的聚类数量，仅对 IVF 索引生效
+            ef_search: HNSW 索引搜索的候选队列长度，仅对 HNSW 索引生效
+            min_score: 最低相似度，低于该值的结果直接丢弃，可减少送入重排序的文档；
+                混合检索时只作用于向量检索一路
+            mode: 检索方式，vector、keyword 或 hybrid（见 SEARCH_MODES）
+            rrf_k: 倒数排名融合的平滑常数，仅对混合检索生效
+            query_embedding: 已经创建好的查询向量，传入时不再重复向量化
             
         Returns:
-            List[Dict[str, Any]]: 查询结果列表，每个结果包含文本、相似度和元数据
+            List[Dict[str, Any]]: 查询结果列表，每个结果包含文本、相似度和元数据；
+                混合检索时还包含融合分数 rrf_score 和关键词分数 bm25_score（未被关键词命中时为 0）
+            
+        Raises:
+            ValueError: 检索方式不支持，或使用关键词检索但索引中没有关键词索引时抛出
         """
+        mode = self._check_mode(mode)
+        if mode == "keyword":
+            return self._search_keywords(query, k)
+
         # 创建查询向量
-        query_embedding = self.embedding_processor.create_embeddings([query])[0]
+        if query_embedding is None:
+            query_embedding = self.embedding_processor.create_embeddings([query])[0]
         if query_embedding is None:
             return []
-        
-        # 使用FAISS搜索
+
+        if mode == "vector":
+            return self._search_vectors(
+                [query_embedding], k, nprobe, ef_search, min_score
+            )[0]
+
+        dense = self._search_vectors(
+            [query_embedding], 2 * k, nprobe, ef_search, min_score
+        )[0]
+        return self._fuse(query, query_embedding, dense, k, rrf_k)
+
+    def search_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        min_score: Optional[float] = None,
+        batch_size: int = 10,
+        mode: str = "vector",
+        rrf_k: int = 60,
+    ) -> List[List[Dict[str, Any]]]:
+        """批量执行查询
+
+        批量创建查询向量，并将所有查询向量堆叠为一个矩阵，只调用一次 FAISS 搜索。
+        混合检索时再逐个查询与关键词检索结果融合。
+
+        Args:
+            queries: 查询文本列表
+            k: 每个查询返回的最相似文本数量
+            nprobe: IVF 索引搜索的聚类数量，仅对 IVF 索引生效
+            ef_search: HNSW 索引搜索的候选队列长度，仅对 HNSW 索引生效
+            min_score: 最低相似度，低于该值的结果直接丢弃
+            batch_size: 创建查询向量时每批的文本数量
+            mode: 检索方式，见 search
+            rrf_k: 倒数排名融合的平滑常数，仅对混合检索生效
+
+        Returns:
+            List[List[Dict[str, Any]]]: 与查询顺序一致的结果列表，向量化失败的查询返回空列表
+
+        Raises:
+            ValueError: 检索方式不支持，或使用关键词检索但索引中没有关键词索引时抛出
+        """
+        mode = self._check_mode(mode)
+        if mode == "keyword":
+            return [self._search_keywords(query, k) for query in queries]
+
+        query_embeddings = self.embedding_processor.create_embeddings(queries, batch_size)
+        valid = [i for i, emb in enumerate(query_embeddings) if emb is not None]
+
+        results = [[] for _ in queries]
+        if valid:
+            depth = k if mode == "vector" else 2 * k
+            valid_results = self._search_vectors(
+                [query_embeddings[i] for i in valid], depth, nprobe, ef_search, min_score
+            )
+            for i, result in zip(valid, valid_results):
+                if mode == "hybrid":
+                    result = self._fuse(queries[i], query_embeddings[i], result, k, rrf_k)
+                results[i] = result
+        return results
+
+    def _check_mode(self, mode: str) -> str:
+        """检查检索方式，索引中没有关键词索引时混合检索退化为向量检索"""
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"不支持的检索方式: {mode}")
+        if mode != "vector" and self.embedding_processor.bm25 is None:
+            if mode == "keyword":
+                raise ValueError("索引中没有关键词索引，请重新构建索引")
+            return "vector"
+        return mode
+
+    def _result(self, idx: int, similarity: float) -> Dict[str, Any]:
+        return {
+            "id": idx,
+            "text": self.embedding_processor.texts[idx],
+            "similarity": similarity,
+            "metadata": self.embedding_processor.metadata[idx],
+        }
+
+    def _search_keywords(self, query: str, k: int) -> List[Dict[str, Any]]:
+        """关键词检索，相似度一项为 BM25 分数"""
+        results = []
+        for idx, score in self.embedding_processor.bm25.search(query, k):
+            result = self._result(idx, score)
+            result["bm25_score"] = score
+            results.append(result)
+        return results
+
+    def _fuse(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        dense: List[Dict[str, Any]],
+        k: int,
+        rrf_k: int,
+    ) -> List[Dict[str, Any]]:
+        """倒数排名融合（RRF）
+
+        向量检索和关键词检索各自召回 2k 个候选，每个候选的融合分数为
+        各路排名 r（从 1 开始）的 1/(rrf_k + r) 之和，两路分数尺度不同也能直接合并。
+        只被关键词命中的候选用保存的原始向量补算相似度。
+        """
+        sparse = self.embedding_processor.bm25.search(query, 2 * k)
+        fused: Dict[int, float] = {}
+        for rank, result in enumerate(dense, 1):
+            fused[result["id"]] = fused.get(result["id"], 0.0) + 1.0 / (rrf_k + rank)
+        for rank, (idx, _) in enumerate(sparse, 1):
+            fused[idx] = fused.get(idx, 0.0) + 1.0 / (rrf_k + rank)
+
+        top = sorted(fused, key=lambda idx: fused[idx], reverse=True)[:k]
+        by_id = {result["id"]: result for result in dense}
+        bm25_scores = dict(sparse)
+        missing = [idx for idx in top if idx not in by_id]
+        for idx, similarity in zip(
+            missing, self.embedding_processor.score_rows(query_embedding, missing)
+        ):
+            by_id[idx] = self._result(idx, float(similarity))
+
+        results = []
+        for idx in top:
+            result = dict(by_id[idx])
+            result["rrf_score"] = fused[idx]
+            result["bm25_score"] = bm25_scores.get(idx, 0.0)
+            results.append(result)
+        return results
+
+    def _search_vectors(
+        self,
+        query_embeddings: List[np.ndarray],
+        k: int,
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        min_score: Optional[float],
+    ) -> List[List[Dict[str, Any]]]:
+        """使用查询向量矩阵执行一次 FAISS 搜索，并按查询格式化结果"""
         distances, indices = self.embedding_processor.index.search(
-            query_embedding.reshape(1, -1).astype('float32'), 
-            k
+            self.embedding_processor.prepare_queries(query_embeddings),
+            k,
+            params=self.embedding_processor.search_params(nprobe, ef_search)
         )
-        
+        similarities = self.embedding_processor.to_similarity(distances)
+
         # 格式化结果
-        results = []
-        for i, idx in enumerate(indices[0]):
-            if idx < len(self.embedding_processor.texts):
-                results.append({
-                    "text": self.embedding_processor.texts[idx],
-                    "similarity": 1.0 / (1.0 + distances[0][i]),
-                    "metadata": self.embedding_processor.metadata[idx]
-                })
-        
-        return results
+        all_results = []
+        for row in range(len(query_embeddings)):
+            results = []
+            for i, idx in enumerate(indices[row]):
+                # 候选不足 k 个时 FAISS 以 -1 填充
+                if not 0 <= idx < len(self.embedding_processor.texts):
+                    continue
+                # 结果按相似度降序排列，低于阈值后可以提前结束
+                if min_score is not None and similarities[row][i] < min_score:
+                    break
+                results.append(self._result(int(idx), float(similarities[row][i])))
+            all_results.append(results)
+
+        return all_results
 
     def format_results(self, results: List[Dict[str, Any]]) -> str:
         """格式化查询结果
@@ -1,31 +1,176 @@
 import dashscope
 from http import HTTPStatus
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 from dotenv import load_dotenv
 import os
+import threading
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
+from index_manifest import hash_text
+from bm25_index import tokenize
 
 load_dotenv()
 
 # 设置 API Key
 dashscope.api_key = os.getenv('DASHSCOPE_API_KEY')
 
+class RerankCache:
+    def __init__(self, max_entries: int = 1024):
+        """重排序结果的 LRU 缓存，可被多个线程共享
+
+        Args:
+            max_entries: 最多缓存的结果数量
+        """
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, query: str, documents: List[str], top_k: int) -> str:
+        """由模型、查询、各文档内容哈希和返回数量生成缓存键"""
+        doc_hashes = "".join(hash_text(doc) for doc in documents)
+        return hash_text(f"{model}\0{top_k}\0{query}\0{doc_hashes}")
+
+    def get(self, key: str) -> Optional[List[Tuple[int, float]]]:
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: List[Tuple[int, float]]):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+def local_scores(query: str, documents: List[str]) -> List[float]:
+    """本地打分：查询词（汉字二元组 / 英文单词）在文档中出现的比例"""
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return [0.0] * len(documents)
+    return [
+        len(query_terms & set(tokenize(doc))) / len(query_terms) for doc in documents
+    ]
+
+
 class RerankProcessor:
-    def __init__(self):
-        """初始化重排序处理器，使用阿里云 GTE-Rerank 服务"""
+    # 远程调用在线程池中执行，超出延迟预算后不再等待，结果返回时仍写入缓存
+    executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rerank")
+
+    def __init__(self, timeout: float = 3.0, cache_size: int = 1024):
+        """初始化重排序处理器，使用阿里云 GTE-Rerank 服务
+        
+        Args:
+            timeout: 远程重排序的延迟预算（秒），超时或失败时使用本地打分
+            cache_size: 重排序结果缓存的条目数，为 0 时不缓存
+        """
         self.model = dashscope.TextReRank.Models.gte_rerank
+        self.timeout = timeout
+        self.cache = RerankCache(cache_size) if cache_size > 0 else None
         print("\n=== 初始化重排序处理器 ===")
         print(f"模型: {self.model}")
         print("=" * 50)
+
+    def _call_remote(self, query: str, documents: List[str], top_k: int) -> List[Tuple[int, float]]:
+        """调用远程重排序服务，返回 (文档序号, 相关性分数) 列表
+
+        Raises:
+            RuntimeError: 服务返回错误时抛出
+        """
+        resp = dashscope.TextReRank.call(
+            model=self.model,
+            query=query,
+            documents=documents,
+            top_n=top_k,
+            return_documents=False
+        )
+        if resp.status_code != HTTPStatus.OK:
+            raise RuntimeError(f"重排序失败: {resp}")
+        # 确保分数是 Python 原生 float 类型
+        return [
+            (int(item['index']), float(item['relevance_score']))
+            for item in resp.output['results']
+        ]
+
+    def _fallback(
+        self, query: str, documents: List[str], top_k: int, scores: Optional[List[float]]
+    ) -> List[Tuple[int, float]]:
+        """本地回退：优先使用检索阶段的相似度，没有时按查询词重合度打分"""
+        if scores is None:
+            scores = local_scores(query, documents)
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+        return [(i, float(scores[i])) for i in order[:top_k]]
+
+    def rerank_indices(
+        self,
+        query: str,
+        documents: List[str],
+        top_k: int = 5,
+        fallback_scores: Optional[List[float]] = None,
+    ) -> List[Tuple[int, float]]:
+        """对文档进行重排序，返回文档序号
+        
+        相同的查询和文档集合直接返回缓存结果；远程服务在延迟预算内没有返回
+        或调用失败时，改用本地打分，保证整个请求的耗时有上限。
         
-    def rerank(self, query: str, documents: List[str], top_k: int = 5) -> List[Tuple[str, float]]:
+        Args:
+            query: 查询文本
+            documents: 待排序的文档列表
+            top_k: 返回前k个结果
+            fallback_scores: 本地回退时使用的分数（例如向量检索的相似度），与 documents 一一对应
+            
+        Returns:
+            List[Tuple[int, float]]: (文档在 documents 中的序号, 相关性分数) 列表
+        """
+        if not documents:
+            return []
+
+        key = None
+        if self.cache is not None:
+            key = RerankCache.make_key(self.model, query, documents, top_k)
+            cached = self.cache.get(key)
+            if cached is not None:
+                print("重排序命中缓存")
+                return cached
+
+        def call_and_cache():
+            results = self._call_remote(query, documents, top_k)
+            if key is not None:
+                self.cache.put(key, results)
+            return results
+
+        start_time = datetime.now()
+        future = self.executor.submit(call_and_cache)
+        try:
+            results = future.result(timeout=self.timeout)
+            duration = (datetime.now() - start_time).total_seconds()
+            print(f"重排序完成，耗时: {duration:.2f}秒")
+            return results
+        except FutureTimeoutError:
+            print(f"重排序超过 {self.timeout:.1f} 秒，使用本地打分")
+        except Exception as e:
+            print(f"重排序出错，使用本地打分: {str(e)}")
+        return self._fallback(query, documents, top_k, fallback_scores)
+
+    def rerank(
+        self,
+        query: str,
+        documents: List[str],
+        top_k: int = 5,
+        fallback_scores: Optional[List[float]] = None,
+    ) -> List[Tuple[str, float]]:
         """对文档进行重排序
         
         Args:
             query: 查询文本
             documents: 待排序的文档列表
             top_k: 返回前k个结果
+            fallback_scores: 本地回退时使用的分数，见 rerank_indices
             
         Returns:
             List[Tuple[str, float]]: 排序后的文档列表，每个元素为(文档内容, 相关性分数)
@@ -36,45 +181,21 @@ class RerankProcessor:
         print(f"返回前 {top_k} 个结果")
         print("-" * 50)
         
-        try:
-            # 确保文档列表中的内容都是字符串类型
-            documents = [str(doc) for doc in documents]
-            
-            start_time = datetime.now()
-            resp = dashscope.TextReRank.call(
-                model=self.model,
-                query=query,
-                documents=documents,
-                top_n=top_k,
-                return_documents=True
-            )
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
-            
-            if resp.status_code == HTTPStatus.OK:
-                results = []
-                for item in resp.output['results']:
-                    # 确保分数是 Python 原生 float 类型
-                    score = float(item['relevance_score'])
-                    results.append((item['document']['text'], score))
-                
-                print(f"重排序完成，耗时: {duration:.2f}秒")
-                print(f"返回结果数量: {len(results)}")
-                print("=" * 50)
-                return results
-            else:
-                print(f"重排序失败: {resp}")
-                print("=" * 50)
-                return []
-                
-        except Exception as e:
-            print(f"重排序出错: {str(e)}")
-            print("=" * 50)
-            return []
+        # 确保文档列表中的内容都是字符串类型
+        documents = [str(doc) for doc in documents]
+        results = [
+            (documents[i], score)
+            for i, score in self.rerank_indices(query, documents, top_k, fallback_scores)
+        ]
+        print(f"返回结果数量: {len(results)}")
+        print("=" * 50)
+        return results
     
     def rerank_with_metadata(self, query: str, documents: List[Dict], top_k: int = 5) -> List[Dict]:
         """对带有元数据的文档进行重排序
         
+        根据重排序结果中的文档序号直接取回原始文档，不需要按内容查找。
+        
         Args:
             query: 查询文本
             documents: 待排序的文档列表，每个文档是一个字典，包含content和其他元数据
@@ -92,16 +213,15 @@ class RerankProcessor:
         # 提取文档内容
         doc_contents = [str(doc.get('content', '')) for doc in documents]
         
-        # 进行重排序
-        reranked_pairs = self.rerank(query, doc_contents, top_k)
+        # 进行重排序，本地回退时使用检索阶段的相似度
+        similarities = [doc.get('similarity') for doc in documents]
+        fallback_scores = similarities if None not in similarities else None
+        ranked = self.rerank_indices(query, doc_contents, top_k, fallback_scores)
         
-        # 构建结果
+        # 按重排序返回的序号取回原始文档，内容重复的文档也能各自对应
         results = []
-        for content, score in reranked_pairs:
-            # 找到对应的原始文档
-            original_doc = next((doc for doc in documents if str(doc.get('content', '')) == content), {})
-            # 添加分数并保留原始元数据
-            result = original_doc.copy()
+        for i, score in ranked:
+            result = documents[i].copy()
             result['score'] = float(score)  # 确保分数是 Python 原生 float 类型
             results.append(result)
             
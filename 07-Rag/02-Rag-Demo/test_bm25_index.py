@@ -0,0 +1,93 @@
+import math
+import os
+import tempfile
+import unittest
+import numpy as np
+from bm25_index import BM25Index, tokenize
+
+
+"""
+BM25Index 的测试：分词、打分、保存后以内存映射方式加载。
+
+   python -m unittest test_bm25_index
+"""
+
+
+TEXTS = [
+    "西湖位于杭州市西部，是著名的风景名胜区。",
+    "The West Lake is in Hangzhou. West Lake has ten scenes.",
+    "灵隐寺始建于东晋，距今已有一千七百多年的历史。",
+    "雷峰塔 Leifeng Pagoda 位于西湖南岸。",
+]
+
+
+class TokenizeTest(unittest.TestCase):
+    def test_cjk_bigrams_and_lowercase_words(self):
+        self.assertEqual(
+            tokenize("西湖十景 West Lake 2024"),
+            ["西湖", "湖十", "十景", "west", "lake", "2024"],
+        )
+
+    def test_single_cjk_char_and_punctuation(self):
+        self.assertEqual(tokenize("湖，A-1！"), ["湖", "a", "1"])
+        self.assertEqual(tokenize("，。！"), [])
+
+
+class BM25ScoreTest(unittest.TestCase):
+    def setUp(self):
+        self.index = BM25Index.build(TEXTS)
+
+    def expected_score(self, query: str, doc_id: int) -> float:
+        """按 BM25 公式直接计算的分数"""
+        docs = [tokenize(text) for text in TEXTS]
+        avgdl = sum(len(doc) for doc in docs) / len(docs)
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in doc for doc in docs)
+            if df == 0:
+                continue
+            tf = docs[doc_id].count(term)
+            idf = math.log(1.0 + (len(docs) - df + 0.5) / (df + 0.5))
+            norm = self.index.k1 * (
+                1.0 - self.index.b + self.index.b * len(docs[doc_id]) / avgdl
+            )
+            score += idf * tf * (self.index.k1 + 1.0) / (tf + norm)
+        return score
+
+    def test_scores_match_formula(self):
+        results = self.index.search("西湖 west lake", k=10)
+        self.assertEqual({idx for idx, _ in results}, {0, 1, 3})
+        for idx, score in results:
+            self.assertAlmostEqual(score, self.expected_score("西湖 west lake", idx), places=5)
+        scores = [score for _, score in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_top_k_and_misses(self):
+        full = self.index.search("西湖 west lake", k=10)
+        self.assertEqual(self.index.search("西湖 west lake", k=2), full[:2])
+        self.assertEqual(self.index.search("故宫", k=5), [])
+        self.assertEqual(BM25Index.build([]).search("西湖"), [])
+
+
+class BM25LoadTest(unittest.TestCase):
+    def test_reload_is_memory_mapped(self):
+        index = BM25Index.build(TEXTS)
+        with tempfile.TemporaryDirectory() as tmp:
+            index_dir = os.path.join(tmp, "index.bm25")
+            index.save(index_dir)
+            # 再次保存时替换旧目录，不留下临时目录
+            index.save(index_dir)
+            self.assertEqual(os.listdir(tmp), ["index.bm25"])
+
+            loaded = BM25Index.load(index_dir)
+            for name in ("offsets", "doc_ids", "tfs", "doc_lens"):
+                self.assertIsInstance(getattr(loaded, name), np.memmap)
+            self.assertEqual(loaded.vocab, index.vocab)
+            self.assertEqual(len(loaded), len(TEXTS))
+            for query in ("西湖", "west lake", "一千七百年"):
+                self.assertEqual(loaded.search(query), index.search(query))
+            del loaded
+
+
+if __name__ == "__main__":
+    unittest.main()
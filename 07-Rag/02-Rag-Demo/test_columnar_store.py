@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import unittest
+from columnar_store import StoreWriter, load_store, save_store
+
+
+"""
+列式存储的测试：读写往返、放弃写入，以及替换目录时进程中断后的恢复。
+
+   python -m unittest test_columnar_store
+"""
+
+
+OLD_TEXTS = ["西湖", "灵隐寺"]
+OLD_META = [{"chunk_id": 0, "source": "a.txt"}, {"chunk_id": 1, "source": "a.txt"}]
+NEW_TEXTS = ["雷峰塔"]
+NEW_META = [{"chunk_id": 0, "source": "b.txt"}]
+
+
+class ColumnarStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store_dir = os.path.join(self.tmp.name, "index.store")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load(self):
+        texts, metadata, schema = load_store(self.store_dir)
+        return list(texts), list(metadata), schema
+
+    def write_new_without_swap(self):
+        """写完临时目录后、替换目录前中断，模拟 close 中两次改名之间的崩溃"""
+        writer = StoreWriter(self.store_dir)
+        for text, meta in zip(NEW_TEXTS, NEW_META):
+            writer.append(text, meta)
+        store_dir = self.store_dir
+        rename = os.rename
+
+        def crash_after_first_rename(src, dst):
+            rename(src, dst)
+            if src == store_dir:
+                raise KeyboardInterrupt
+
+        os.rename = crash_after_first_rename
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                writer.close()
+        finally:
+            os.rename = rename
+
+    def test_round_trip(self):
+        metadata = [
+            {"chunk_id": 0, "source": "a.txt", "page": 1, "tags": ["湖"]},
+            {"chunk_id": 1, "source": "b.txt", "tags": None},
+            {"chunk_id": 2, "source": "c.txt", "page": 3, "tags": {"k": 1}},
+        ]
+        save_store(self.store_dir, ["一", "", "三三"], metadata, extra={"metric": "cosine"})
+        texts, loaded, schema = self.load()
+        self.assertEqual(texts, ["一", "", "三三"])
+        self.assertEqual(schema["metric"], "cosine")
+        self.assertEqual(schema["columns"]["chunk_id"], "int")
+        self.assertEqual(schema["columns"]["page"], "json")
+        self.assertEqual(loaded[0], metadata[0])
+        self.assertEqual(loaded[1], {"chunk_id": 1, "source": "b.txt"})
+        self.assertEqual(loaded[2], metadata[2])
+
+    def test_abort_keeps_old_store(self):
+        save_store(self.store_dir, OLD_TEXTS, OLD_META)
+        writer = StoreWriter(self.store_dir)
+        writer.append("雷峰塔", NEW_META[0])
+        writer.abort()
+        self.assertFalse(os.path.exists(f"{self.store_dir}.tmp"))
+        self.assertEqual(self.load()[0], OLD_TEXTS)
+
+    def test_recover_completed_tmp_after_crash(self):
+        save_store(self.store_dir, OLD_TEXTS, OLD_META)
+        self.write_new_without_swap()
+        self.assertFalse(os.path.exists(self.store_dir))
+        self.assertTrue(os.path.isdir(f"{self.store_dir}.old"))
+
+        texts, metadata, _ = self.load()
+        self.assertEqual(texts, NEW_TEXTS)
+        self.assertEqual(metadata, NEW_META)
+        self.assertFalse(os.path.exists(f"{self.store_dir}.old"))
+        self.assertFalse(os.path.exists(f"{self.store_dir}.tmp"))
+
+    def test_recover_old_store_when_tmp_is_incomplete(self):
+        save_store(self.store_dir, OLD_TEXTS, OLD_META)
+        self.write_new_without_swap()
+        # 临时目录不完整（没有 schema.json）时回到上一次写入的数据
+        os.remove(os.path.join(f"{self.store_dir}.tmp", "schema.json"))
+
+        texts, metadata, _ = self.load()
+        self.assertEqual(texts, OLD_TEXTS)
+        self.assertEqual(metadata, OLD_META)
+        self.assertFalse(os.path.exists(f"{self.store_dir}.old"))
+
+    def test_writer_recovers_before_writing(self):
+        save_store(self.store_dir, OLD_TEXTS, OLD_META)
+        self.write_new_without_swap()
+        shutil.rmtree(f"{self.store_dir}.tmp")
+
+        # 新的写入中途放弃时，上一次写入的数据仍然可用
+        writer = StoreWriter(self.store_dir)
+        writer.append("保俶塔", {"chunk_id": 0})
+        writer.abort()
+        self.assertEqual(self.load()[0], OLD_TEXTS)
+
+    def test_leftover_old_dir_is_removed(self):
+        save_store(self.store_dir, OLD_TEXTS, OLD_META)
+        shutil.copytree(self.store_dir, f"{self.store_dir}.old")
+        save_store(self.store_dir, NEW_TEXTS, NEW_META)
+        self.assertEqual(self.load()[0], NEW_TEXTS)
+        self.assertFalse(os.path.exists(f"{self.store_dir}.old"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+from embedding_engine import ConcurrentEmbedder, EmbeddingError, is_rate_limited
+
+
+"""
+ConcurrentEmbedder 的测试，使用假的向量化函数。
+
+   python -m unittest test_embedding_engine
+"""
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int, message: str = "error"):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def fake_vectors(batch):
+    return [np.array([float(text)], dtype=np.float32) for text in batch]
+
+
+class RateLimitTest(unittest.TestCase):
+    def test_status_code_only(self):
+        self.assertTrue(is_rate_limited(StatusError(429)))
+        self.assertFalse(is_rate_limited(StatusError(500, "request id 4290 failed")))
+        self.assertFalse(is_rate_limited(ValueError("429 tokens, rate limit in text")))
+
+
+class ConcurrentEmbedderTest(unittest.TestCase):
+    def make(self, request_fn, **kwargs) -> ConcurrentEmbedder:
+        embedder = ConcurrentEmbedder(request_fn, base_delay=0.001, **kwargs)
+        self.addCleanup(embedder.close)
+        return embedder
+
+    def test_preserves_order(self):
+        texts = [str(i) for i in range(95)]
+        result = self.make(fake_vectors, max_concurrency=4).embed(texts, batch_size=7)
+        self.assertEqual([float(v[0]) for v in result], list(range(95)))
+
+    def test_transient_error_retries_whole_batch(self):
+        sizes = []
+        failures = [1]
+
+        def request(batch):
+            sizes.append(len(batch))
+            if failures[0]:
+                failures[0] -= 1
+                raise ConnectionError("connection reset")
+            return fake_vectors(batch)
+
+        self.make(request).embed([str(i) for i in range(10)], batch_size=10)
+        self.assertEqual(sizes, [10, 10])
+
+    def test_rejected_text_is_isolated(self):
+        def request(batch):
+            if "-1" in batch:
+                raise StatusError(400, "invalid input")
+            return fake_vectors(batch)
+
+        result = self.make(request).embed(["1", "-1", "3", "4"], batch_size=4)
+        self.assertIsNone(result[1])
+        self.assertEqual([float(result[i][0]) for i in (0, 2, 3)], [1.0, 3.0, 4.0])
+
+    def test_exhausted_retries_raise(self):
+        def request(batch):
+            raise ConnectionError("down")
+
+        with self.assertRaises(EmbeddingError):
+            self.make(request, max_retries=2).embed([str(i) for i in range(30)])
+
+    def test_throttling_shrinks_batch_size(self):
+        calls = [0]
+
+        def request(batch):
+            calls[0] += 1
+            if calls[0] <= 2:
+                raise StatusError(429, "too many requests")
+            return fake_vectors(batch)
+
+        embedder = self.make(request, max_concurrency=1)
+        embedder.embed([str(i) for i in range(10)], batch_size=10)
+        self.assertLess(embedder.limiter.batch_size, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
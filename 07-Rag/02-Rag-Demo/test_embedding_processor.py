@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+import numpy as np
+from embedding_processor import EmbeddingProcessor
+
+
+"""
+EmbeddingProcessor 的回归测试，使用假的向量化接口，不需要网络和 API 密钥。
+
+   python -m unittest test_embedding_processor
+"""
+
+
+DIMENSION = 8
+
+
+class FakeEmbeddings:
+    """按文本内容生成固定向量的假接口，记录请求过的文本数量"""
+
+    def __init__(self):
+        self.requested = 0
+
+    def create(self, model, input):
+        self.requested += len(input)
+        data = []
+        for i, text in enumerate(input):
+            rng = np.random.default_rng(abs(hash(text)) % (2**32))
+            data.append(
+                SimpleNamespace(index=i, embedding=rng.random(DIMENSION).tolist())
+            )
+        return SimpleNamespace(data=data)
+
+
+class BuildIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, "embedding_cache.db")
+        self.chunks = [(f"文本块 {i}", {"source": "a.txt", "chunk_id": i}) for i in range(25)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_processor(self) -> EmbeddingProcessor:
+        with mock.patch.dict(os.environ, {"ALIYUN_API_KEY": "test"}):
+            processor = EmbeddingProcessor(
+                dimension=DIMENSION, cache_path=self.cache_path, metric="cosine"
+            )
+        processor.client = SimpleNamespace(embeddings=FakeEmbeddings())
+        return processor
+
+    def test_rebuild_with_warm_cache(self):
+        """第二次构建时向量全部来自缓存（只读数组），归一化不应报错"""
+        save_path = os.path.join(self.tmp.name, "index", "index")
+
+        first = self.make_processor()
+        self.assertEqual(first.build_index_from_stream(iter(self.chunks), save_path), 25)
+        self.assertEqual(first.client.embeddings.requested, 25)
+
+        second = self.make_processor()
+        self.assertEqual(second.build_index_from_stream(iter(self.chunks), save_path), 25)
+        self.assertEqual(second.client.embeddings.requested, 0)
+
+        norms = np.linalg.norm(np.asarray(second.embeddings), axis=1)
+        np.testing.assert_allclose(norms, 1.0, rtol=1e-5)
+
+    def test_cached_vectors_are_not_modified(self):
+        """缓存返回的向量在构建索引后保持原值"""
+        processor = self.make_processor()
+        texts = [text for text, _ in self.chunks]
+        before = [emb.copy() for emb in processor.create_embeddings(texts)]
+
+        save_path = os.path.join(self.tmp.name, "index", "index")
+        processor.build_index_from_stream(iter(self.chunks), save_path)
+
+        after = processor.create_embeddings(texts)
+        for old, new in zip(before, after):
+            np.testing.assert_array_equal(old, new)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+import numpy as np
+from embedding_processor import EmbeddingProcessor
+from query_processor import QueryProcessor
+from test_embedding_processor import DIMENSION, FakeEmbeddings
+
+
+"""
+QueryProcessor 混合检索的测试：倒数排名融合（RRF），以及只被关键词命中的文本块补算相似度。
+
+   python -m unittest test_query_processor
+"""
+
+
+TEXTS = [
+    "西湖位于杭州市西部。",
+    "灵隐寺始建于东晋。",
+    "雷峰塔位于西湖南岸。",
+    "苏堤春晓是西湖十景之一。",
+    "千岛湖在淳安县。",
+]
+
+
+class FuseTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        with mock.patch.dict(os.environ, {"ALIYUN_API_KEY": "test"}):
+            processor = EmbeddingProcessor(
+                dimension=DIMENSION,
+                cache_path=os.path.join(self.tmp.name, "embedding_cache.db"),
+                metric="cosine",
+            )
+        processor.client = SimpleNamespace(embeddings=FakeEmbeddings(), close=lambda: None)
+        save_path = os.path.join(self.tmp.name, "index", "index")
+        processor.build_index_from_stream(
+            ((text, {"chunk_id": i}) for i, text in enumerate(TEXTS)), save_path
+        )
+        processor.load_index(save_path)
+        self.processor = processor
+        self.query_processor = QueryProcessor(processor)
+        self.query_embedding = processor.create_embeddings(["西湖"])[0]
+
+    def tearDown(self):
+        self.processor.close()
+        self.tmp.cleanup()
+
+    def dense(self, ids):
+        return [self.query_processor._result(idx, 0.5) for idx in ids]
+
+    def test_rrf_scores(self):
+        rrf_k = 60
+        dense_ids = [1, 0, 4]
+        sparse = self.processor.bm25.search("西湖", 4)
+        results = self.query_processor._fuse(
+            "西湖", self.query_embedding, self.dense(dense_ids), 2, rrf_k
+        )
+
+        expected = {}
+        for rank, idx in enumerate(dense_ids, 1):
+            expected[idx] = expected.get(idx, 0.0) + 1.0 / (rrf_k + rank)
+        for rank, (idx, _) in enumerate(sparse, 1):
+            expected[idx] = expected.get(idx, 0.0) + 1.0 / (rrf_k + rank)
+        top = sorted(expected, key=expected.get, reverse=True)[:2]
+
+        self.assertEqual([r["id"] for r in results], top)
+        bm25_scores = dict(sparse)
+        for result in results:
+            self.assertAlmostEqual(result["rrf_score"], expected[result["id"]])
+            self.assertEqual(result["bm25_score"], bm25_scores.get(result["id"], 0.0))
+            self.assertEqual(result["text"], TEXTS[result["id"]])
+
+    def test_keyword_only_rows_use_saved_vectors(self):
+        """只被关键词命中的文本块用保存的原始向量计算相似度，与直接计算的余弦相似度一致"""
+        results = self.query_processor._fuse(
+            "西湖", self.query_embedding, self.dense([1]), 5, 60
+        )
+        keyword_only = [r for r in results if r["id"] != 1]
+        self.assertEqual({r["id"] for r in keyword_only}, {0, 2, 3})
+
+        query = self.query_embedding / np.linalg.norm(self.query_embedding)
+        for result in keyword_only:
+            vector = np.asarray(
+                self.processor.create_embeddings([TEXTS[result["id"]]])[0], dtype=np.float32
+            )
+            expected = float(vector @ query / np.linalg.norm(vector))
+            self.assertAlmostEqual(result["similarity"], expected, places=5)
+            self.assertGreater(result["bm25_score"], 0.0)
+
+        dense_result = next(r for r in results if r["id"] == 1)
+        self.assertEqual(dense_result["similarity"], 0.5)
+        self.assertEqual(dense_result["bm25_score"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
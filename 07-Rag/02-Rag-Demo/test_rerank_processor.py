@@ -0,0 +1,114 @@
+import threading
+import unittest
+from unittest import mock
+from rerank_processor import RerankCache, RerankProcessor, local_scores
+
+
+"""
+RerankProcessor 的测试，替换远程调用，不需要网络和 API 密钥：
+LRU 缓存、内容重复的文档、超时和出错时的本地回退。
+
+   python -m unittest test_rerank_processor
+"""
+
+
+class RerankCacheTest(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = RerankCache(max_entries=2)
+        cache.put("a", [(0, 1.0)])
+        cache.put("b", [(1, 1.0)])
+        self.assertEqual(cache.get("a"), [(0, 1.0)])  # a 变为最近访问
+        cache.put("c", [(2, 1.0)])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), [(0, 1.0)])
+        self.assertEqual(cache.get("c"), [(2, 1.0)])
+
+    def test_key_depends_on_documents_and_top_k(self):
+        key = RerankCache.make_key("m", "q", ["x", "y"], 2)
+        self.assertEqual(key, RerankCache.make_key("m", "q", ["x", "y"], 2))
+        self.assertNotEqual(key, RerankCache.make_key("m", "q", ["y", "x"], 2))
+        self.assertNotEqual(key, RerankCache.make_key("m", "q", ["x", "y"], 1))
+        self.assertNotEqual(key, RerankCache.make_key("m", "q", ["xy"], 2))
+
+
+class RerankProcessorTest(unittest.TestCase):
+    def make(self, remote, **kwargs) -> RerankProcessor:
+        processor = RerankProcessor(**kwargs)
+        patcher = mock.patch.object(processor, "_call_remote", side_effect=remote)
+        self.calls = patcher.start()
+        self.addCleanup(patcher.stop)
+        return processor
+
+    def test_cache_hit_skips_remote(self):
+        processor = self.make(lambda query, documents, top_k: [(1, 0.9), (0, 0.1)])
+        first = processor.rerank_indices("西湖", ["a", "b"], top_k=2)
+        second = processor.rerank_indices("西湖", ["a", "b"], top_k=2)
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls.call_count, 1)
+
+        processor.rerank_indices("西湖", ["a", "b"], top_k=1)
+        self.assertEqual(self.calls.call_count, 2)
+
+    def test_duplicate_contents_keep_their_metadata(self):
+        processor = self.make(lambda query, documents, top_k: [(2, 0.9), (0, 0.5)])
+        documents = [
+            {"content": "西湖十景", "metadata": {"source": "a.txt"}},
+            {"content": "灵隐寺", "metadata": {"source": "b.txt"}},
+            {"content": "西湖十景", "metadata": {"source": "c.txt"}},
+        ]
+        results = processor.rerank_with_metadata("西湖", documents, top_k=2)
+        self.assertEqual(
+            [(r["metadata"]["source"], r["score"]) for r in results],
+            [("c.txt", 0.9), ("a.txt", 0.5)],
+        )
+        self.assertNotIn("score", documents[0])
+
+    def test_timeout_falls_back_and_caches_late_result(self):
+        release = threading.Event()
+        finished = threading.Event()
+
+        def slow_remote(query, documents, top_k):
+            release.wait(5)
+            return [(0, 0.8), (1, 0.7)]
+
+        processor = self.make(slow_remote, timeout=0.05)
+        documents = ["西湖", "灵隐寺"]
+        results = processor.rerank_indices(
+            "西湖", documents, top_k=2, fallback_scores=[0.2, 0.6]
+        )
+        self.assertEqual(results, [(1, 0.6), (0, 0.2)])
+
+        # 超时后远程调用继续执行，返回的结果仍写入缓存
+        key = RerankCache.make_key(processor.model, "西湖", documents, 2)
+        original_put = processor.cache.put
+
+        def put(*args):
+            original_put(*args)
+            finished.set()
+
+        with mock.patch.object(processor.cache, "put", side_effect=put):
+            release.set()
+            self.assertTrue(finished.wait(5))
+        self.assertEqual(processor.cache.get(key), [(0, 0.8), (1, 0.7)])
+        self.assertEqual(
+            processor.rerank_indices("西湖", documents, top_k=2), [(0, 0.8), (1, 0.7)]
+        )
+        self.assertEqual(self.calls.call_count, 1)
+
+    def test_error_falls_back_to_local_scores(self):
+        def failing_remote(query, documents, top_k):
+            raise RuntimeError("重排序失败")
+
+        processor = self.make(failing_remote)
+        documents = ["杭州西湖", "灵隐寺", "西湖十景"]
+        results = processor.rerank_indices("西湖十景", documents, top_k=2)
+        scores = local_scores("西湖十景", documents)
+        self.assertEqual(results, [(2, scores[2]), (0, scores[0])])
+
+        # 失败的结果不缓存，下次仍然调用远程服务
+        processor.rerank_indices("西湖十景", documents, top_k=2)
+        self.assertEqual(self.calls.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
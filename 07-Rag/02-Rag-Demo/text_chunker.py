@@ -0,0 +1,285 @@
+import re
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+
+"""
+本模块负责将文本分割成块，句子边界查找和分块都在线性时间内完成。
+
+   文本转为码点数组 → 查表得到句子边界和词元边界（向量化）→ 单指针顺序分块 → 去除首尾空白
+   流式输入：缓冲区 → 只输出已能确定结尾的块 → 丢弃已输出部分 → 继续读取
+
+   与原实现（见 benchmark_chunker.legacy_split_text）的差异：
+   原实现允许句子结束符恰好位于 chunk_size 处时块长为 chunk_size + 1，这里块长从不超过 chunk_size；
+   下一个块的起点至少前进一个单位，原实现在这种情况下会原地重复而无法结束。
+"""
+
+
+# 句子结束符
+SENTENCE_BOUNDARY_CHARS = ".。!！?？\n"
+SENTENCE_BOUNDARY_PATTERN = re.compile(f"[{re.escape(SENTENCE_BOUNDARY_CHARS)}]")
+
+# 近似的词元切分：每个汉字、每个连续的字母数字串、每个标点各计为一个词元
+TOKEN_PATTERN = re.compile(r"[\u4e00-\u9fff]|[^\W\u4e00-\u9fff]+|[^\w\s]")
+
+CHUNK_UNITS = ("char", "token")
+
+# 字符类别，与 TOKEN_PATTERN 对应
+SPACE, WORD, CJK, PUNCT = 0, 1, 2, 3
+
+
+def _classify(char: str) -> int:
+    if "\u4e00" <= char <= "\u9fff":
+        return CJK
+    if char.isalnum() or char == "_":
+        return WORD
+    if char.isspace():
+        return SPACE
+    return PUNCT
+
+
+@lru_cache(maxsize=1)
+def _lookup_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """基本多文种平面内每个码点的字符类别和是否为句子结束符"""
+    classes = np.array([_classify(chr(c)) for c in range(0x10000)], dtype=np.uint8)
+    boundaries = np.zeros(0x10000, dtype=bool)
+    boundaries[[ord(c) for c in SENTENCE_BOUNDARY_CHARS]] = True
+    return classes, boundaries
+
+
+def _codepoints(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+
+def _char_classes(text: str, codepoints: np.ndarray) -> np.ndarray:
+    classes_table, _ = _lookup_tables()
+    classes = classes_table[np.minimum(codepoints, 0xFFFF)]
+    # 基本多文种平面以外的字符很少，逐个判断
+    for i in np.flatnonzero(codepoints > 0xFFFF):
+        classes[i] = _classify(text[i])
+    return classes
+
+
+def token_spans(
+    text: str, codepoints: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """按 TOKEN_PATTERN 切分词元，返回每个词元的起始位置和结束位置
+
+    通过字符类别向量化计算，结果与逐个正则匹配相同。
+
+    Args:
+        text: 要切分的文本
+        codepoints: 文本的码点数组，已经计算过时可以传入以免重复转换
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: 起始位置数组和结束位置数组
+    """
+    if codepoints is None:
+        codepoints = _codepoints(text)
+    classes = _char_classes(text, codepoints)
+    word = classes == WORD
+    single = (classes == CJK) | (classes == PUNCT)
+    prev_word = np.concatenate(([False], word[:-1]))
+    next_word = np.concatenate((word[1:], [False]))
+    starts = np.flatnonzero(single | (word & ~prev_word))
+    ends = np.flatnonzero(single | (word & ~next_word)) + 1
+    return starts, ends
+
+
+def find_sentence_boundaries(text: str) -> List[int]:
+    """查找句子边界
+
+    使用编译好的正则表达式一次扫描整段文本，返回每个句子结束符的位置。
+
+    Args:
+        text: 要处理的文本
+
+    Returns:
+        List[int]: 句子边界位置的列表
+    """
+    return [m.start() for m in SENTENCE_BOUNDARY_PATTERN.finditer(text)]
+
+
+class TextChunker:
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        unit: str = "char",
+        token_pattern: Optional[re.Pattern] = None,
+        buffer_size: int = 1 << 20,
+    ):
+        """初始化文本分块器
+
+        Args:
+            chunk_size: 每个块的最大长度
+            chunk_overlap: 相邻块之间的重叠长度
+            unit: 长度单位，char 为字符数，token 为词元数
+            token_pattern: 词元切分的正则表达式，默认使用 TOKEN_PATTERN
+            buffer_size: 流式分块时缓冲区的字符数
+
+        Raises:
+            ValueError: 参数不合法时抛出
+        """
+        if unit not in CHUNK_UNITS:
+            raise ValueError(f"不支持的长度单位: {unit}")
+        if chunk_size <= 0:
+            raise ValueError("chunk_size 必须大于 0")
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError("chunk_overlap 必须大于等于 0 且小于 chunk_size")
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.unit = unit
+        self.token_pattern = token_pattern or TOKEN_PATTERN
+        self.buffer_size = buffer_size
+
+    def count(self, text: str) -> int:
+        """按当前长度单位计算文本长度"""
+        if self.unit == "char":
+            return len(text)
+        starts, _ = self._token_spans(text, _codepoints(text))
+        return len(starts)
+
+    def _token_spans(
+        self, text: str, codepoints: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """返回每个词元的起始位置和结束位置
+
+        默认切分规则使用向量化的 token_spans，自定义正则时逐个匹配。
+        """
+        if self.token_pattern is not TOKEN_PATTERN:
+            spans = np.fromiter(
+                (pos for m in self.token_pattern.finditer(text) for pos in m.span()),
+                dtype=np.int64,
+            ).reshape(-1, 2)
+            return spans[:, 0], spans[:, 1]
+        return token_spans(text, codepoints)
+
+    def _split(
+        self, text: str, final: bool
+    ) -> Tuple[List[Tuple[int, int]], int]:
+        """分割文本，返回块的字符范围和下一个块的起始字符位置
+
+        final 为 False 时文本后面还有内容，只输出结尾已能确定的块，
+        结果与整段分割时完全一致。
+        """
+        codepoints = _codepoints(text)
+        _, boundary_table = _lookup_tables()
+        # 句子结束符之后的位置
+        ends = np.flatnonzero(boundary_table[np.minimum(codepoints, 0xFFFF)]) + 1
+
+        if self.unit == "char":
+            unit_count = len(text)
+            starts_of = ends_of = None
+        else:
+            starts_of, ends_of = self._token_spans(text, codepoints)
+            unit_count = len(starts_of)
+            # 最后一个词元可能被缓冲区截断，留到下一轮处理
+            if not final and unit_count and ends_of[-1] == len(text):
+                unit_count -= 1
+            # 将句子边界换算为词元位置：边界之前（含边界符本身）的词元数
+            ends = np.unique(np.searchsorted(starts_of, ends, side="left"))
+
+        def char_pos(unit_pos: int) -> int:
+            if starts_of is None:
+                return unit_pos
+            if unit_pos < len(starts_of):
+                return int(starts_of[unit_pos])
+            return len(text)
+
+        spans_out = []
+        start = 0
+        j = 0
+        while start < unit_count:
+            limit = min(start + self.chunk_size, unit_count)
+            if limit == unit_count and not final:
+                break
+
+            end = limit
+            if limit < unit_count:
+                # 块的结束位置单调递增，指针只需向前移动
+                while j < len(ends) and ends[j] <= limit:
+                    j += 1
+                if j > 0 and ends[j - 1] > start:
+                    end = int(ends[j - 1])
+
+            if starts_of is None:
+                char_start, char_end = start, end
+            else:
+                char_start, char_end = int(starts_of[start]), int(ends_of[end - 1])
+            chunk = text[char_start:char_end]
+            stripped = chunk.strip()
+            if stripped:
+                char_start += len(chunk) - len(chunk.lstrip())
+                spans_out.append((char_start, char_start + len(stripped)))
+
+            if end >= unit_count:
+                start = unit_count
+                break
+            start = max(end - self.chunk_overlap, start + 1)
+
+        return spans_out, char_pos(start)
+
+    def split_spans(self, text: str) -> List[Tuple[int, int]]:
+        """将文本分割成块，返回每个块在文本中的起止位置
+
+        优先在不超过 chunk_size 的最后一个句子边界处结束，块首尾的空白字符不计入范围。
+
+        Args:
+            text: 要分割的文本
+
+        Returns:
+            List[Tuple[int, int]]: (起始位置, 结束位置) 列表，text[start:end] 即为文本块
+        """
+        if not text:
+            return []
+        spans, _ = self._split(text, final=True)
+        return spans
+
+    def split(self, text: str) -> List[str]:
+        """将文本分割成块
+
+        Args:
+            text: 要分割的文本
+
+        Returns:
+            List[str]: 文本块列表
+        """
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_stream(self, pieces: Iterable[str]) -> Iterator[Tuple[str, int, int]]:
+        """流式分割文本
+
+        逐段读取文本，缓冲区只保留尚未输出的部分，不需要一次性载入完整文档。
+        结果与将所有片段拼接后调用 split 相同。
+
+        Args:
+            pieces: 文本片段的可迭代对象，例如逐行或逐页读取的文本
+
+        Returns:
+            Iterator[Tuple[str, int, int]]: (文本块, 起始位置, 结束位置) 生成器，位置相对于完整文本
+        """
+        buffer = ""
+        offset = 0
+        pending: List[str] = []
+        pending_size = 0
+        for piece in pieces:
+            pending.append(piece)
+            pending_size += len(piece)
+            if len(buffer) + pending_size < self.buffer_size:
+                continue
+            buffer += "".join(pending)
+            pending, pending_size = [], 0
+            spans, next_start = self._split(buffer, final=False)
+            for start, end in spans:
+                yield buffer[start:end], offset + start, offset + end
+            buffer = buffer[next_start:]
+            offset += next_start
+
+        buffer += "".join(pending)
+        if buffer:
+            spans, _ = self._split(buffer, final=True)
+            for start, end in spans:
+                yield buffer[start:end], offset + start, offset + end